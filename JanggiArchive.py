@@ -0,0 +1,312 @@
+# Description:  Compact binary archive of finished (or unfinished) JanggiGame games, written append-only by live servers
+#               and read with random access. An archive is two files. The data file starts with the 4 byte magic
+#               b'JGR1' and then holds one record per game: the number of moves, the game state and a flag byte, the
+#               92 byte snapshot() of the start position if the flag says the game didn't start from the normal
+#               starting position, then two bytes per move, the from and to square indexes (row * 9 + column), the same
+#               index for both when passing. The index file (the data file's name plus '.idx') starts with b'JGI1' and
+#               holds the 8 byte offset of each game's record in the data file, so a game's id is its place in the
+#               index and finding it never means reading the games before it.
+#
+#               ArchiveWriter appends a game by writing its record and only then its index entry, so a reader never
+#               sees half a record, and a record left without an index entry by a crash is cut off the next time the
+#               archive is opened for writing. Several writers, in one process or many, can append to the same
+#               archive: each append holds an exclusive flock() on the index file and takes the game's offset and id
+#               from the sizes of the files at that moment. Where fcntl isn't available (Windows) there is no lock, and
+#               only one writer may have the archive open at a time.
+#
+#               GameArchive memory-maps both files and rebuilds the position at any ply by replaying the moves with
+#               JanggiGame.replay(), without checking them again.
+#
+#               Run it from the command line:
+#                   python JanggiArchive.py convert games.txt games.jgr
+#                   python JanggiArchive.py show games.jgr 12 --ply 80
+
+import argparse
+import mmap
+import os
+import struct
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from JanggiGame import JanggiGame, GAME_STATES
+from JanggiReplay import parse_moves, iter_games
+
+DATA_MAGIC = b'JGR1'
+INDEX_MAGIC = b'JGI1'
+RECORD = struct.Struct('<HBB')
+OFFSET = struct.Struct('<Q')
+SNAPSHOT_SIZE = 92
+HAS_START = 1  # flag set when the record holds the snapshot of its start position
+
+
+def get_index_path(path):
+    """returns the path of the index file for the data file at path"""
+    return path + '.idx'
+
+
+def encode_game(game):
+    """packs a game's start position, state and moves into a record"""
+    start = game.get_start_snapshot()
+    moves = bytearray()
+    for current, new in game.get_move_history():
+        current = game.convert_position(current)
+        new = game.convert_position(new)
+        moves.append(current[0] * 9 + current[1])
+        moves.append(new[0] * 9 + new[1])
+    record = RECORD.pack(len(moves) // 2, GAME_STATES.index(game.get_game_state()), 0 if start is None else HAS_START)
+    if start is not None:
+        record += start
+    return record + bytes(moves)
+
+
+class ArchiveWriter:
+    """
+    Represents an archive opened for appending games. Creates the files if they don't exist. Other writers may append
+    to the same archive at the same time (see the description at the top of the file). Call close() (or use it in a
+    with statement) when done
+    """
+
+    def __init__(self, path, sync=False):
+        """
+        opens the archive at path for appending, cutting off anything a crash left after the last indexed game. With
+        sync every append is also flushed to disk with fsync before it returns
+        """
+        self._sync = sync
+        self._data = open(path, 'a+b')
+        self._index = open(get_index_path(path), 'a+b')
+        self.lock()
+        try:
+            for archive_file, magic in [[self._data, DATA_MAGIC], [self._index, INDEX_MAGIC]]:
+                archive_file.seek(0)
+                header = archive_file.read(len(magic))
+                if not header:
+                    archive_file.write(magic)
+                    archive_file.flush()
+                elif header != magic:
+                    raise ValueError('not a game archive: ' + path)
+            count = self.count_games()
+            end = len(DATA_MAGIC)
+            if count:
+                self._index.seek(len(INDEX_MAGIC) + (count - 1) * OFFSET.size)
+                end = OFFSET.unpack(self._index.read(OFFSET.size))[0]
+                self._data.seek(end)
+                moves, state, flags = RECORD.unpack(self._data.read(RECORD.size))
+                end += RECORD.size + moves * 2 + (SNAPSHOT_SIZE if flags & HAS_START else 0)
+            self._data.truncate(end)
+        except Exception:
+            self.close()  # closing the files also lets go of the lock
+            raise
+        self.unlock()
+
+    def __enter__(self):
+        """returns the writer for use in a with statement"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """closes the writer at the end of a with statement"""
+        self.close()
+
+    def __len__(self):
+        """returns the number of games in the archive, including ones other writers appended"""
+        return (os.fstat(self._index.fileno()).st_size - len(INDEX_MAGIC)) // OFFSET.size
+
+    def close(self):
+        """closes both files, which also lets go of the lock"""
+        self._data.close()
+        self._index.close()
+
+    def lock(self):
+        """waits for, then takes, the exclusive lock other writers of the archive take before changing it"""
+        if fcntl is not None:
+            fcntl.flock(self._index.fileno(), fcntl.LOCK_EX)
+
+    def unlock(self):
+        """lets go of the lock taken by lock()"""
+        if fcntl is not None:
+            fcntl.flock(self._index.fileno(), fcntl.LOCK_UN)
+
+    def count_games(self):
+        """
+        returns the number of whole entries in the index file, cutting off part of an entry left by a writer that
+        crashed. Only called while holding the lock
+        """
+        size = os.fstat(self._index.fileno()).st_size
+        count = (size - len(INDEX_MAGIC)) // OFFSET.size
+        if size != len(INDEX_MAGIC) + count * OFFSET.size:
+            self._index.truncate(len(INDEX_MAGIC) + count * OFFSET.size)
+        return count
+
+    def append(self, game):
+        """appends a game, its move history from its start position and its state. Returns the game's id"""
+        return self.append_record(encode_game(game))
+
+    def append_record(self, record):
+        """
+        appends a record made by encode_game(), writing the data before the index entry. The record's offset and the
+        game's id are read from the file sizes while holding the lock, so they are right even if other writers appended
+        since this one opened the archive. Returns the game's id
+        """
+        self.lock()
+        try:
+            game_id = self.count_games()
+            offset = os.fstat(self._data.fileno()).st_size
+            self._data.write(record)
+            self._data.flush()
+            if self._sync:
+                os.fsync(self._data.fileno())
+            self._index.write(OFFSET.pack(offset))
+            self._index.flush()
+            if self._sync:
+                os.fsync(self._index.fileno())
+        finally:
+            self.unlock()
+        return game_id
+
+
+class GameArchive:
+    """
+    Represents an archive opened for reading, with both files memory-mapped. Games appended after it was opened are
+    seen after calling refresh(). Call close() (or use it in a with statement) when done
+    """
+
+    def __init__(self, path):
+        """opens and memory-maps the archive. Raises ValueError if it isn't a game archive"""
+        self._path = path
+        self._data = None
+        self._index = None
+        self._data_map = None
+        self._index_map = None
+        self._count = 0
+        self.refresh()
+
+    def __enter__(self):
+        """returns the archive for use in a with statement"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """closes the archive at the end of a with statement"""
+        self.close()
+
+    def __len__(self):
+        """returns the number of games in the archive"""
+        return self._count
+
+    def close(self):
+        """unmaps and closes both files"""
+        for item in [self._data_map, self._index_map, self._data, self._index]:
+            if item is not None:
+                item.close()
+        self._data = self._index = self._data_map = self._index_map = None
+
+    def refresh(self):
+        """maps the files again so games appended since they were mapped can be read"""
+        self.close()
+        # the index is mapped first, so every record it points to was written before the data is mapped
+        self._index = open(get_index_path(self._path), 'rb')
+        self._data = open(self._path, 'rb')
+        try:
+            self._index_map = mmap.mmap(self._index.fileno(), 0, access=mmap.ACCESS_READ)
+            self._data_map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.close()
+            raise ValueError('not a game archive: ' + self._path)
+        if self._data_map[:len(DATA_MAGIC)] != DATA_MAGIC or self._index_map[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.close()
+            raise ValueError('not a game archive: ' + self._path)
+        self._count = (len(self._index_map) - len(INDEX_MAGIC)) // OFFSET.size
+
+    def get_record(self, game_id):
+        """
+        returns a game's record as its start snapshot (None for the normal starting position), its state and its move
+        bytes. Raises IndexError if there is no game with that id
+        """
+        if not 0 <= game_id < self._count:
+            raise IndexError('no game ' + str(game_id) + ' in the archive')
+        offset = OFFSET.unpack_from(self._index_map, len(INDEX_MAGIC) + game_id * OFFSET.size)[0]
+        moves, state, flags = RECORD.unpack_from(self._data_map, offset)
+        offset += RECORD.size
+        start = None
+        if flags & HAS_START:
+            start = self._data_map[offset:offset + SNAPSHOT_SIZE]
+            offset += SNAPSHOT_SIZE
+        return start, GAME_STATES[state], self._data_map[offset:offset + moves * 2]
+
+    def get_info(self, game_id):
+        """returns a dictionary with a game's state, its number of moves and whether it started from another position"""
+        start, state, moves = self.get_record(game_id)
+        return {'state': state, 'moves': len(moves) // 2, 'custom_start': start is not None}
+
+    def get_moves(self, game_id):
+        """returns a game's moves as (current, new) tuples in the algebraic notation make_move() takes"""
+        moves = self.get_record(game_id)[2]
+        columns = 'abcdefghi'
+        return [(columns[moves[index] % 9] + str(moves[index] // 9 + 1),
+                 columns[moves[index + 1] % 9] + str(moves[index + 1] // 9 + 1)) for index in range(0, len(moves), 2)]
+
+    def get_game(self, game_id, ply=None, transposition_table=None):
+        """
+        returns a JanggiGame for a game after its first ply moves (all of them if ply is None, in which case the game
+        state is the one recorded). The moves are replayed with replay(), so the move history and pop() work
+        """
+        start, state, moves = self.get_record(game_id)
+        if start is None:
+            game = JanggiGame(transposition_table)
+        else:
+            game = JanggiGame.from_snapshot(start, transposition_table)
+        count = len(moves) // 2 if ply is None else min(ply, len(moves) // 2)
+        game.replay([(list(divmod(moves[index], 9)), list(divmod(moves[index + 1], 9)))
+                     for index in range(0, count * 2, 2)])
+        if ply is None or count == len(moves) // 2:
+            game.set_game_state(state)
+        return game
+
+
+def convert(lines, path):
+    """
+    appends every game from an iterable of move-list lines (see JanggiReplay) to the archive at path, each up to its
+    first illegal or unreadable move. Returns the number of games written
+    """
+    count = 0
+    with ArchiveWriter(path) as writer:
+        for game_id, text in iter_games(lines):
+            game = JanggiGame()
+            game.apply_moves(parse_moves(text)[0])
+            writer.append(game)
+            count += 1
+    return count
+
+
+def main():
+    """command line entry point, see the description at the top of the file"""
+    parser = argparse.ArgumentParser(description='Write or read a binary archive of Janggi games')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert', help='append the games from a move-list file to an archive')
+    convert_parser.add_argument('games', help='move-list file, one game per line')
+    convert_parser.add_argument('archive', help='archive data file to append to')
+    show = subparsers.add_parser('show', help='print the position of a game at a ply')
+    show.add_argument('archive', help='archive data file to read')
+    show.add_argument('game_id', type=int, help='id of the game')
+    show.add_argument('--ply', type=int, default=None, help='moves to play (default all of them)')
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        start = time.perf_counter()
+        with open(args.games) as games_file:
+            count = convert(games_file, args.archive)
+        print('games', count, format(time.perf_counter() - start, '.2f') + 's', 'bytes',
+              os.path.getsize(args.archive) + os.path.getsize(get_index_path(args.archive)))
+        return
+    with GameArchive(args.archive) as archive:
+        start = time.perf_counter()
+        game = archive.get_game(args.game_id, args.ply)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(game.to_fen())
+        print(archive.get_info(args.game_id), format(elapsed, '.3f') + 'ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,452 @@
+# Description:  Batch simulator for playing many games of Janggi at once with NumPy, for balance testing and training
+#               data. BatchSimulator holds N positions as one array of piece codes (the codes snapshot() uses, one
+#               column per square plus an always empty column 90) and works on all of them with whole-array operations
+#               instead of Python calls per piece. Every move any piece could make is numbered once, as a (from square,
+#               to square) pair, so legality is a boolean mask of games by move numbers. Which piece codes can make
+#               each move comes from asking the piece classes in JanggiGame (is_in_move_set()), and the squares that
+#               have to be empty come from the same move tables they use, so the rules aren't written out twice.
+#
+#               get_planes() gives the positions as boolean planes by team and piece type. legal_mask() works out
+#               every legal move of every game, and step() plays a random legal move in every unfinished game, only
+#               testing the move it picks for leaving the general in check and picking again if it does. A game ends
+#               when the side to move is checkmated, or as a draw after max_plies moves.
+#
+#               NumPy is only needed by this file. Run it from the command line to compare with JanggiGame:
+#                   python JanggiBatch.py --games 1000 --plies 200 --compare 10
+
+import argparse
+import random
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from JanggiGame import JanggiGame, PIECE_TYPES, PIECE_CODES, PIECE_CLASSES, TEAM_CODES, GAME_STATES, RAYS, LINES, \
+    HORSE_BLOCKS, ELEPHANT_BLOCKS
+
+EMPTY = 90  # the extra column every board has, which is always empty
+RANDOM_TRIES = 3  # random moves choose_random_moves() tests one at a time before testing all of a game's moves
+
+_tables = None
+
+
+def build_batch_tables():
+    """
+    Numbers every (from, to) move any piece could make and builds the arrays the simulator looks moves up in. Returns
+    a dictionary with:
+    moves - the list of (from index, to index) pairs. Move number len(moves) is passing, from and to the empty column
+    from / to - the from and to square of each move number, passing included
+    allowed - for each piece code, which move numbers a piece with that code could make on an empty board
+    legs - for each horse or elephant move the squares it passes through, padded with the empty column
+    piece_moves - the move numbers a piece can make from each square, with piece_starts and piece_counts giving where
+                  the ones for a piece code and square (code * 90 + square) start and how many there are. A chariot
+                  or cannon's moves go ray by ray, nearest first, and piece_steps holds how far along its ray each is
+    moves_to - for each square the move numbers that end on it, padded with passing, for finding attacks. Those along
+               a ray come nearest first, with ray_starts holding the column of the first one on the same ray
+    team / cannon / legged - the team index (or -1 when empty) and whether it's a cannon, or a horse or elephant,
+                             by piece code
+    """
+    moves = []
+    legs = []
+    for index in range(90):
+        for new in sorted(set(LINES[index]) | set(HORSE_BLOCKS[index]) | set(ELEPHANT_BLOCKS[index])):
+            moves.append((index, new))
+            if new in HORSE_BLOCKS[index]:
+                legs.append([HORSE_BLOCKS[index][new]])
+            elif new in ELEPHANT_BLOCKS[index]:
+                legs.append(ELEPHANT_BLOCKS[index][new])
+            else:
+                legs.append([])
+    count = len(moves)
+    numbers_by_move = dict((moves[number], number) for number in range(count))
+
+    allowed = numpy.zeros((16, count + 1), dtype=bool)
+    for name, code in PIECE_CODES.items():
+        team = 'red' if name[0] == 'r' else 'blue'
+        piece = PIECE_CLASSES[name[1:]](team, [0, 0])
+        for number in range(count):
+            current = list(divmod(moves[number][0], 9))
+            new = list(divmod(moves[number][1], 9))
+            allowed[code, number] = piece.is_in_move_set(current, new)
+
+    # the moves that end on each square, along each ray from it nearest first, then the horse and elephant moves
+    ends = []
+    for index in range(90):
+        entries = []
+        for ray in RAYS[index]:
+            for step in range(len(ray)):
+                entries.append((numbers_by_move[(ray[step][0] * 9 + ray[step][1], index)], len(entries) - step))
+        for new in sorted(set(HORSE_BLOCKS[index]) | set(ELEPHANT_BLOCKS[index])):
+            entries.append((numbers_by_move[(new, index)], len(entries)))
+        ends.append(entries)
+    width = max(len(entries) for entries in ends)
+    moves_to = numpy.full((91, width), count, dtype=numpy.intp)
+    ray_starts = numpy.tile(numpy.arange(width, dtype=numpy.intp), (91, 1))
+    for index in range(90):
+        moves_to[index, :len(ends[index])] = [entry[0] for entry in ends[index]]
+        ray_starts[index, :len(ends[index])] = [entry[1] for entry in ends[index]]
+
+    team = numpy.full(16, -1, dtype=numpy.int8)
+    cannon = numpy.zeros(16, dtype=bool)
+    legged = numpy.zeros(16, dtype=bool)
+    for name, code in PIECE_CODES.items():
+        team[code] = TEAM_CODES.index('red' if name[0] == 'r' else 'blue')
+        cannon[code] = name[1:] == 'Cannon'
+        legged[code] = name[1:] in ['Horse', 'Elephant']
+
+    piece_moves = []
+    piece_steps = []
+    starts = numpy.zeros(16 * 90, dtype=numpy.intp)
+    counts = numpy.zeros(16 * 90, dtype=numpy.intp)
+    for name, code in PIECE_CODES.items():
+        for index in range(90):
+            starts[code * 90 + index] = len(piece_moves)
+            if name[1:] in ['Chariot', 'Cannon']:  # ray by ray, nearest square first
+                for ray in RAYS[index]:
+                    for step in range(len(ray)):
+                        piece_moves.append(numbers_by_move[(index, ray[step][0] * 9 + ray[step][1])])
+                        piece_steps.append(step)
+            else:
+                for number in range(count):
+                    if moves[number][0] == index and allowed[code, number]:
+                        piece_moves.append(number)
+                        piece_steps.append(0)
+            counts[code * 90 + index] = len(piece_moves) - starts[code * 90 + index]
+
+    padded_legs = numpy.full((count + 1, 2), EMPTY, dtype=numpy.intp)
+    for number in range(count):
+        padded_legs[number, :len(legs[number])] = [square[0] * 9 + square[1] for square in legs[number]]
+
+    return {'moves': moves, 'piece_moves': numpy.array(piece_moves, dtype=numpy.intp),
+            'piece_steps': numpy.array(piece_steps, dtype=numpy.intp), 'piece_starts': starts, 'piece_counts': counts,
+            'legs': padded_legs,
+            'from': numpy.array([move[0] for move in moves] + [EMPTY], dtype=numpy.intp),
+            'to': numpy.array([move[1] for move in moves] + [EMPTY], dtype=numpy.intp),
+            'allowed': allowed, 'moves_to': moves_to, 'ray_starts': ray_starts,
+            'team': team, 'cannon': cannon, 'legged': legged}
+
+
+def get_batch_tables():
+    """returns the tables from build_batch_tables(), building them the first time they are needed"""
+    global _tables
+    if _tables is None:
+        if numpy is None:
+            raise ImportError('JanggiBatch needs NumPy (pip install numpy)')
+        _tables = build_batch_tables()
+    return _tables
+
+
+class BatchSimulator:
+    """
+    Represents a batch of games played in lockstep. Boards are an (N, 91) array of piece codes, turns the index in
+    TEAM_CODES of the player to move, states the index in GAME_STATES of each game's state and plies the number of
+    moves (passes included) played in each game
+    """
+
+    def __init__(self, size, fen=None, max_plies=200, seed=None):
+        """
+        starts size games from the position in fen, or the normal starting position. Games that reach max_plies moves
+        end as draws. The seed makes the random moves step() plays repeatable
+        """
+        self._tables = get_batch_tables()
+        game = JanggiGame() if fen is None else JanggiGame.from_fen(fen)
+        start = numpy.frombuffer(game.snapshot(), dtype=numpy.uint8)
+        self._boards = numpy.zeros((size, 91), dtype=numpy.uint8)
+        self._boards[:, :90] = start[:90]
+        self._turns = numpy.full(size, start[90], dtype=numpy.int8)
+        self._states = numpy.full(size, start[91], dtype=numpy.int8)
+        self._plies = numpy.zeros(size, dtype=numpy.int32)
+        self._max_plies = max_plies
+        self._random = numpy.random.default_rng(seed)
+
+    def get_size(self):
+        """returns the number of games in the batch"""
+        return len(self._boards)
+
+    def get_boards(self):
+        """returns the (N, 91) array of piece codes, column 90 being the always empty square"""
+        return self._boards
+
+    def get_turns(self):
+        """returns the index in TEAM_CODES of the player to move in each game"""
+        return self._turns
+
+    def get_states(self):
+        """returns the index in GAME_STATES of each game's state"""
+        return self._states
+
+    def get_plies(self):
+        """returns the number of moves played in each game"""
+        return self._plies
+
+    def get_moves(self):
+        """returns the (from index, to index) pair of every move number. The number after the last one is passing"""
+        return self._tables['moves']
+
+    def describe_move(self, number):
+        """returns a move number as a (current, new) pair in the algebraic notation make_move() takes"""
+        if number == len(self._tables['moves']):
+            return None
+        current, new = self._tables['moves'][number]
+        return 'abcdefghi'[current % 9] + str(current // 9 + 1), 'abcdefghi'[new % 9] + str(new // 9 + 1)
+
+    def get_game(self, index):
+        """returns a JanggiGame in the same position as game index of the batch"""
+        data = bytes(self._boards[index, :90]) + bytes([int(self._turns[index]), int(self._states[index])])
+        return JanggiGame.from_snapshot(data)
+
+    def get_planes(self):
+        """
+        returns the positions as an (N, 14, 10, 9) boolean array, one plane per team and piece type: blue's pieces in
+        PIECE_TYPES order then red's (the order of TEAM_CODES)
+        """
+        planes = numpy.zeros((len(self._boards), 14, 90), dtype=bool)
+        for team in TEAM_CODES:
+            for type_index in range(len(PIECE_TYPES)):
+                code = PIECE_CODES[team[0] + PIECE_TYPES[type_index]]
+                planes[:, TEAM_CODES.index(team) * 7 + type_index] = self._boards[:, :90] == code
+        return planes.reshape(len(self._boards), 14, 10, 9)
+
+    def pseudo_legal_moves(self, boards, turns):
+        """
+        returns the moves the player to move on each board could make, following how each piece moves and what can
+        block it but without looking at whether the move leaves their general in check. They are returned as two
+        arrays, the board each move is on (in order) and its move number. Only the moves each of the player's pieces
+        could make from its square (piece_moves) are looked at
+        """
+        tables = self._tables
+        squares = boards[:, :90]
+        own = tables['team'][squares] == turns[:, None]
+        games, froms = numpy.nonzero(own)
+        keys = squares[games, froms].astype(numpy.intp) * 90 + froms
+        counts = tables['piece_counts'][keys]
+        ends = numpy.cumsum(counts)
+        firsts = numpy.repeat(tables['piece_starts'][keys] - ends + counts, counts)
+        offsets = numpy.arange(len(firsts)) + firsts
+        numbers = tables['piece_moves'][offsets]
+        codes = numpy.repeat(squares[games, froms], counts)
+        games = numpy.repeat(games, counts)
+        flat = boards.ravel()
+        base = games * boards.shape[1]
+        targets = flat[base + tables['to'][numbers]]
+        # a chariot or cannon's moves along a ray are in order, so the pieces it passes over are the pieces on the
+        # squares of the moves before it on the ray, counted with a running total
+        back = numpy.arange(len(numbers)) - tables['piece_steps'][offsets]
+        occupied = numpy.cumsum(targets != 0, dtype=numpy.int32) - (targets != 0)
+        pieces = occupied - occupied[back]
+        keep = tables['team'][targets] != turns[games]
+        cannons = tables['cannon'][codes]
+        keep &= (pieces == 0) | cannons
+        # a cannon has to jump exactly one piece that isn't a cannon, and can't capture a cannon
+        jumped_cannons = numpy.cumsum(tables['cannon'][targets], dtype=numpy.int32) - tables['cannon'][targets]
+        jumped_cannons -= jumped_cannons[back]
+        keep[cannons] &= (pieces[cannons] == 1) & (jumped_cannons[cannons] == 0) & ~tables['cannon'][targets[cannons]]
+        legged = numpy.nonzero(tables['legged'][codes])[0]
+        legs = flat[base[legged, None] + tables['legs'][numbers[legged]]]
+        keep[legged] &= legs.view(numpy.uint16).ravel() == 0  # both leg squares empty
+        return games[keep], numbers[keep]
+
+    def get_generals(self, boards, turns):
+        """returns the square of the general of the team with the given index in TEAM_CODES on each board"""
+        codes = numpy.where(turns == TEAM_CODES.index('red'), PIECE_CODES['rGeneral'], PIECE_CODES['bGeneral'])
+        return numpy.argmax(boards == codes[:, None].astype(boards.dtype), axis=1)
+
+    def is_attacked(self, boards, squares, attackers):
+        """
+        returns whether each square on each board could be captured by a piece of the attacking team (an index in
+        TEAM_CODES). Only the moves that end on the square are looked at, which are in order along each ray outward
+        from it (moves_to), so the pieces a chariot or cannon would pass over are counted with a running total like
+        in pseudo_legal_moves()
+        """
+        tables = self._tables
+        numbers = tables['moves_to'][squares]
+        rows = numpy.arange(len(boards))[:, None]
+        codes = boards[rows, tables['from'][numbers]]
+        attacks = tables['allowed'][codes, numbers] & (tables['team'][codes] == attackers[:, None])
+        starts = tables['ray_starts'][squares]
+        occupied = numpy.cumsum(codes != 0, axis=1, dtype=numpy.int8) - (codes != 0)
+        pieces = occupied - numpy.take_along_axis(occupied, starts, axis=1)
+        cannons = tables['cannon'][codes]
+        jumped_cannons = numpy.cumsum(cannons, axis=1, dtype=numpy.int8) - cannons
+        jumped_cannons -= numpy.take_along_axis(jumped_cannons, starts, axis=1)
+        attacks &= numpy.where(cannons, (pieces == 1) & (jumped_cannons == 0), pieces == 0)
+        legged = numpy.nonzero(attacks & tables['legged'][codes])
+        if len(legged[0]):
+            legs = boards[legged[0][:, None], tables['legs'][numbers[legged]]]
+            attacks[legged] = legs.view(numpy.uint16).ravel() == 0
+        return attacks.any(axis=1)
+
+    def is_in_check(self, boards=None, turns=None):
+        """returns whether the player to move is in check on each board, the batch's own boards if none are given"""
+        if boards is None:
+            boards = self._boards
+            turns = self._turns
+        return self.is_attacked(boards, self.get_generals(boards, turns), 1 - turns)
+
+    def play(self, boards, numbers):
+        """returns a copy of the boards with move number numbers[i] made on board i"""
+        tables = self._tables
+        boards = boards.copy()
+        rows = numpy.arange(len(boards))
+        current = tables['from'][numbers]
+        boards[rows, tables['to'][numbers]] = boards[rows, current]
+        boards[rows, current] = 0
+        boards[:, EMPTY] = 0
+        return boards
+
+    def leaves_in_check(self, boards, turns, numbers):
+        """returns whether making move number numbers[i] on board i leaves the general of the player to move in check"""
+        children = self.play(boards, numbers)
+        return self.is_attacked(children, self.get_generals(children, turns), 1 - turns)
+
+    def legal_mask(self):
+        """
+        returns an (N, moves + 1) boolean array of every legal move in each game, the last column being passing. Each
+        pseudo legal move is made on a copy of its board to test it doesn't leave the general in check. Finished games
+        have no legal moves
+        """
+        number_of_moves = len(self._tables['moves'])
+        mask = numpy.zeros((len(self._boards), number_of_moves + 1), dtype=bool)
+        active = self._states == GAME_STATES.index('UNFINISHED')
+        games, numbers = self.pseudo_legal_moves(self._boards, self._turns)
+        keep = active[games]
+        games = games[keep]
+        numbers = numbers[keep]
+        mask[games, numbers] = ~self.leaves_in_check(self._boards[games], self._turns[games], numbers)
+        mask[:, number_of_moves] = active & ~self.is_in_check()
+        return mask
+
+    def update_states(self, mask=None):
+        """
+        ends the games where the player to move has no legal move while in check, using the mask from legal_mask()
+        if it has already been worked out, and the games that have reached max_plies. Returns the states
+        """
+        if mask is None:
+            mask = self.legal_mask()
+        unfinished = self._states == GAME_STATES.index('UNFINISHED')
+        mated = unfinished & ~mask.any(axis=1)
+        self.end_games(mated)
+        return self._states
+
+    def end_games(self, mated):
+        """ends the games where mated is True with a win for the player who isn't to move, and the games out of plies"""
+        red = TEAM_CODES.index('red')
+        self._states[mated & (self._turns == red)] = GAME_STATES.index('BLUE_WON')
+        self._states[mated & (self._turns != red)] = GAME_STATES.index('RED_WON')
+        unfinished = self._states == GAME_STATES.index('UNFINISHED')
+        self._states[unfinished & (self._plies >= self._max_plies)] = GAME_STATES.index('DRAW')
+
+    def apply_moves(self, numbers):
+        """
+        makes move number numbers[i] in every unfinished game i without checking it is legal (see legal_mask()),
+        passing the turn, and ends the games that have reached max_plies
+        """
+        active = self._states == GAME_STATES.index('UNFINISHED')
+        numbers = numpy.where(active, numbers, len(self._tables['moves']))
+        self._boards = self.play(self._boards, numbers)
+        self._turns[active] = 1 - self._turns[active]
+        self._plies[active] += 1
+        self.end_games(numpy.zeros(len(self._boards), dtype=bool))
+
+    def choose_random_moves(self):
+        """
+        picks a random legal move for the player to move in every unfinished game, as move numbers, and ends the games
+        where they are checkmated. Instead of testing every pseudo legal move, one is picked at random and only it is
+        tested for leaving the general in check, swapping it out of the game's moves and picking again if it does.
+        After RANDOM_TRIES picks the games still left (usually ones in check) have all their remaining moves tested at
+        once. With none left the player passes, or is checkmated if they are in check
+        """
+        size = len(self._boards)
+        passing = len(self._tables['moves'])
+        choices = numpy.full(size, passing, dtype=numpy.intp)
+        active = self._states == GAME_STATES.index('UNFINISHED')
+        games, numbers = self.pseudo_legal_moves(self._boards, self._turns)
+        firsts = numpy.searchsorted(games, numpy.arange(size))
+        lasts = numpy.searchsorted(games, numpy.arange(size), side='right')
+        pending = numpy.nonzero(active & (firsts < lasts))[0]
+        for attempt in range(RANDOM_TRIES):
+            if not len(pending):
+                break
+            picks = firsts[pending] + (self._random.random(len(pending)) * (lasts[pending] - firsts[pending])).astype(
+                numpy.intp)
+            tried = numbers[picks]
+            illegal = self.leaves_in_check(self._boards[pending], self._turns[pending], tried)
+            choices[pending[~illegal]] = tried[~illegal]
+            pending = pending[illegal]
+            picks = picks[illegal]
+            lasts[pending] -= 1
+            numbers[picks] = numbers[lasts[pending]]
+            pending = pending[firsts[pending] < lasts[pending]]
+        if len(pending):
+            counts = lasts[pending] - firsts[pending]
+            ends = numpy.cumsum(counts)
+            positions = numpy.arange(ends[-1]) + numpy.repeat(firsts[pending] - ends + counts, counts)
+            rows = numpy.repeat(pending, counts)
+            tried = numbers[positions]
+            legal = ~self.leaves_in_check(self._boards[rows], self._turns[rows], tried)
+            keys = self._random.random(len(rows)) + legal
+            best = numpy.maximum.reduceat(keys, ends - counts)
+            chosen = legal & (keys == numpy.repeat(best, counts))
+            choices[rows[chosen]] = tried[chosen]
+        stuck = active & (choices == passing)
+        stuck[stuck] = self.is_in_check(self._boards[stuck], self._turns[stuck])
+        self.end_games(stuck)
+        return choices
+
+    def step(self):
+        """plays a random legal move in every unfinished game. Returns the number of games still unfinished"""
+        self.apply_moves(self.choose_random_moves())
+        return int(numpy.count_nonzero(self._states == GAME_STATES.index('UNFINISHED')))
+
+    def run(self):
+        """plays random moves until every game is over. Returns the number of games ending in each GAME_STATES state"""
+        while self.step():
+            pass
+        counts = numpy.bincount(self._states, minlength=len(GAME_STATES))
+        return dict((GAME_STATES[index], int(counts[index])) for index in range(len(GAME_STATES)))
+
+
+def play_random_game(max_plies=200, rng=None):
+    """plays one random game with JanggiGame the way BatchSimulator plays them, to compare speeds. Returns the state"""
+    rng = rng or random.Random()
+    game = JanggiGame()
+    for ply in range(max_plies):
+        moves = list(game.iter_legal_moves(game.get_player_turn()))
+        if not moves:
+            game.push((game.get_general(game.get_player_turn()).get_position(),) * 2)
+            continue
+        piece, current, new = rng.choice(moves)
+        game.push((current, new))
+        if game.check_mate(game.get_player_turn()):
+            return 'RED_WON' if game.get_player_turn() == 'blue' else 'BLUE_WON'
+    return 'DRAW'
+
+
+def main():
+    """command line entry point, see the description at the top of the file"""
+    parser = argparse.ArgumentParser(description='Play random Janggi games in a NumPy batch')
+    parser.add_argument('--games', type=int, default=1000, help='games in the batch')
+    parser.add_argument('--plies', type=int, default=200, help='moves before a game is a draw')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the random moves')
+    parser.add_argument('--compare', type=int, default=0, help='also play this many games with JanggiGame')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    simulator = BatchSimulator(args.games, max_plies=args.plies, seed=args.seed)
+    counts = simulator.run()
+    elapsed = time.perf_counter() - start
+    print('batch     ', args.games, 'games', '%.1f' % (args.games / elapsed), 'games/s',
+          '%.0f' % (int(simulator.get_plies().sum()) / elapsed), 'moves/s', counts)
+    if args.compare:
+        rng = random.Random(args.seed)
+        start = time.perf_counter()
+        for game_number in range(args.compare):
+            play_random_game(args.plies, rng)
+        elapsed = time.perf_counter() - start
+        print('JanggiGame', args.compare, 'games', '%.1f' % (args.compare / elapsed), 'games/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# Description:  Benchmarks for the Janggi game backends. Run it from the command line with "python JanggiBench.py".
+#               It plays a set of seeded random games, then times move validation (replaying every game through
+#               make_move() and listing every legal move in every position) and checkmate detection (check_mate() on
+#               every position where the side to move is in check) on JanggiGame and on BitboardJanggiGame, and prints
+#               the time taken by each and the speedup.
+#
+#               "python JanggiBench.py --startup" instead compares startup before and after the starting template:
+#               importing JanggiGame in a fresh interpreter against importing it and then creating and printing a game,
+#               which the module used to do at import, and JanggiGame(), which clones the starting template, against
+#               build_from_teams(), the old constructor that built the Red and Blue teams piece by piece.
+
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from JanggiGame import JanggiGame, Red, Blue
+from JanggiBitboard import BitboardJanggiGame
+
+
+def random_games(count, seed, length=120):
+    """
+    Plays count random games from the starting position and returns each one as a list of (current, new) moves in
+    algebraic notation. Captures are preferred so the games reach tactical positions with checks
+    """
+    rng = random.Random(seed)
+    games = []
+    for index in range(count):
+        game = BitboardJanggiGame()
+        moves = []
+        for ply in range(length):
+            legal = game.legal_moves(game.get_player_turn())
+            if not legal or game.get_game_state() != 'UNFINISHED':
+                break
+            captures = [move for move in legal if game.get_item_from_location(move[1]) != '-------']
+            if captures and rng.random() < 0.7:
+                move = rng.choice(captures)
+            else:
+                move = rng.choice(legal)
+            game.make_move(move[0], move[1])
+            moves.append(move)
+        games.append(moves)
+    return games
+
+
+def time_backend(backend, games):
+    """
+    Times one backend over the games. Returns a dictionary with the seconds spent replaying the moves with
+    make_move(), listing legal moves in each position, and running check_mate() on the positions in check
+    """
+    results = {'replay': 0.0, 'legal_moves': 0.0, 'check_mate': 0.0, 'positions': 0, 'checks': 0}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for moves in games:
+            game = backend()
+            for current, new in moves:
+                start = time.perf_counter()
+                game.legal_moves(game.get_player_turn())
+                results['legal_moves'] += time.perf_counter() - start
+                results['positions'] += 1
+
+                team = game.get_player_turn()
+                if game.is_in_check(team):
+                    start = time.perf_counter()
+                    game.check_mate(team)
+                    results['check_mate'] += time.perf_counter() - start
+                    results['checks'] += 1
+
+                start = time.perf_counter()
+                game.make_move(current, new)
+                results['replay'] += time.perf_counter() - start
+    return results
+
+
+def build_from_teams(transposition_table=None):
+    """
+    creates a game the way JanggiGame() did before the starting template, to time against it: the Red and Blue teams
+    are built piece by piece, placed on the board with update_board() and the position is hashed from scratch
+    """
+    game = JanggiGame.__new__(JanggiGame)
+    game._game_state = 'UNFINISHED'
+    red = Red()
+    blue = Blue()
+    game._red_pieces = red.get_red_pieces()
+    game._blue_pieces = blue.get_blue_pieces()
+    game._generals = {'red': red.get_general(), 'blue': blue.get_general()}
+    for pieces in [game._red_pieces, game._blue_pieces]:
+        for slot in range(len(pieces)):
+            pieces[slot].set_slot(slot)
+    game._history = []
+    game._player_turn = 'blue'
+    game._board = [['-------'] * 9 for row in range(10)]
+    game.update_board()
+    game._table = transposition_table
+    game._pins = None
+    game._start = None
+    game._hash = game.compute_hash()
+    game.reset_position_history()
+    return game
+
+
+def time_import(runs, then=''):
+    """
+    returns the median seconds taken to import JanggiGame and run the code then, each time in a new interpreter so
+    nothing is cached
+    """
+    code = 'import time; start = time.perf_counter(); import JanggiGame; ' + (then or 'pass') + \
+           '; print(time.perf_counter() - start)'
+    times = []
+    for run in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        times.append(float(output.split()[-1]))
+    return statistics.median(times)
+
+
+def time_call(function, count):
+    """returns the average seconds taken by count calls of function"""
+    start = time.perf_counter()
+    for index in range(count):
+        function()
+    return (time.perf_counter() - start) / count
+
+
+def run_startup(runs, count):
+    """prints the cost of importing JanggiGame and of creating a game, the old way next to the new one"""
+    before = time_import(runs, 'JanggiGame.JanggiGame().print_board()')
+    after = time_import(runs)
+    print('import, before'.ljust(28), format(before * 1000, '8.2f') + 'ms  (import, create and print a game)')
+    print('import, after'.ljust(28), format(after * 1000, '8.2f') + 'ms  speedup', format(before / after, '.1f') + 'x')
+    before = time_call(build_from_teams, count)
+    after = time_call(JanggiGame, count)
+    print('new game, before'.ljust(28), format(before * 1000000, '8.1f') + 'us  (build_from_teams())')
+    print('new game, after'.ljust(28), format(after * 1000000, '8.1f') + 'us  speedup',
+          format(before / after, '.1f') + 'x')
+    starting_position = JanggiGame().snapshot()
+    print('JanggiGame.from_snapshot()'.ljust(28),
+          format(time_call(lambda: JanggiGame.from_snapshot(starting_position), count) * 1000000, '8.1f') + 'us')
+
+
+def main():
+    """runs the backend benchmark, or the startup benchmark with --startup, and prints the results"""
+    parser = argparse.ArgumentParser(description='Benchmark the Janggi game backends')
+    parser.add_argument('--games', type=int, default=20, help='number of random games to play')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the random games')
+    parser.add_argument('--startup', action='store_true', help='time importing the module and creating games')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters used to time the import')
+    args = parser.parse_args()
+
+    if args.startup:
+        run_startup(args.runs, 5000)
+        return
+    games = random_games(args.games, args.seed)
+    print('games:', len(games), 'moves:', sum(len(moves) for moves in games))
+    timings = {}
+    for name, backend in [['JanggiGame', JanggiGame], ['BitboardJanggiGame', BitboardJanggiGame]]:
+        timings[name] = time_backend(backend, games)
+        print(name.ljust(20), '  '.join(key + ' ' + format(timings[name][key], '.3f') + 's'
+                                        for key in ['replay', 'legal_moves', 'check_mate']))
+    print('positions in check:', timings['JanggiGame']['checks'])
+    for key in ['replay', 'legal_moves', 'check_mate']:
+        if timings['BitboardJanggiGame'][key]:
+            print('speedup', key.ljust(12), format(timings['JanggiGame'][key] / timings['BitboardJanggiGame'][key],
+                                                  '.1f') + 'x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,513 @@
+# Description:  An alternative backend for JanggiGame that keeps the position as bitboards. Every square on the 10 x 9
+#               board is given an index (row * 9 + column) and a set of squares is stored as a 90-bit Python integer
+#               with one bit per square. Occupancy is kept per team and per piece type, so checking if a chariot is
+#               blocked, if a cannon has exactly one screen, or if a horse or elephant leg is free is a single mask
+#               operation against tables built once when the module is imported. BitboardJanggiGame has the same
+#               make_move(), get_game_state(), is_in_check(), legal_moves() and legal_moves_from() methods as
+#               JanggiGame and plays by exactly the same rules.
+
+RED = 0
+BLUE = 1
+TEAMS = ['red', 'blue']
+
+GENERAL = 0
+GUARD = 1
+HORSE = 2
+ELEPHANT = 3
+CHARIOT = 4
+CANNON = 5
+SOLDIER = 6
+TYPES = ['General', 'Guard', 'Horse', 'Elephant', 'Chariot', 'Cannon', 'Soldier']
+
+RED_PALACE_CENTER = 1 * 9 + 4
+BLUE_PALACE_CENTER = 8 * 9 + 4
+
+
+def palace_center(square):
+    """returns the index of the center of the palace the square is in, or None if it is not inside either palace"""
+    row, column = divmod(square, 9)
+    if 3 <= column <= 5:
+        if row <= 2:
+            return RED_PALACE_CENTER
+        if row >= 7:
+            return BLUE_PALACE_CENTER
+    return None
+
+
+def build_tables():
+    """
+    Builds the lookup tables used by BitboardJanggiGame. Returns a dictionary with:
+    lines - for each square a dictionary of every square on a straight line (or palace diagonal) from it, mapped to
+            the mask of the squares strictly between the two
+    rays - for each square a list of rays, each ray a list of squares moving outward in one direction
+    horse / elephant - for each square a dictionary of destination square mapped to the mask of its blocking squares
+    palace_steps - for each palace square the squares a general or guard can step to
+    soldier - for each team, for each square the squares a soldier can step to
+    """
+    lines = [dict() for square in range(90)]
+    rays = [[] for square in range(90)]
+    horse = [dict() for square in range(90)]
+    elephant = [dict() for square in range(90)]
+    palace_steps = [[] for square in range(90)]
+    soldier = [[[] for square in range(90)], [[] for square in range(90)]]
+
+    def on_board(row, column):
+        return 0 <= row < 10 and 0 <= column < 9
+
+    def diagonal_step(square, new):
+        center = palace_center(square)
+        if center is None or center != palace_center(new):
+            return False
+        if abs(square // 9 - new // 9) != 1 or abs(square % 9 - new % 9) != 1:
+            return False
+        return square == center or new == center
+
+    for square in range(90):
+        row, column = divmod(square, 9)
+
+        # orthogonal rays
+        for row_step, column_step in [[1, 0], [-1, 0], [0, 1], [0, -1]]:
+            ray = []
+            between = 0
+            new_row, new_column = row + row_step, column + column_step
+            while on_board(new_row, new_column):
+                new = new_row * 9 + new_column
+                ray.append(new)
+                lines[square][new] = between
+                between |= 1 << new
+                new_row, new_column = new_row + row_step, new_column + column_step
+            rays[square].append(ray)
+
+        # palace diagonal rays
+        for row_step, column_step in [[1, 1], [1, -1], [-1, 1], [-1, -1]]:
+            ray = []
+            between = 0
+            current = square
+            new_row, new_column = row + row_step, column + column_step
+            while on_board(new_row, new_column) and diagonal_step(current, new_row * 9 + new_column):
+                current = new_row * 9 + new_column
+                ray.append(current)
+                lines[square][current] = between
+                between |= 1 << current
+                new_row, new_column = new_row + row_step, new_column + column_step
+            if ray:
+                rays[square].append(ray)
+
+        # horse, one step vertical/horizontal then one diagonal
+        for move in [[2, 1], [2, -1], [-2, 1], [-2, -1], [1, 2], [-1, 2], [1, -2], [-1, -2]]:
+            if not on_board(row + move[0], column + move[1]):
+                continue
+            if abs(move[0]) == 2:
+                block = (row + move[0] // 2) * 9 + column
+            else:
+                block = row * 9 + column + move[1] // 2
+            horse[square][(row + move[0]) * 9 + column + move[1]] = 1 << block
+
+        # elephant, one step vertical/horizontal then two diagonal
+        for move in [[3, 2], [3, -2], [-3, 2], [-3, -2], [2, 3], [-2, 3], [2, -3], [-2, -3]]:
+            if not on_board(row + move[0], column + move[1]):
+                continue
+            row_step = 1 if move[0] > 0 else -1
+            column_step = 1 if move[1] > 0 else -1
+            if abs(move[0]) == 3:
+                blocks = [[row + row_step, column], [row + 2 * row_step, column + column_step]]
+            else:
+                blocks = [[row, column + column_step], [row + row_step, column + 2 * column_step]]
+            mask = 0
+            for block in blocks:
+                mask |= 1 << (block[0] * 9 + block[1])
+            elephant[square][(row + move[0]) * 9 + column + move[1]] = mask
+
+        # general and guard steps inside the palace
+        if palace_center(square) is not None:
+            for row_step in [-1, 0, 1]:
+                for column_step in [-1, 0, 1]:
+                    if row_step == 0 and column_step == 0 or not on_board(row + row_step, column + column_step):
+                        continue
+                    new = (row + row_step) * 9 + column + column_step
+                    if palace_center(new) != palace_center(square):
+                        continue
+                    if row_step == 0 or column_step == 0 or diagonal_step(square, new):
+                        palace_steps[square].append(new)
+
+        # soldiers, forward or sideways and forward along the diagonals of the enemy palace
+        for team, forward, enemy_center in [[RED, 1, BLUE_PALACE_CENTER], [BLUE, -1, RED_PALACE_CENTER]]:
+            for move in [[0, 1], [0, -1], [forward, 0], [forward, 1], [forward, -1]]:
+                if not on_board(row + move[0], column + move[1]):
+                    continue
+                new = (row + move[0]) * 9 + column + move[1]
+                if move[0] != 0 and move[1] != 0 and \
+                        (palace_center(square) != enemy_center or not diagonal_step(square, new)):
+                    continue
+                soldier[team][square].append(new)
+
+    return {'lines': lines, 'rays': rays, 'horse': horse, 'elephant': elephant, 'palace_steps': palace_steps,
+            'soldier': soldier}
+
+
+TABLES = build_tables()
+LINES = TABLES['lines']
+RAYS = TABLES['rays']
+HORSE_MOVES = TABLES['horse']
+ELEPHANT_MOVES = TABLES['elephant']
+PALACE_STEPS = TABLES['palace_steps']
+SOLDIER_MOVES = TABLES['soldier']
+
+# back rank from column a to i, followed by the rest of the starting pieces, the same layout as the Red and Blue classes
+STARTING_LAYOUT = [
+    [CHARIOT, 0, 0], [ELEPHANT, 0, 1], [HORSE, 0, 2], [GUARD, 0, 3], [GUARD, 0, 5], [ELEPHANT, 0, 6],
+    [HORSE, 0, 7], [CHARIOT, 0, 8], [GENERAL, 1, 4], [CANNON, 2, 1], [CANNON, 2, 7], [SOLDIER, 3, 0],
+    [SOLDIER, 3, 2], [SOLDIER, 3, 4], [SOLDIER, 3, 6], [SOLDIER, 3, 8],
+]
+
+
+def iterate_bits(mask):
+    """yields the index of every set bit in the mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitboardJanggiGame:
+    """
+    This class represents a game of Janggi played on bitboards. It plays by the same rules and has the same public
+    methods as JanggiGame
+    """
+
+    def __init__(self):
+        """
+        Initializes the game in the starting position with blue to move. _occupied holds a mask of every square for
+        each team, _pieces holds a mask for every piece type for each team, and _squares holds the piece code
+        (team * 8 + type) on every square, or None if it is empty, so the piece on a square can be found directly
+        """
+        self._game_state = 'UNFINISHED'
+        self._player_turn = 'blue'
+        self._occupied = [0, 0]
+        self._pieces = [[0] * 7, [0] * 7]
+        self._squares = [None] * 90
+        self._generals = [None, None]
+        for piece_type, row, column in STARTING_LAYOUT:
+            self.place_piece(RED, piece_type, row * 9 + column)
+            self.place_piece(BLUE, piece_type, (9 - row) * 9 + column)
+
+    def clear(self):
+        """takes every piece off the board, so a position can be set up with place_piece()"""
+        self._occupied = [0, 0]
+        self._pieces = [[0] * 7, [0] * 7]
+        self._squares = [None] * 90
+        self._generals = [None, None]
+
+    def get_squares(self):
+        """returns the list of piece codes (team * 8 + type) on each square, None for an empty square"""
+        return self._squares
+
+    def place_piece(self, team, piece_type, square):
+        """puts a piece on an empty square"""
+        bit = 1 << square
+        self._occupied[team] |= bit
+        self._pieces[team][piece_type] |= bit
+        self._squares[square] = team * 8 + piece_type
+        if piece_type == GENERAL:
+            self._generals[team] = square
+
+    def get_game_state(self):
+        """returns the current game state"""
+        return self._game_state
+
+    def get_player_turn(self):
+        """returns 'red' or 'blue' for whoever's turn it is"""
+        return self._player_turn
+
+    def get_item_from_location(self, location):
+        """Takes a location (a1, b6, etc.) and returns the name of the piece there, or '-------' if it is empty"""
+        code = self._squares[self.convert_position(location)]
+        if code is None:
+            return '-------'
+        return TEAMS[code >> 3][0] + TYPES[code & 7]
+
+    def convert_position(self, position):
+        """takes a position as a string with a letter and number (a1, b10, etc.) and converts it to a square index"""
+        return (int(position[1:]) - 1) * 9 + 'abcdefghi'.index(position[0])
+
+    def is_valid_location(self, location):
+        """returns True if location is a square on the board, a letter from a to i then a number from 1 to 10"""
+        if type(location) is not str or len(location) < 2 or location[0] not in 'abcdefghi':
+            return False
+        return location[1:] in ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10']
+
+    def convert_to_algebraic(self, square):
+        """takes a square index and converts it back to a string like a1 or b10"""
+        return 'abcdefghi'[square % 9] + str(square // 9 + 1)
+
+    def print_board(self):
+        """prints the board in the same layout as JanggiGame.print_board()"""
+        print('_______________________________________________________________________________________________________'
+              '_____')
+        print('        a          b            c           d          e           f           g            h           '
+              'i\n_____________________________________________________________________________________________________'
+              '_______')
+        for row in range(10):
+            if row + 1 != 10:
+                print('', str(row + 1) + '|', end='  ')
+            else:
+                print(str(row + 1) + '|', end='  ')
+            for column in range(9):
+                code = self._squares[row * 9 + column]
+                if code is None:
+                    name = '-------'
+                else:
+                    name = TEAMS[code >> 3][0] + TYPES[code & 7]
+                print(name.ljust(10), end='  ')
+            print()
+
+    def check_move(self, current, new):
+        """
+        Returns True if the piece on square current can move to square new following its move set. Blocking, cannon
+        screens and the horse and elephant legs are all checked as masks against the occupied squares
+        """
+        code = self._squares[current]
+        team = code >> 3
+        piece_type = code & 7
+        new_bit = 1 << new
+        if self._occupied[team] & new_bit:
+            return False
+        occupied = self._occupied[RED] | self._occupied[BLUE]
+
+        if piece_type == CHARIOT:
+            between = LINES[current].get(new)
+            return between is not None and not between & occupied
+        if piece_type == CANNON:
+            cannons = self._pieces[RED][CANNON] | self._pieces[BLUE][CANNON]
+            between = LINES[current].get(new)
+            if between is None or new_bit & cannons:
+                return False
+            screens = between & occupied
+            return screens != 0 and not screens & (screens - 1) and not screens & cannons
+        if piece_type == HORSE:
+            block = HORSE_MOVES[current].get(new)
+            return block is not None and not block & occupied
+        if piece_type == ELEPHANT:
+            blocks = ELEPHANT_MOVES[current].get(new)
+            return blocks is not None and not blocks & occupied
+        if piece_type == SOLDIER:
+            return new in SOLDIER_MOVES[team][current]
+        return new in PALACE_STEPS[current]
+
+    def generate_moves(self, current):
+        """returns a list of every square the piece on square current can reach following its move set"""
+        code = self._squares[current]
+        team = code >> 3
+        piece_type = code & 7
+        own = self._occupied[team]
+        occupied = self._occupied[RED] | self._occupied[BLUE]
+        moves = []
+
+        if piece_type == CHARIOT:
+            for ray in RAYS[current]:
+                for new in ray:
+                    if occupied >> new & 1:
+                        if not own >> new & 1:
+                            moves.append(new)
+                        break
+                    moves.append(new)
+        elif piece_type == CANNON:
+            cannons = self._pieces[RED][CANNON] | self._pieces[BLUE][CANNON]
+            for ray in RAYS[current]:
+                screened = False
+                for new in ray:
+                    if not screened:
+                        if occupied >> new & 1:
+                            if cannons >> new & 1:
+                                break
+                            screened = True
+                    elif occupied >> new & 1:
+                        if not own >> new & 1 and not cannons >> new & 1:
+                            moves.append(new)
+                        break
+                    else:
+                        moves.append(new)
+        elif piece_type == HORSE:
+            for new, block in HORSE_MOVES[current].items():
+                if not block & occupied and not own >> new & 1:
+                    moves.append(new)
+        elif piece_type == ELEPHANT:
+            for new, blocks in ELEPHANT_MOVES[current].items():
+                if not blocks & occupied and not own >> new & 1:
+                    moves.append(new)
+        elif piece_type == SOLDIER:
+            for new in SOLDIER_MOVES[team][current]:
+                if not own >> new & 1:
+                    moves.append(new)
+        else:
+            for new in PALACE_STEPS[current]:
+                if not own >> new & 1:
+                    moves.append(new)
+        return moves
+
+    def is_attacked(self, square, team):
+        """
+        Returns True if any piece from the team (RED or BLUE) could move onto square. Each attacker is tested with
+        a single mask operation
+        """
+        enemy = self._pieces[team]
+        occupied = self._occupied[RED] | self._occupied[BLUE]
+        for attacker in iterate_bits(enemy[CHARIOT]):
+            between = LINES[attacker].get(square)
+            if between is not None and not between & occupied:
+                return True
+        cannons = self._pieces[RED][CANNON] | self._pieces[BLUE][CANNON]
+        if not (1 << square) & cannons:
+            for attacker in iterate_bits(enemy[CANNON]):
+                between = LINES[attacker].get(square)
+                if between is not None:
+                    screens = between & occupied
+                    if screens and not screens & (screens - 1) and not screens & cannons:
+                        return True
+        for attacker in iterate_bits(enemy[HORSE]):
+            block = HORSE_MOVES[attacker].get(square)
+            if block is not None and not block & occupied:
+                return True
+        for attacker in iterate_bits(enemy[ELEPHANT]):
+            blocks = ELEPHANT_MOVES[attacker].get(square)
+            if blocks is not None and not blocks & occupied:
+                return True
+        for attacker in iterate_bits(enemy[SOLDIER]):
+            if square in SOLDIER_MOVES[team][attacker]:
+                return True
+        for attacker in iterate_bits(enemy[GUARD] | enemy[GENERAL]):
+            if square in PALACE_STEPS[attacker]:
+                return True
+        return False
+
+    def is_in_check(self, team):
+        """
+        Takes 'red' or 'blue' as a parameter and returns True if that team's general could be captured by the other
+        team on their next move, and False otherwise
+        """
+        if team == 'red':
+            return self.is_attacked(self._generals[RED], BLUE)
+        if team == 'blue':
+            return self.is_attacked(self._generals[BLUE], RED)
+        return False
+
+    def push(self, current, new):
+        """moves the piece on square current to square new and returns the code of any captured piece, or None"""
+        code = self._squares[current]
+        team = code >> 3
+        piece_type = code & 7
+        captured = self._squares[new]
+        move_mask = (1 << current) | (1 << new)
+        if captured is not None:
+            self._occupied[captured >> 3] ^= 1 << new
+            self._pieces[captured >> 3][captured & 7] ^= 1 << new
+        self._occupied[team] ^= move_mask
+        self._pieces[team][piece_type] ^= move_mask
+        self._squares[new] = code
+        self._squares[current] = None
+        if piece_type == GENERAL:
+            self._generals[team] = new
+        return captured
+
+    def pop(self, current, new, captured):
+        """takes back a move made by push()"""
+        code = self._squares[new]
+        team = code >> 3
+        piece_type = code & 7
+        move_mask = (1 << current) | (1 << new)
+        self._occupied[team] ^= move_mask
+        self._pieces[team][piece_type] ^= move_mask
+        self._squares[current] = code
+        self._squares[new] = captured
+        if captured is not None:
+            self._occupied[captured >> 3] |= 1 << new
+            self._pieces[captured >> 3][captured & 7] |= 1 << new
+        if piece_type == GENERAL:
+            self._generals[team] = current
+
+    def leaves_in_check(self, current, new):
+        """returns True if moving the piece on square current to square new would leave its own general in check"""
+        team = self._squares[current] >> 3
+        captured = self.push(current, new)
+        in_check = self.is_attacked(self._generals[team], 1 - team)
+        self.pop(current, new, captured)
+        return in_check
+
+    def iter_legal_moves(self, team):
+        """yields every legal move for the team ('red' or 'blue') as (current, new) square indexes"""
+        team_index = TEAMS.index(team)
+        for current in list(iterate_bits(self._occupied[team_index])):
+            for new in self.generate_moves(current):
+                if not self.leaves_in_check(current, new):
+                    yield current, new
+
+    def legal_moves(self, team):
+        """returns a list of every legal move for the team as (current, new) tuples in algebraic notation"""
+        moves = []
+        for current, new in self.iter_legal_moves(team):
+            moves.append((self.convert_to_algebraic(current), self.convert_to_algebraic(new)))
+        return moves
+
+    def legal_moves_from(self, location):
+        """returns a list of every square, in algebraic notation, the piece on the location can legally move to"""
+        current = self.convert_position(location)
+        if self._squares[current] is None:
+            return []
+        moves = []
+        for new in self.generate_moves(current):
+            if not self.leaves_in_check(current, new):
+                moves.append(self.convert_to_algebraic(new))
+        return moves
+
+    def check_mate(self, team):
+        """returns True if the team is in check and has no legal move to get out of it"""
+        if not self.is_in_check(team):
+            return False
+        for move in self.iter_legal_moves(team):
+            return False
+        return True
+
+    def change_player_turn(self):
+        """Changes the players turn to red or blue depending on who went last"""
+        if self._player_turn == 'blue':
+            self._player_turn = 'red'
+        else:
+            self._player_turn = 'blue'
+
+    def make_move(self, current_location, new_location):
+        """
+        takes a current location and new location and moves the desired piece if it is a legal move, exactly like
+        JanggiGame.make_move(). Returns False if the move is not legal or if one team has already won, and True on a
+        successful move
+        """
+        if not self.is_valid_location(current_location) or not self.is_valid_location(new_location):
+            print("Illegal move, please try again. It's currently " + self._player_turn + "'s turn")
+            return False
+        current = self.convert_position(current_location)
+        new = self.convert_position(new_location)
+        code = self._squares[current]
+        if code is None or TEAMS[code >> 3] != self._player_turn:
+            print("Illegal move, please try again. It's currently " + self._player_turn + "'s turn")
+            return False
+
+        if self._game_state != 'UNFINISHED':
+            print(self._game_state)
+            return False
+
+        if current == new:
+            legal = not self.is_in_check(self._player_turn)
+        else:
+            legal = self.check_move(current, new) and not self.leaves_in_check(current, new)
+        if not legal:
+            print("Illegal move, please try again. It's currently " + self._player_turn + "'s turn")
+            return False
+
+        if current != new:
+            self.push(current, new)
+        self.change_player_turn()
+        if self.check_mate(self._player_turn):
+            if self._player_turn == 'blue':
+                self._game_state = 'RED_WON'
+            else:
+                self._game_state = 'BLUE_WON'
+        return True
@@ -0,0 +1,183 @@
+# Description:  Opening book for JanggiGame. build_book() replays a corpus of games (the same move-list format as
+#               JanggiReplay, one game per line) and counts, for every position in the first moves of each game, how
+#               often each move was played from it and how those games ended. The counts are written to a binary file of
+#               fixed size records sorted by position hash, so OpeningBook can memory-map the file and find a position
+#               with a binary search, without reading or parsing the file when it is opened.
+#
+#               The file starts with the 4 byte magic b'JBK1' and the number of records, then each record is the
+#               position's Zobrist hash, the from and to square indexes (row * 9 + column) of the move, the number of
+#               games it was played in and how many of those blue and red won, little-endian.
+#
+#               Run it from the command line:
+#                   python JanggiBook.py build games.txt book.bin --max-ply 20
+#                   python JanggiBook.py probe book.bin c7c6 c4c5
+
+import argparse
+import mmap
+import struct
+
+from JanggiGame import JanggiGame
+from JanggiReplay import parse_moves, iter_games
+
+MAGIC = b'JBK1'
+HEADER = struct.Struct('<4sI')
+RECORD = struct.Struct('<QBBIII')
+HASH = struct.Struct('<Q')
+
+
+def build_book(lines, path, max_ply=20, min_count=1):
+    """
+    Builds a book file at path from an iterable of move-list lines. The first max_ply moves of every game go in the
+    book, as long as they are legal, and moves played in fewer than min_count games are left out. A move played more
+    than once from the same position in one game, after a repetition, counts as one game. Returns the number of games
+    read and the number of records written
+    """
+    counts = {}
+    games = 0
+    for game_id, text in iter_games(lines):
+        games += 1
+        moves = parse_moves(text)[0]
+        game = JanggiGame()
+        seen = set()
+        for ply in range(len(moves)):
+            current_location, new_location = moves[ply]
+            key = game.get_hash()
+            if game.try_move(current_location, new_location) != 'OK':
+                break
+            if ply < max_ply:
+                current = game.convert_position(current_location)
+                new = game.convert_position(new_location)
+                seen.add((key, current[0] * 9 + current[1], new[0] * 9 + new[1]))
+        state = game.get_game_state()
+        for entry in seen:
+            count = counts.setdefault(entry, [0, 0, 0])
+            count[0] += 1
+            if state == 'BLUE_WON':
+                count[1] += 1
+            elif state == 'RED_WON':
+                count[2] += 1
+
+    records = sorted(entry for entry in counts.items() if entry[1][0] >= min_count)
+    with open(path, 'wb') as book_file:
+        book_file.write(HEADER.pack(MAGIC, len(records)))
+        for (key, current, new), count in records:
+            book_file.write(RECORD.pack(key, current, new, count[0], count[1], count[2]))
+    return games, len(records)
+
+
+class OpeningBook:
+    """
+    Represents an opening book file, memory-mapped so only the records a lookup touches are read. Call close() (or
+    use it in a with statement) when it's no longer needed
+    """
+
+    def __init__(self, path):
+        """opens and memory-maps the book file. Raises ValueError if it isn't a book file"""
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError('not an opening book: ' + path)
+        magic, self._size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != HEADER.size + self._size * RECORD.size:
+            self.close()
+            raise ValueError('not an opening book: ' + path)
+
+    def __enter__(self):
+        """returns the book for use in a with statement"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """closes the book at the end of a with statement"""
+        self.close()
+
+    def __len__(self):
+        """returns the number of records in the book"""
+        return self._size
+
+    def close(self):
+        """unmaps and closes the book file"""
+        self._map.close()
+        self._file.close()
+
+    def get_hash(self, index):
+        """returns the position hash of the record at index"""
+        return HASH.unpack_from(self._map, HEADER.size + index * RECORD.size)[0]
+
+    def find(self, key):
+        """returns the index of the first record for the position hash, or of the record after where it would be"""
+        low = 0
+        high = self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_hash(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, key):
+        """returns a list of (from index, to index, games, blue wins, red wins) for every record of the position hash"""
+        records = []
+        index = self.find(key)
+        while index < self._size:
+            record = RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+            if record[0] != key:
+                break
+            records.append(record[1:])
+            index += 1
+        return records
+
+    def book_moves(self, game):
+        """
+        returns the book moves for the game's position, most played first, as a list of dictionaries with the move in
+        the (current, new) algebraic notation make_move() takes, the number of games it was played in and how many of
+        them blue and red won. Moves that aren't legal in the position (a hash collision) are left out
+        """
+        moves = []
+        board = game.get_board()
+        for current, new, count, blue_wins, red_wins in self.lookup(game.get_hash()):
+            current = list(divmod(current, 9))
+            new = list(divmod(new, 9))
+            piece = board[current[0]][current[1]]
+            if piece == '-------' or piece.get_team() != game.get_player_turn() or \
+                    not game.is_legal(piece, current, new):
+                continue
+            moves.append({'move': (game.convert_to_algebraic(current), game.convert_to_algebraic(new)),
+                          'count': count, 'blue_wins': blue_wins, 'red_wins': red_wins})
+        moves.sort(key=lambda move: -move['count'])
+        return moves
+
+
+def main():
+    """command line entry point, see the description at the top of the file"""
+    parser = argparse.ArgumentParser(description='Build or probe a Janggi opening book')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='build a book from a move-list file')
+    build.add_argument('games', help='move-list file, one game per line')
+    build.add_argument('book', help='book file to write')
+    build.add_argument('--max-ply', type=int, default=20, help='moves from the start of each game to add')
+    build.add_argument('--min-count', type=int, default=1, help='leave out moves played in fewer games')
+    probe = subparsers.add_parser('probe', help='print the book moves after playing some moves')
+    probe.add_argument('book', help='book file to read')
+    probe.add_argument('moves', nargs='*', help='moves to play first, like c7c6')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        with open(args.games) as games_file:
+            games, records = build_book(games_file, args.book, args.max_ply, args.min_count)
+        print('games', games, 'records', records)
+        return
+    game = JanggiGame()
+    count, result = game.apply_moves(parse_moves(' '.join(args.moves))[0])
+    if result != 'OK':
+        raise SystemExit('move ' + str(count + 1) + ' is illegal: ' + result)
+    with OpeningBook(args.book) as book:
+        for move in book.book_moves(game):
+            print(move['move'][0] + move['move'][1], 'games', move['count'], 'blue wins', move['blue_wins'],
+                  'red wins', move['red_wins'])
+
+
+if __name__ == '__main__':
+    main()
@@ -13,38 +13,441 @@
 #               to remove themselves from check, then they are in checkmate and the opposing team wins, which will be
 #               updated in the game-state and make_move() method will no longer work and return False.
 
+import random
+
+# Zobrist keys. Every piece on every square gets a random 64-bit number, and a position's hash is all of the numbers
+# for the pieces on the board XORed together, plus one more if it is red's turn. Moving a piece only changes a few of
+# them, so the hash can be kept up to date on every move. The seed is fixed so the same position always gets the same
+# hash, in any process.
+_zobrist_random = random.Random(20210211)
+ZOBRIST_PIECES = {}
+for _team in ['red', 'blue']:
+    for _type in ['General', 'Guard', 'Horse', 'Elephant', 'Chariot', 'Cannon', 'Soldier']:
+        ZOBRIST_PIECES[_team[0] + _type] = [_zobrist_random.getrandbits(64) for _square in range(90)]
+ZOBRIST_RED_TO_MOVE = _zobrist_random.getrandbits(64)
+
+# These are XORed into a position's hash to get separate transposition table keys for the different results stored
+# about the same position
+ZOBRIST_CHECK = {'red': _zobrist_random.getrandbits(64), 'blue': _zobrist_random.getrandbits(64)}
+ZOBRIST_MATE = {'red': _zobrist_random.getrandbits(64), 'blue': _zobrist_random.getrandbits(64)}
+ZOBRIST_MOVES = [[_zobrist_random.getrandbits(64) for _new in range(90)] for _current in range(90)]
+
+# Compact positions. snapshot() packs a game into 92 bytes: one byte per square, row by row, holding 0 for an empty
+# square or the piece's code, then the player whose turn it is and the game state. A piece's code is its type's index in
+# PIECE_TYPES plus 1 for red and 9 for blue.
+PIECE_TYPES = ['General', 'Guard', 'Elephant', 'Horse', 'Chariot', 'Cannon', 'Soldier']
+PIECE_CODES = {}
+for _index in range(len(PIECE_TYPES)):
+    PIECE_CODES['r' + PIECE_TYPES[_index]] = _index + 1
+    PIECE_CODES['b' + PIECE_TYPES[_index]] = _index + 9
+TEAM_CODES = ['blue', 'red']
+GAME_STATES = ['UNFINISHED', 'RED_WON', 'BLUE_WON', 'DRAW']
+
+# What set_repetition_rules() can make a repeated position, or a repetition reached by checking on every move, count as:
+# a draw, or a loss for the side that repeated (or kept giving check)
+REPETITION_OUTCOMES = ['draw', 'loss']
+
+# Text positions for to_fen() and from_fen(), in the style of chess FEN: the ranks from 10 down to 1 separated by '/',
+# each one listing its squares from a to i with a letter for a piece or a digit for a run of empty squares, then 'b' or
+# 'r' for the player whose turn it is and the game state. The letters follow PIECE_TYPES: general k, guard a, elephant
+# b, horse n, chariot r, cannon c, soldier p, in capitals for blue and lower case for red.
+FEN_LETTERS = 'kabnrcp'
+FEN_TURNS = ['b', 'r']
+
+# Each player sets up the horses and elephants on their back rank in one of four ways. The names list the pieces on
+# files b, c, g and h, and elephant-horse-elephant-horse is the layout the Red and Blue classes use.
+STARTING_ARRANGEMENTS = {
+    'elephant-horse-elephant-horse': 'bna1abn',
+    'horse-elephant-horse-elephant': 'nba1anb',
+    'horse-elephant-elephant-horse': 'nba1abn',
+    'elephant-horse-horse-elephant': 'bna1anb',
+}
+
+# The results try_move() and apply_moves() return instead of printing. 'OK' means the move was made, the others say why
+# it wasn't: a square that isn't on the board, no piece on the starting square, the other player's piece, the game
+# already being over, passing while in check, landing on your own piece, a move the piece can't make, a move the piece
+# could make if nothing was in the way, and a move that leaves your own general in check.
+MOVE_RESULTS = ['OK', 'INVALID_SQUARE', 'EMPTY_SQUARE', 'NOT_YOUR_TURN', 'GAME_OVER', 'PASS_IN_CHECK', 'OWN_PIECE',
+                'NOT_IN_MOVE_SET', 'BLOCKED', 'LEAVES_IN_CHECK']
+
+# The two palaces, shared by every piece
+RED_PALACE = [[0, 3], [0, 4], [0, 5], [1, 3], [1, 4], [1, 5], [2, 3], [2, 4], [2, 5]]
+BLUE_PALACE = [[7, 3], [7, 4], [7, 5], [8, 3], [8, 4], [8, 5], [9, 3], [9, 4], [9, 5]]
+
+HORSE_MOVE_SET = [[2, 1], [2, -1], [-2, 1], [-2, -1], [1, 2], [-1, 2], [1, -2], [-1, -2]]
+ELEPHANT_MOVE_SET = [[3, 2], [3, -2], [-3, 2], [-3, -2], [2, 3], [-2, 3], [2, -3], [-2, -3]]
+ORTHOGONAL_MOVE_SET = [[1, 0], [-1, 0], [0, 1], [0, -1]]
+RED_SOLDIER_MOVE_SET = [[0, 1], [0, -1], [1, 0]]
+BLUE_SOLDIER_MOVE_SET = [[0, 1], [0, -1], [-1, 0]]
+
+
+def get_palace_center(square):
+    """returns the center square of the palace the square is in, or None if it is not inside either palace"""
+    if 3 <= square[1] <= 5:
+        if 0 <= square[0] <= 2:
+            return [1, 4]
+        if 7 <= square[0] <= 9:
+            return [8, 4]
+    return None
+
+
+def build_move_tables():
+    """
+    Works out where every piece type can move from every square, ignoring the other pieces, so check_move() and
+    generate_moves() only have to look things up. Squares are [row, column] lists and the tables are indexed by
+    square index (row * 9 + column). Returns a dictionary with:
+    rays - for each square a list of rays, each a list of squares moving outward along a file, rank or palace diagonal
+    lines - for each square a dictionary of every square on one of its rays, by index, mapped to the list of squares
+            strictly between the two
+    palace_diagonal_steps - for each square the squares next to it along a palace diagonal
+    palace_steps - for each square in a palace the squares a general or guard can step to
+    horse / elephant - for each square a list of (destination, blocking squares) pairs
+    soldier - for each team, for each square the squares a soldier can step to
+    soldier_attacks - for each team, for each square the squares that team's soldiers could capture it from
+    """
+    def on_board(row, column):
+        return 0 <= row < 10 and 0 <= column < 9
+
+    def diagonal_step(current, new):
+        center = get_palace_center(current)
+        if center is None or center != get_palace_center(new):
+            return False
+        if abs(new[0] - current[0]) != 1 or abs(new[1] - current[1]) != 1:
+            return False
+        return current == center or new == center
+
+    tables = {'rays': [], 'lines': [], 'palace_diagonal_steps': [], 'palace_steps': [], 'horse': [], 'elephant': [],
+              'soldier': {'red': [], 'blue': []}, 'soldier_attacks': {'red': [[] for index in range(90)],
+                                                                      'blue': [[] for index in range(90)]}}
+    for index in range(90):
+        row, column = divmod(index, 9)
+        square = [row, column]
+
+        rays = []
+        lines = {}
+        for direction in ORTHOGONAL_MOVE_SET + [[1, 1], [1, -1], [-1, 1], [-1, -1]]:
+            ray = []
+            previous = square
+            new = [row + direction[0], column + direction[1]]
+            while on_board(new[0], new[1]):
+                if direction[0] != 0 and direction[1] != 0 and not diagonal_step(previous, new):
+                    break
+                lines[new[0] * 9 + new[1]] = list(ray)
+                ray.append(new)
+                previous = new
+                new = [new[0] + direction[0], new[1] + direction[1]]
+            if ray:
+                rays.append(ray)
+        tables['rays'].append(rays)
+        tables['lines'].append(lines)
+
+        diagonal_steps = []
+        palace_steps = []
+        for row_step in [-1, 0, 1]:
+            for column_step in [-1, 0, 1]:
+                new = [row + row_step, column + column_step]
+                center = get_palace_center(new)
+                if new == square or center is None or center != get_palace_center(square):
+                    continue
+                if diagonal_step(square, new):
+                    diagonal_steps.append(new)
+                    palace_steps.append(new)
+                elif row_step == 0 or column_step == 0:
+                    palace_steps.append(new)
+        tables['palace_diagonal_steps'].append(diagonal_steps)
+        tables['palace_steps'].append(palace_steps)
+
+        horse = []
+        for move in HORSE_MOVE_SET:  # one step straight, which can be blocked, then one diagonal
+            if on_board(row + move[0], column + move[1]):
+                if abs(move[0]) == 2:
+                    block = [row + move[0] // 2, column]
+                else:
+                    block = [row, column + move[1] // 2]
+                horse.append(([row + move[0], column + move[1]], block))
+        tables['horse'].append(horse)
+
+        elephant = []
+        for move in ELEPHANT_MOVE_SET:  # one step straight then two diagonal, blocked on either of the first two
+            if on_board(row + move[0], column + move[1]):
+                row_step = 1 if move[0] > 0 else -1
+                column_step = 1 if move[1] > 0 else -1
+                if abs(move[0]) == 3:
+                    blocks = [[row + row_step, column], [row + 2 * row_step, column + column_step]]
+                else:
+                    blocks = [[row, column + column_step], [row + row_step, column + 2 * column_step]]
+                elephant.append(([row + move[0], column + move[1]], blocks))
+        tables['elephant'].append(elephant)
+
+        for team, move_set, enemy_palace in [['red', RED_SOLDIER_MOVE_SET, BLUE_PALACE],
+                                             ['blue', BLUE_SOLDIER_MOVE_SET, RED_PALACE]]:
+            steps = []
+            forward = move_set[2][0]
+            for move in move_set + [[forward, 1], [forward, -1]]:
+                new = [row + move[0], column + move[1]]
+                if not on_board(new[0], new[1]):
+                    continue
+                if move[1] != 0 and move[0] != 0 and (square not in enemy_palace or not diagonal_step(square, new)):
+                    continue  # forward diagonally only along the diagonals of the enemy palace
+                steps.append(new)
+                tables['soldier_attacks'][team][new[0] * 9 + new[1]].append(square)
+            tables['soldier'][team].append(steps)
+    return tables
+
+
+MOVE_TABLES = build_move_tables()
+RAYS = MOVE_TABLES['rays']
+LINES = MOVE_TABLES['lines']
+PALACE_DIAGONAL_STEPS = MOVE_TABLES['palace_diagonal_steps']
+PALACE_STEPS = MOVE_TABLES['palace_steps']
+HORSE_MOVES = MOVE_TABLES['horse']
+ELEPHANT_MOVES = MOVE_TABLES['elephant']
+SOLDIER_MOVES = MOVE_TABLES['soldier']
+SOLDIER_ATTACKS = MOVE_TABLES['soldier_attacks']
+
+# the same tables keyed by destination index, for checking a single move
+HORSE_BLOCKS = [dict((new[0] * 9 + new[1], block) for new, block in moves) for moves in HORSE_MOVES]
+ELEPHANT_BLOCKS = [dict((new[0] * 9 + new[1], blocks) for new, blocks in moves) for moves in ELEPHANT_MOVES]
+PALACE_STEP_INDEXES = [set(new[0] * 9 + new[1] for new in steps) for steps in PALACE_STEPS]
+SOLDIER_STEP_INDEXES = {'red': [set(new[0] * 9 + new[1] for new in steps) for steps in SOLDIER_MOVES['red']],
+                        'blue': [set(new[0] * 9 + new[1] for new in steps) for steps in SOLDIER_MOVES['blue']]}
+
 
 class JanggiGame:
     """
     This class represents a board game called Janggi
     """
 
-    def __init__(self):
+    __slots__ = ('_game_state', '_red_pieces', '_blue_pieces', '_generals', '_history', '_player_turn', '_board',
+                 '_table', '_hash', '_position_counts', '_position_plies', '_check_streaks', '_repetition_rules',
+                 '_pins', '_start')
+
+    def __init__(self, transposition_table=None):
         """
-        This will initialize the game. It sets the initial state to UNFINISHED. It initializes the red and blue team
-        by using the Red and Blue classes and their respective get_pieces methods which return each individual piece as
-        an object that also have associated methods. It initializes the player turn to be blue to start. It initializes
-        an empty board using '-------' as placeholders for empty spots. It also calls update board to set the initial
-        placements for each piece
+        This will initialize the game. It sets the initial state to UNFINISHED. The red and blue pieces are clones of
+        the starting template, which is built from the Red and Blue classes the first time a game is created (see
+        get_starting_template()), so each new game only has to copy 32 pieces instead of building both teams. It
+        initializes the player turn to be blue to start and an empty board using '-------' as placeholders for empty
+        spots, with each piece placed on it. _history is the stack of moves made so far, used by pop() to take moves
+        back. _hash is the Zobrist hash of the position, kept up to date by push() and pop(). If a TranspositionTable
+        is passed in, legality, check and checkmate results are stored in it and looked up by hash instead of being
+        worked out again. _pins caches get_pins() for the last position and team it was worked out for, and _start
+        is the snapshot of the position the move history starts from when it isn't the starting position
         """
+        template = get_starting_template()
         self._game_state = 'UNFINISHED'
-        self._red_pieces = Red().get_red_pieces()
-        self._blue_pieces = Blue().get_blue_pieces()
+        self._history = []
         self._player_turn = 'blue'
-        self._board = \
-            [
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-                ['-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------', '-------'],
-            ]
-        self.update_board()
+        self._board = [['-------'] * 9 for row in range(10)]
+        self._red_pieces = []
+        self._blue_pieces = []
+        for pieces, template_pieces in [[self._red_pieces, template['red']], [self._blue_pieces, template['blue']]]:
+            for template_piece in template_pieces:
+                piece = template_piece.clone()
+                position = piece.get_position()
+                self._board[position[0]][position[1]] = piece
+                pieces.append(piece)
+        self._generals = {'red': self._red_pieces[template['generals']['red']],
+                          'blue': self._blue_pieces[template['generals']['blue']]}
+        self._table = transposition_table
+        self._pins = None
+        self._start = None
+        self._hash = template['hash']
+        self.reset_position_history()
+
+    def compute_hash(self):
+        """works out the Zobrist hash of the position from scratch"""
+        position_hash = 0
+        for piece in self._red_pieces + self._blue_pieces:
+            position = piece.get_position()
+            position_hash ^= ZOBRIST_PIECES[piece.get_name()][position[0] * 9 + position[1]]
+        if self._player_turn == 'red':
+            position_hash ^= ZOBRIST_RED_TO_MOVE
+        return position_hash
+
+    def get_hash(self):
+        """returns the Zobrist hash of the current position"""
+        return self._hash
+
+    def reset_position_history(self):
+        """
+        starts the position history over from the current position. _position_counts holds how many times each
+        position hash has come up, _position_plies the plies it came up on (0 is the position the history starts from)
+        and _check_streaks, one entry per move in _history, how many moves in a row the side that made the move has
+        given check. Repetition rules are off until set_repetition_rules() is called
+        """
+        self._position_counts = {self._hash: 1}
+        self._position_plies = {self._hash: [0]}
+        self._check_streaks = []
+        self._repetition_rules = None
+
+    def set_repetition_rules(self, limit=3, repetition='draw', perpetual_check='loss'):
+        """
+        turns on repetition rules for make_move() and try_move(). Once the same position comes up limit times the game
+        ends: if one side gave check on every one of its moves since the position last came up it is perpetual check
+        and perpetual_check decides the result, otherwise repetition does. Each is one of REPETITION_OUTCOMES, 'draw' or
+        'loss' for the side that repeated (or kept giving check). Passing None for the limit turns the rules off
+        """
+        if repetition not in REPETITION_OUTCOMES or perpetual_check not in REPETITION_OUTCOMES:
+            raise ValueError('repetition outcomes must be one of ' + ', '.join(REPETITION_OUTCOMES))
+        if limit is None:
+            self._repetition_rules = None
+        elif limit < 2:
+            raise ValueError('repetition limit must be at least 2')
+        else:
+            self._repetition_rules = (limit, repetition, perpetual_check)
+
+    def get_repetition_rules(self):
+        """returns the (limit, repetition, perpetual check) rules set with set_repetition_rules(), or None if off"""
+        return self._repetition_rules
+
+    def get_repetition_count(self):
+        """returns how many times the current position has come up, counting this time"""
+        return self._position_counts[self._hash]
+
+    def is_repetition(self):
+        """returns True if the current position has come up before"""
+        return self._position_counts[self._hash] > 1
+
+    def snapshot(self):
+        """
+        returns the position packed into 92 bytes (see PIECE_CODES at the top of the file), the board squares row by
+        row then the player turn and game state. It is much smaller than a live game, which holds a piece object for
+        each piece and takes about 8 KB, and can be turned back into one with from_snapshot(). The move history isn't
+        included
+        """
+        data = bytearray(92)
+        for pieces in [self._red_pieces, self._blue_pieces]:
+            for piece in pieces:
+                position = piece.get_position()
+                data[position[0] * 9 + position[1]] = piece.get_code()
+        data[90] = TEAM_CODES.index(self._player_turn)
+        data[91] = GAME_STATES.index(self._game_state)
+        return bytes(data)
+
+    @classmethod
+    def from_snapshot(cls, data, transposition_table=None):
+        """
+        creates a game from bytes made by snapshot(). The pieces are created straight from the codes instead of
+        building the Red and Blue teams, and the game starts with an empty move history
+        """
+        game = cls.__new__(cls)
+        game._game_state = GAME_STATES[data[91]]
+        game._player_turn = TEAM_CODES[data[90]]
+        game._red_pieces = []
+        game._blue_pieces = []
+        game._generals = {}
+        game._history = []
+        game._board = [['-------'] * 9 for row in range(10)]
+        for index in range(90):
+            code = data[index]
+            if code == 0:
+                continue
+            team = 'red' if code < 9 else 'blue'
+            row, column = divmod(index, 9)
+            piece = PIECE_CLASSES[PIECE_TYPES[(code - 1) % 8]](team, [row, column])
+            pieces = game._red_pieces if team == 'red' else game._blue_pieces
+            piece.set_slot(len(pieces))
+            pieces.append(piece)
+            game._board[row][column] = piece
+            if piece.get_type() == 'General':
+                game._generals[team] = piece
+        game._table = transposition_table
+        game._pins = None
+        game._start = bytes(data[:92])
+        game._hash = game.compute_hash()
+        game.reset_position_history()
+        return game
+
+    @classmethod
+    def from_fen(cls, fen, transposition_table=None):
+        """
+        creates a game from a text position made by to_fen() or starting_fen(), building the board and the piece lists
+        straight from it. Raises ValueError if the text isn't a position, or either team doesn't have exactly one
+        general in its palace. The game starts with an empty move history
+        """
+        fields = fen.split()
+        if len(fields) != 3 or fields[1] not in FEN_TURNS or fields[2] not in GAME_STATES:
+            raise ValueError('position must be the ranks, the player turn (b or r) and the game state: ' + fen)
+        ranks = fields[0].split('/')
+        if len(ranks) != 10:
+            raise ValueError('position must have 10 ranks: ' + fen)
+        data = bytearray(92)
+        generals = {'red': [], 'blue': []}
+        for rank in range(10):
+            row = 9 - rank
+            column = 0
+            for letter in ranks[rank]:
+                if letter.isdigit():
+                    column += int(letter)
+                    continue
+                if letter.lower() not in FEN_LETTERS or column > 8:
+                    raise ValueError('bad square ' + letter + ' on rank ' + str(row + 1) + ': ' + fen)
+                team = 'blue' if letter.isupper() else 'red'
+                data[row * 9 + column] = PIECE_CODES[team[0] + PIECE_TYPES[FEN_LETTERS.index(letter.lower())]]
+                if letter.lower() == 'k':
+                    generals[team].append([row, column])
+                column += 1
+            if column != 9:
+                raise ValueError('rank ' + str(row + 1) + ' must have 9 squares: ' + fen)
+        for team, palace in [['red', RED_PALACE], ['blue', BLUE_PALACE]]:
+            if len(generals[team]) != 1 or generals[team][0] not in palace:
+                raise ValueError(team + ' must have one general in its palace: ' + fen)
+        data[90] = FEN_TURNS.index(fields[1])
+        data[91] = GAME_STATES.index(fields[2])
+        return cls.from_snapshot(data, transposition_table)
+
+    def to_fen(self):
+        """returns the position as text that from_fen() can load, see FEN_LETTERS at the top of the file"""
+        ranks = []
+        for row in range(9, -1, -1):
+            rank = ''
+            empty = 0
+            for item in self._board[row]:
+                if item == '-------':
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = FEN_LETTERS[PIECE_TYPES.index(item.get_type())]
+                rank += letter.upper() if item.get_team() == 'blue' else letter
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        return '/'.join(ranks) + ' ' + FEN_TURNS[TEAM_CODES.index(self._player_turn)] + ' ' + self._game_state
+
+    def copy(self):
+        """
+        returns a new game in the same position, for trying out moves without touching this one. It shares this game's
+        transposition table and repetition rules but not its move history, so moves made before the copy can't be taken
+        back with pop() and don't count towards repetitions. The pieces are cloned straight onto a new board, the same
+        way JanggiGame() clones the starting template, so copying costs about as much as creating a new game
+        """
+        game = self.__class__.__new__(self.__class__)
+        game._game_state = self._game_state
+        game._player_turn = self._player_turn
+        game._history = []
+        game._board = [['-------'] * 9 for row in range(10)]
+        game._red_pieces = []
+        game._blue_pieces = []
+        for pieces, own_pieces in [[game._red_pieces, self._red_pieces], [game._blue_pieces, self._blue_pieces]]:
+            for own_piece in own_pieces:
+                piece = own_piece.clone()
+                position = piece.get_position()
+                game._board[position[0]][position[1]] = piece
+                pieces.append(piece)
+        game._generals = {}
+        for team, general in self._generals.items():
+            game._generals[team] = game.get_team_pieces(team)[general.get_slot()]
+        game._table = self._table
+        game._pins = None
+        # with no moves made this game is still in the position its history started from, so that is the copy's start
+        game._start = self._start if not self._history else self.snapshot()
+        game._hash = self._hash
+        game.reset_position_history()
+        game._repetition_rules = self._repetition_rules
+        return game
 
     def print_board(self):
         """
@@ -81,6 +484,14 @@ class JanggiGame:
         else:
             self._player_turn = 'blue'
 
+    def get_player_turn(self):
+        """returns 'red' or 'blue' for whoever's turn it is"""
+        return self._player_turn
+
+    def get_board(self):
+        """returns the board, a 10 x 9 list of lists holding pieces or '-------' for empty squares"""
+        return self._board
+
     def get_item_from_location(self, location):
         """Takes a current location (a1, b6, etc.) and returns the item at that location on the board"""
         location = self.convert_position(location)
@@ -90,49 +501,234 @@ class JanggiGame:
         """
         takes a current location and new location and moves the desired piece if it is a legal move.
         Also, it will check if the games state needs to be updated. It will return False if the move is not legal
-        or if one team has already won. It will return True on a successful move and call change_player_turn()
+        or if one team has already won. It will return True on a successful move and call change_player_turn().
+        It prints why a move wasn't made, use try_move() to get the reason back instead
         """
-        item_to_move = self.get_item_from_location(current_location)
-        if item_to_move == "-------" or item_to_move.get_team() != self._player_turn:
+        result = self.try_move(current_location, new_location)
+        if result == 'OK':
+            return True
+        if result == 'GAME_OVER':
+            print(self._game_state)
+        else:
             print("Illegal move, please try again. It's currently " + self._player_turn + "'s turn")
-            return False
+        return False
 
+    def try_move(self, current_location, new_location):
+        """
+        makes the move the same way as make_move() but without printing anything. Returns 'OK' if the move was made,
+        otherwise one of the reasons listed in MOVE_RESULTS at the top of the file
+        """
+        if not self.is_valid_location(current_location) or not self.is_valid_location(new_location):
+            return 'INVALID_SQUARE'
+        item_to_move = self.get_item_from_location(current_location)
+        if item_to_move == "-------":
+            return 'EMPTY_SQUARE'
+        if item_to_move.get_team() != self._player_turn:
+            return 'NOT_YOUR_TURN'
         if self._game_state != 'UNFINISHED':
-            print(self._game_state)
-            return False
+            return 'GAME_OVER'
 
         current = self.convert_position(current_location)
         new = self.convert_position(new_location)
-        if self._player_turn == 'red':
-            if self.is_legal(item_to_move, current, new):
-                if self._board[new[0]][new[1]] != '-------' and self._board[new[0]][new[1]] != item_to_move:
-                    self.remove_piece('blue', new_location)
-                item_to_move.set_position(new)
-                self._board[current[0]][current[1]] = '-------'
-                self.change_player_turn()
-                self.update_board()
-                if self.is_in_check('blue'):
-                    if self.check_mate('blue'):
-                        self._game_state = 'RED_WON'
-                return True
-            else:
-                print("Illegal move, please try again. It's currently " + self._player_turn + "'s turn")
-                return False
-        elif self._player_turn == 'blue':
-            if self.is_legal(item_to_move, current, new):
-                if self._board[new[0]][new[1]] != '-------' and self._board[new[0]][new[1]] != item_to_move:
-                    self.remove_piece('red', new_location)
-                item_to_move.set_position(new)
-                self._board[current[0]][current[1]] = '-------'
-                self.change_player_turn()
-                self.update_board()
-                if self.is_in_check('red'):
-                    if self.check_mate('red'):
-                        self._game_state = 'BLUE_WON'
-                return True
-            else:
-                print("Illegal move, please try again. It's currently " + self._player_turn + "'s turn")
-                return False
+        if not self.is_legal(item_to_move, current, new):
+            return self.get_illegal_reason(item_to_move, current, new)
+
+        self.push((current, new))
+        opponent = self._player_turn
+        if self.record_check() and self.check_mate(opponent):
+            self.set_winner(item_to_move.get_team())
+            return 'OK'
+        if self._repetition_rules is not None and self._position_counts[self._hash] >= self._repetition_rules[0]:
+            self.end_by_repetition(item_to_move.get_team(), opponent)
+        return 'OK'
+
+    def record_check(self):
+        """
+        after a move made with push(), looks at whether it put the other side in check and if so adds it to the mover's
+        check streak, which end_by_repetition() uses to find perpetual check. Returns True if the move gave check
+        """
+        if not self.is_in_check(self._player_turn):
+            return False
+        streaks = self._check_streaks
+        streaks[-1] = streaks[-3] + 1 if len(streaks) > 2 else 1
+        return True
+
+    def replay(self, moves):
+        """
+        makes each (current, new) move of board coordinates in the list with push() without checking it, for rebuilding
+        a saved game. Checks are recorded like try_move() does, so perpetual check is still found after the moves are
+        replayed, but the game state isn't changed
+        """
+        for move in moves:
+            self.push(move)
+            self.record_check()
+
+    def set_winner(self, team):
+        """ends the game with a win for the team"""
+        if team == 'red':
+            self._game_state = 'RED_WON'
+        else:
+            self._game_state = 'BLUE_WON'
+
+    def end_by_repetition(self, mover, opponent):
+        """
+        ends the game once the position has repeated too often, following the rules from set_repetition_rules(). The
+        positions since the last time it came up make the cycle, and a side whose check streak covers all of its moves
+        in the cycle is giving perpetual check. Otherwise the mover, who made the position come up again, is the side
+        that repeated
+        """
+        limit, repetition, perpetual_check = self._repetition_rules
+        plies = self._position_plies[self._hash]
+        cycle = plies[-1] - plies[-2]
+        streaks = self._check_streaks
+        if streaks[-1] * 2 >= cycle:
+            outcome, loser = perpetual_check, mover
+        elif len(streaks) > 1 and streaks[-2] * 2 >= cycle:
+            outcome, loser = perpetual_check, opponent
+        else:
+            outcome, loser = repetition, mover
+        if outcome == 'draw':
+            self._game_state = 'DRAW'
+        elif loser == 'red':
+            self._game_state = 'BLUE_WON'
+        else:
+            self._game_state = 'RED_WON'
+
+    def apply_moves(self, moves):
+        """
+        makes each (current, new) move in the list in turn with try_move(), stopping at the first one that isn't made.
+        Returns the number of moves made and the result of the last move tried ('OK' if every move was made)
+        """
+        count = 0
+        for current_location, new_location in moves:
+            result = self.try_move(current_location, new_location)
+            if result != 'OK':
+                return count, result
+            count += 1
+        return count, 'OK'
+
+    def get_illegal_reason(self, item, current, new):
+        """returns why is_legal() turned down a move, only worked out once a move has already failed"""
+        if current == new:
+            return 'PASS_IN_CHECK'
+        if item.is_friendly(self._board, new):
+            return 'OWN_PIECE'
+        if not item.is_in_move_set(current, new):
+            return 'NOT_IN_MOVE_SET'
+        if not item.check_move(current, new, self._board):
+            return 'BLOCKED'
+        return 'LEAVES_IN_CHECK'
+
+    def push(self, move):
+        """
+        Makes a move without checking if it is legal. The move is a (current, new) tuple of board coordinates, and
+        moving a piece to the square it is already on passes the turn. The board, both teams' piece lists and whose
+        turn it is are all updated directly, and everything needed to take the move back is saved on the history
+        stack so pop() can undo it. The new position is also counted in the position history used for repetitions.
+        """
+        current, new = move
+        piece = self._board[current[0]][current[1]]
+        captured = '-------'
+        slot = None
+        previous_hash = self._hash
+        if current != new:
+            captured = self._board[new[0]][new[1]]
+            keys = ZOBRIST_PIECES[piece.get_name()]
+            self._hash ^= keys[current[0] * 9 + current[1]] ^ keys[new[0] * 9 + new[1]]
+            if captured != '-------':
+                slot = self.remove_from_team(captured)
+                self._hash ^= ZOBRIST_PIECES[captured.get_name()][new[0] * 9 + new[1]]
+            self._board[current[0]][current[1]] = '-------'
+            self._board[new[0]][new[1]] = piece
+            piece.set_position(new)
+        self._history.append((current, new, captured, slot, self._game_state, previous_hash))
+        self._hash ^= ZOBRIST_RED_TO_MOVE
+        self.change_player_turn()
+        position_hash = self._hash
+        self._position_counts[position_hash] = self._position_counts.get(position_hash, 0) + 1
+        plies = self._position_plies.get(position_hash)
+        if plies is None:
+            self._position_plies[position_hash] = [len(self._history)]
+        else:
+            plies.append(len(self._history))
+        self._check_streaks.append(0)
+
+    def pop(self):
+        """
+        Takes back the last move made with push() (or make_move()) and puts the board, piece lists, game state and
+        player turn back the way they were, taking the position off the position history. Returns the (current, new)
+        move that was taken back.
+        """
+        count = self._position_counts[self._hash] - 1
+        if count:
+            self._position_counts[self._hash] = count
+            self._position_plies[self._hash].pop()
+        else:
+            del self._position_counts[self._hash]
+            del self._position_plies[self._hash]
+        self._check_streaks.pop()
+        current, new, captured, slot, game_state, position_hash = self._history.pop()
+        if current != new:
+            piece = self._board[new[0]][new[1]]
+            piece.set_position(current)
+            self._board[current[0]][current[1]] = piece
+            self._board[new[0]][new[1]] = captured
+            if captured != '-------':
+                self.restore_to_team(captured, slot)
+        self._game_state = game_state
+        self._hash = position_hash
+        self.change_player_turn()
+        return current, new
+
+    def get_start_snapshot(self):
+        """
+        returns the snapshot() of the position the move history starts from, or None if it is the normal starting
+        position
+        """
+        return self._start
+
+    def get_move_history(self):
+        """returns every move made so far as a list of (current, new) tuples in algebraic notation"""
+        moves = []
+        for entry in self._history:
+            moves.append((self.convert_to_algebraic(entry[0]), self.convert_to_algebraic(entry[1])))
+        return moves
+
+    def get_general(self, team):
+        """returns the general piece for the team"""
+        return self._generals[team]
+
+    def get_team_pieces(self, team):
+        """returns the list of pieces still on the board for the team"""
+        if team == 'red':
+            return self._red_pieces
+        return self._blue_pieces
+
+    def remove_from_team(self, piece):
+        """
+        Removes a captured piece from its team's piece list without searching for it. Each piece remembers its slot in
+        the list, so the last piece in the list is moved into that slot. Returns the slot so restore_to_team() can put
+        it back
+        """
+        pieces = self.get_team_pieces(piece.get_team())
+        slot = piece.get_slot()
+        last = pieces.pop()
+        if last is not piece:
+            pieces[slot] = last
+            last.set_slot(slot)
+        return slot
+
+    def restore_to_team(self, piece, slot):
+        """puts a piece taken out by remove_from_team() back into the same slot, undoing the swap"""
+        pieces = self.get_team_pieces(piece.get_team())
+        if slot == len(pieces):
+            pieces.append(piece)
+        else:
+            moved = pieces[slot]
+            moved.set_slot(len(pieces))
+            pieces.append(moved)
+            pieces[slot] = piece
+        piece.set_slot(slot)
 
     def update_board(self):
         """
@@ -152,122 +748,350 @@ class JanggiGame:
     def is_in_check(self, team):
         """
         This method will check if a team is in check. The "team" parameter must be either 'red' or 'blue'.
-        It will check all the opposing teams pieces to see if they have any legal moves that would land them on the
-        general of the team passed as a parameter. Returns True if that team is in check and False if not.
+        It starts from the team's general and works outward to find any enemy piece that could land on it.
+        Returns True if that team is in check and False if not.
         """
-
-        # see if red is in check --> loop through other teams pieces and see if any of them have valid moves to land on
-        # the red team's general
+        if team != 'red' and team != 'blue':
+            return False
+        if self._table is not None:
+            key = self._hash ^ ZOBRIST_CHECK[team]
+            in_check = self._table.probe(key)
+            if in_check is not None:
+                return in_check
         if team == 'red':
-            red_general_location = []
-            for item in self._red_pieces:
-                if item.get_name() == 'rGeneral':
-                    red_general_location = item.get_position()
+            in_check = self.is_general_attacked(self._generals['red'].get_position(), 'blue')
+        else:
+            in_check = self.is_general_attacked(self._generals['blue'].get_position(), 'red')
+        if self._table is not None:
+            self._table.store(key, in_check)
+        return in_check
+
+    def is_general_attacked(self, general, enemy):
+        """
+        Returns True if any piece from the enemy team could capture a general standing on the general square.
+        Instead of asking every enemy piece if it can reach the general, it looks outward from the general:
+        along the files, ranks and palace diagonals for a chariot with nothing in between, or a cannon with exactly one
+        screen that isn't a cannon, then at the squares a horse or elephant would have to start from along with the
+        squares that could block them, and then at the squares next to the general for soldiers.
+        """
+        board = self._board
+        index = general[0] * 9 + general[1]
+
+        for ray in RAYS[index]:
+            screened = False
+            for square in ray:
+                item = board[square[0]][square[1]]
+                if item == '-------':
+                    continue
+                if not screened:
+                    if item.get_type() == 'Cannon':  # a cannon can't be a screen for another cannon
+                        break
+                    if item.get_type() == 'Chariot' and item.get_team() == enemy:
+                        return True
+                    screened = True
+                else:
+                    if item.get_type() == 'Cannon' and item.get_team() == enemy:
+                        return True
                     break
-            for item in self._blue_pieces:
-                current = item.get_position()
-                if item.check_move(current, red_general_location, self._board):
+
+        # horse and elephant moves go both ways, so the squares they could reach from the general are the squares they
+        # could attack it from, and the blocking squares are looked up from there
+        for origin, block in HORSE_MOVES[index]:
+            item = board[origin[0]][origin[1]]
+            if item != '-------' and item.get_type() == 'Horse' and item.get_team() == enemy:
+                block = HORSE_BLOCKS[origin[0] * 9 + origin[1]][index]
+                if board[block[0]][block[1]] == '-------':
                     return True
-        # see if blue is in check --> loop through other teams pieces and see if any of them have valid moves to land
-        # on the blue team's general
-        if team == 'blue':
-            blue_general_location = []
-            for item in self._blue_pieces:
-                if item.get_name() == 'bGeneral':
-                    blue_general_location = item.get_position()
-                    break
-            for item in self._red_pieces:
-                current = item.get_position()
-                if item.check_move(current, blue_general_location, self._board):
+        for origin, blocks in ELEPHANT_MOVES[index]:
+            item = board[origin[0]][origin[1]]
+            if item != '-------' and item.get_type() == 'Elephant' and item.get_team() == enemy:
+                blocks = ELEPHANT_BLOCKS[origin[0] * 9 + origin[1]][index]
+                if board[blocks[0][0]][blocks[0][1]] == '-------' and board[blocks[1][0]][blocks[1][1]] == '-------':
                     return True
+
+        for origin in SOLDIER_ATTACKS[enemy][index]:
+            item = board[origin[0]][origin[1]]
+            if item != '-------' and item.get_type() == 'Soldier' and item.get_team() == enemy:
+                return True
         return False
 
     def check_mate(self, team):
         """
-        This method will be called if a team is in check. It will loop through all possible player movement options and
-        see if there are any legal moves that will take them out of being in check. If they have no moves that can bring
-        them out of being in check, they are in check mate and they lose the game. Returns True if they are in
-        check mate and False otherwise. It will update the game state to reflect who has won the game.
-        """
-        if self.is_in_check(team):
-
-            # Check Red Team pieces
-            if team == 'red':
-                for piece in self._red_pieces:
-                    current = piece.get_position()
-
-                    # Loop through every possible location on the board and see if its a valid move, if it is, see if it
-                    # will take them out of check
-                    new = [0, 0]
-                    while new[0] < 10 and new[1] < 9:
-                        if piece.check_move(current, new, self._board):
-                            piece.set_position(new)
-                            if self.is_in_check(team):
-                                piece.set_position(current)
-                            else:
-                                piece.set_position(current)
-                                return False
-                        if new[1] == 8:
-                            new[1] = 0
-                            new[0] += 1
-                        else:
-                            new[1] += 1
-            # Check Blue team pieces
-            else:
-                # Loop through each piece and see if any moves are available to get them out of being in check
-                for piece in self._blue_pieces:
-                    current = piece.get_position()
-
-                    # Loop through every possible location on the board and see if its a valid move, if it is, see if it
-                    # will take them out of check
-                    new = [0, 0]
-                    while new[0] < 10 and new[1] < 9:
-                        if piece.check_move(current, new, self._board):
-                            piece.set_position(new)
-                            if self.is_in_check(team):
-                                piece.set_position(current)
-                            else:
-                                piece.set_position(current)
-                                return False
-                        if new[1] == 8:
-                            new[1] = 0
-                            new[0] += 1
-                        else:
-                            new[1] += 1
-                return True
-        else:
+        This method will be called if a team is in check. It will go through the legal moves the team has available
+        and see if any of them take them out of being in check. If they have no moves that can bring them out of being
+        in check, they are in check mate and they lose the game. Only the replies iter_evasions() comes up with are
+        tried. Returns True if they are in check mate and False otherwise.
+        """
+        if not self.is_in_check(team):
             return False
+        if self._table is not None:
+            key = self._hash ^ ZOBRIST_MATE[team]
+            mate = self._table.probe(key)
+            if mate is not None:
+                return mate
+        mate = True
+        for move in self.iter_evasions(team):
+            mate = False
+            break
+        if self._table is not None:
+            self._table.store(key, mate)
+        return mate
+
+    def get_checks(self, team):
+        """
+        Returns the enemy pieces giving check to the team's general as a list of dictionaries, one per checking piece,
+        each mapping square index to square for every square the check depends on: the checking piece itself and
+        - for a chariot, the empty squares between it and the general
+        - for a cannon, the squares between it and the general, which are its one screen and empty squares where a
+          second screen would stop the check
+        - for a horse or elephant, the squares it has to pass through
+        A move that doesn't leave or land on one of those squares can't stop that check. Works the same way as
+        is_general_attacked()
+        """
+        board = self._board
+        general = self._generals[team].get_position()
+        index = general[0] * 9 + general[1]
+        enemy = 'blue' if team == 'red' else 'red'
+        checks = []
+
+        for ray in RAYS[index]:
+            screened = False
+            for length in range(len(ray)):
+                square = ray[length]
+                item = board[square[0]][square[1]]
+                if item == '-------':
+                    continue
+                if not screened:
+                    if item.get_type() == 'Cannon':
+                        break
+                    if item.get_type() == 'Chariot' and item.get_team() == enemy:
+                        checks.append(dict((square[0] * 9 + square[1], square) for square in ray[:length + 1]))
+                        break
+                    screened = True
+                else:
+                    if item.get_type() == 'Cannon' and item.get_team() == enemy:
+                        checks.append(dict((square[0] * 9 + square[1], square) for square in ray[:length + 1]))
+                    break
+
+        for origin, block in HORSE_MOVES[index]:
+            item = board[origin[0]][origin[1]]
+            if item != '-------' and item.get_type() == 'Horse' and item.get_team() == enemy:
+                block = HORSE_BLOCKS[origin[0] * 9 + origin[1]][index]
+                if board[block[0]][block[1]] == '-------':
+                    checks.append(dict((square[0] * 9 + square[1], square) for square in [origin, block]))
+        for origin, blocks in ELEPHANT_MOVES[index]:
+            item = board[origin[0]][origin[1]]
+            if item != '-------' and item.get_type() == 'Elephant' and item.get_team() == enemy:
+                blocks = ELEPHANT_BLOCKS[origin[0] * 9 + origin[1]][index]
+                if board[blocks[0][0]][blocks[0][1]] == '-------' and board[blocks[1][0]][blocks[1][1]] == '-------':
+                    checks.append(dict((square[0] * 9 + square[1], square) for square in [origin] + blocks))
+
+        for origin in SOLDIER_ATTACKS[enemy][index]:
+            item = board[origin[0]][origin[1]]
+            if item != '-------' and item.get_type() == 'Soldier' and item.get_team() == enemy:
+                checks.append({origin[0] * 9 + origin[1]: origin})
+        return checks
+
+    def iter_evasions(self, team):
+        """
+        Yields every legal move for a team that is in check, as (piece, current, new) like iter_legal_moves(), without
+        generating every move the team has. Only these moves can answer a check:
+        - moving the general, which is always tried
+        - moving a piece off a square a check depends on (see get_checks()), like a cannon's screen or a piece that
+          would be a second screen, which is tried with all of that piece's moves
+        - moving a piece onto a square every check depends on, capturing the checking piece, blocking it or adding a
+          screen to a cannon. Each piece only has those few squares tested with check_move()
+        Each move that passes is then tried with leaves_in_check(), since it may stop one check and give another
+        """
+        board = self._board
+        general = self._generals[team]
+        checks = self.get_checks(team)
+        targets = dict(checks[0]) if checks else {}
+        touched = set(targets)
+        for check in checks[1:]:
+            touched.update(check)
+            for index in list(targets):
+                if index not in check:
+                    del targets[index]
+        for piece in list(self.get_team_pieces(team)):
+            current = piece.get_position()
+            if piece is general or current[0] * 9 + current[1] in touched:
+                for new in piece.generate_moves(current, board):
+                    if not self.leaves_in_check(piece, current, new):
+                        yield piece, current, new
+                continue
+            for new in targets.values():
+                if piece.check_move(current, new, board) and not self.leaves_in_check(piece, current, new):
+                    yield piece, current, new
+
+    def iter_legal_moves(self, team):
+        """
+        Yields every legal move for a team as (piece, current, new) where current and new are board coordinates.
+        Each piece only generates the squares it can actually reach (see generate_moves()), and each of those is
+        then tested to make sure it does not leave the team's general in check, unless get_pins() shows the move can't
+        expose the general. When the team is in check the moves come from iter_evasions(). Passing is not included.
+        """
+        if team == 'red':
+            pieces = self._red_pieces
+        else:
+            pieces = self._blue_pieces
+        pins = self.get_pins(team)
+        if pins is None:  # in check
+            for move in self.iter_evasions(team):
+                yield move
+            return
+        for piece in list(pieces):
+            current = piece.get_position()
+            if piece.get_type() != 'General' and current[0] * 9 + current[1] not in pins:
+                for new in piece.generate_moves(current, self._board):
+                    if new[0] * 9 + new[1] not in pins or not self.leaves_in_check(piece, current, new):
+                        yield piece, current, new
+                continue
+            for new in piece.generate_moves(current, self._board):
+                if not self.leaves_in_check(piece, current, new):
+                    yield piece, current, new
+
+    def legal_moves(self, team):
+        """
+        Returns a list of every legal move for the team ('red' or 'blue') as (current, new) tuples written in the same
+        algebraic notation make_move() takes, e.g. ('a7', 'b7'). Passing is not included.
+        """
+        moves = []
+        for piece, current, new in self.iter_legal_moves(team):
+            moves.append((self.convert_to_algebraic(current), self.convert_to_algebraic(new)))
+        return moves
+
+    def legal_moves_from(self, location):
+        """
+        Takes a location (a1, b6, etc.) and returns a list of every square, in algebraic notation, the piece on that
+        square can legally move to. Returns an empty list if the square is empty.
+        """
+        piece = self.get_item_from_location(location)
+        if piece == '-------':
+            return []
+        current = piece.get_position()
+        moves = []
+        for new in piece.generate_moves(current, self._board):
+            if not self.leaves_in_check(piece, current, new):
+                moves.append(self.convert_to_algebraic(new))
+        return moves
+
+    def leaves_in_check(self, piece, current, new):
+        """
+        Tries moving a piece from current to new with push() and returns True if that would leave its own general in
+        check, then takes the move back with pop()
+        """
+        self.push((current, new))
+        in_check = self.is_in_check(piece.get_team())
+        self.pop()
+        return in_check
+
+    def get_pins(self, team):
+        """
+        Returns the set of square indexes where a move by the team, leaving the square or landing on it, could expose
+        its general to attack, or None if the team is in check (when every move has to be tried). Moves by any piece
+        other than the general that don't touch these squares can't put the general in check, so they don't need to be
+        tried with leaves_in_check(). The squares are:
+        - along each file, rank and palace diagonal from the general, every square up to the third piece if one of
+          those pieces is an enemy chariot or cannon. That covers the pieces pinned against a chariot, the screens of
+          a cannon (taking away one of two screens, or putting one in front of a cannon with none) and a cannon
+          that is being captured or moved out of the way of another cannon
+        - the square blocking an enemy horse's move onto the general, and the one square left blocking an enemy
+          elephant's move when only one of its two is taken
+        Soldiers can't be blocked, so they never pin anything. The set is worked out once per position and team and
+        kept in _pins until the position changes
+        """
+        pins = self._pins
+        if pins is not None and pins[0] == self._hash and pins[1] == team:
+            return pins[2]
+        squares = None
+        if not self.is_in_check(team):
+            squares = set()
+            board = self._board
+            general = self._generals[team].get_position()
+            index = general[0] * 9 + general[1]
+            enemy = 'blue' if team == 'red' else 'red'
+            for ray in RAYS[index]:
+                pieces = 0
+                slider = False
+                for length in range(len(ray)):
+                    item = board[ray[length][0]][ray[length][1]]
+                    if item == '-------':
+                        continue
+                    if item.get_team() == enemy and (item.get_type() == 'Chariot' or item.get_type() == 'Cannon'):
+                        slider = True
+                    pieces += 1
+                    if pieces == 3:
+                        break
+                if slider:
+                    for square in ray[:length + 1]:
+                        squares.add(square[0] * 9 + square[1])
+            for origin, block in HORSE_MOVES[index]:
+                item = board[origin[0]][origin[1]]
+                if item != '-------' and item.get_type() == 'Horse' and item.get_team() == enemy:
+                    block = HORSE_BLOCKS[origin[0] * 9 + origin[1]][index]
+                    squares.add(block[0] * 9 + block[1])
+            for origin, blocks in ELEPHANT_MOVES[index]:
+                item = board[origin[0]][origin[1]]
+                if item != '-------' and item.get_type() == 'Elephant' and item.get_team() == enemy:
+                    blocks = ELEPHANT_BLOCKS[origin[0] * 9 + origin[1]][index]
+                    first = board[blocks[0][0]][blocks[0][1]] == '-------'
+                    second = board[blocks[1][0]][blocks[1][1]] == '-------'
+                    if first != second:
+                        square = blocks[1] if first else blocks[0]
+                        squares.add(square[0] * 9 + square[1])
+        self._pins = (self._hash, team, squares)
+        return squares
 
     def is_legal(self, item, current, new):
         """
         This method will check if a move entered into make_move() is a legal move. It will use the same current and
         new location from make_move() to determine this. It will utilize the defined move set of the piece at the
-        current location and go through the board to determine if the move is legal.
+        current location and go through the board to determine if the move is legal. Moves that get_pins() shows can't
+        expose the general are only checked against the piece's move set, the rest are also tried with
+        leaves_in_check().
         """
         current_team = item.get_team()
 
-        if type(self._board[new[0]][new[1]]) is not str:  # check if the location to move to is empty or not
-            new_team = self._board[new[0]][new[1]].get_team()  # Says str has no method get_team(), the item it
-                                                                # references should never be a string
-            if current == new:  # check if they are not moving/ passing
-                if self.is_in_check(current_team):
-                    return False
-                return True
-            if current_team == new_team:  # make sure they can't move to their team pieces
-                return False
-        if item.check_move(current, new, self._board):
-            item.set_position(new)
+        if current == new:  # check if they are not moving/ passing
             if self.is_in_check(current_team):
-                item.set_position(current)
                 return False
             return True
-        else:
-            return False
+        if type(self._board[new[0]][new[1]]) is not str:  # check if the location to move to is empty or not
+            if self._board[new[0]][new[1]].get_team() == current_team:  # can't move onto their own team's pieces
+                return False
+        if item.get_type() != 'General':
+            pins = self.get_pins(current_team)
+            if pins is not None and current[0] * 9 + current[1] not in pins and new[0] * 9 + new[1] not in pins:
+                return item.check_move(current, new, self._board)  # can't expose the general, see get_pins()
+        if self._table is not None:
+            key = self._hash ^ ZOBRIST_MOVES[current[0] * 9 + current[1]][new[0] * 9 + new[1]]
+            legal = self._table.probe(key)
+            if legal is not None:
+                return legal
+        legal = item.check_move(current, new, self._board) and not self.leaves_in_check(item, current, new)
+        if self._table is not None:
+            self._table.store(key, legal)
+        return legal
 
     def get_game_state(self):
         """returns the current game state"""
         return self._game_state
 
+    def set_game_state(self, game_state):
+        """sets the game state, used when a game is rebuilt from its moves"""
+        self._game_state = game_state
+
+    def resign(self, team):
+        """ends the game with a win for the other team. Returns False if the game was already over"""
+        if self._game_state != 'UNFINISHED':
+            return False
+        if team == 'blue':
+            self._game_state = 'RED_WON'
+        else:
+            self._game_state = 'BLUE_WON'
+        return True
+
     def convert_position(self, position):
         """
         takes a position as a string with a letter and number for columns and rows.
@@ -295,26 +1119,96 @@ class JanggiGame:
             temp_position[1] = 8
         return temp_position
 
+    def is_valid_location(self, location):
+        """returns True if location is a square on the board, a letter from a to i then a number from 1 to 10"""
+        if type(location) is not str or len(location) < 2 or location[0] not in 'abcdefghi':
+            return False
+        return location[1:] in ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10']
+
+    def convert_to_algebraic(self, position):
+        """takes a position as a [row, column] array and converts it back to a string like a1 or b10"""
+        return 'abcdefghi'[position[1]] + str(position[0] + 1)
+
     def remove_piece(self, team, position):
-        """removes a piece from the teams list of pieces. Returns True if item is removed, and False otherwise"""
+        """
+        removes a piece from the teams list of pieces. Returns True if item is removed, and False otherwise. The hash
+        is updated and the new position counted in the position history, but the removal isn't a move, so moves made
+        before it can't be taken back with pop()
+        """
         position = self.convert_position(position)
         piece = self._board[position[0]][position[1]]
-        if team == 'blue':
-            for item in self._blue_pieces:
-                if item == piece:
-                    self._blue_pieces.remove(item)
-                    self._board[position[0]][position[1]] = '-------'
-                    self.update_board()
-                    return True
+        if piece == '-------' or piece.get_team() != team:
             return False
-        else:
-            for item in self._red_pieces:
-                if item == piece:
-                    self._red_pieces.remove(item)
-                    self._board[position[0]][position[1]] = '-------'
-                    self.update_board()
-                    return True
+        self.remove_from_team(piece)
+        self._board[position[0]][position[1]] = '-------'
+        if piece.get_type() == 'General':
+            del self._generals[team]
+        self._hash ^= ZOBRIST_PIECES[piece.get_name()][position[0] * 9 + position[1]]
+        self._position_counts[self._hash] = self._position_counts.get(self._hash, 0) + 1
+        self._position_plies.setdefault(self._hash, []).append(len(self._history))
+        return True
+
+
+class TranspositionTable:
+    """
+    A fixed size table of results about positions, looked up by Zobrist hash. JanggiGame uses it to remember
+    legality, check and checkmate results, and the search engine uses it for search scores. The table never grows past
+    the memory it was given: each key maps to one slot (key modulo the number of slots), and when two keys want the
+    same slot the replacement policy decides which one is kept.
+    """
+
+    ENTRY_SIZE = 120  # rough number of bytes each slot uses, counting the key and value objects it holds
+
+    def __init__(self, memory_mb=16, replacement='depth'):
+        """
+        Creates an empty table using about memory_mb megabytes. replacement is either 'always', where a new result
+        always replaces what was in its slot, or 'depth', where a result from a deeper search is only replaced by one
+        from a search at least as deep (results stored with the same key always replace each other)
+        """
+        if replacement not in ['always', 'depth']:
+            raise ValueError("replacement must be 'always' or 'depth'")
+        self._size = max(1, int(memory_mb * 1024 * 1024) // self.ENTRY_SIZE)
+        self._replacement = replacement
+        self._keys = [None] * self._size
+        self._depths = [0] * self._size
+        self._values = [None] * self._size
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+
+    def probe(self, key):
+        """returns the value stored for the key, or None if there isn't one"""
+        slot = key % self._size
+        if self._keys[slot] == key:
+            self._hits += 1
+            return self._values[slot]
+        self._misses += 1
+        return None
+
+    def store(self, key, value, depth=0):
+        """
+        stores a value for the key. depth is how deep a search the value came from, 0 for exact results like
+        legality or checkmate. Returns True if the value was stored and False if the replacement policy kept the old one
+        """
+        slot = key % self._size
+        if self._replacement == 'depth' and self._keys[slot] is not None and self._keys[slot] != key and \
+                self._depths[slot] > depth:
             return False
+        self._keys[slot] = key
+        self._depths[slot] = depth
+        self._values[slot] = value
+        self._stores += 1
+        return True
+
+    def clear(self):
+        """empties the table"""
+        self._keys = [None] * self._size
+        self._depths = [0] * self._size
+        self._values = [None] * self._size
+
+    def get_stats(self):
+        """returns a dictionary with the number of slots, lookups that found a value (hits) or not (misses) and stores"""
+        return {'size': self._size, 'hits': self._hits, 'misses': self._misses, 'stores': self._stores}
 
 
 # The 'Piece' class is the parent to all the individual piece type classes and they all inherit from this class
@@ -323,22 +1217,26 @@ class Piece:
     Represents a board piece, each piece will inherit this class and build upon it for its own specifications
     """
 
+    __slots__ = ('_team', '_position', '_type', '_name', '_move_set', '_slot', '_palace', '_enemy_palace')
+
     def __init__(self, team, position):
         """
         initializes board piece. The team and position will be specified in the Red and Blue classes.
-        type, name, and move set will be specified by the class piece that inherits the functionality
+        type, name, and move set will be specified by the class piece that inherits the functionality. The palaces
+        are the lists shared by every piece
         """
         self._team = team
         self._position = position
         self._type = None
         self._name = None
         self._move_set = None
+        self._slot = None
         if team == 'red':
-            self._palace = [[0, 3], [0, 4], [0, 5], [1, 3], [1, 4], [1, 5], [2, 3], [2, 4], [2, 5]]
-            self._enemy_palace = [[7, 3], [7, 4], [7, 5], [8, 3], [8, 4], [8, 5], [9, 3], [9, 4], [9, 5]]
+            self._palace = RED_PALACE
+            self._enemy_palace = BLUE_PALACE
         else:
-            self._palace = [[7, 3], [7, 4], [7, 5], [8, 3], [8, 4], [8, 5], [9, 3], [9, 4], [9, 5]]
-            self._enemy_palace = [[0, 3], [0, 4], [0, 5], [1, 3], [1, 4], [1, 5], [2, 3], [2, 4], [2, 5]]
+            self._palace = BLUE_PALACE
+            self._enemy_palace = RED_PALACE
 
     def get_name(self):
         """returns the name of the board piece"""
@@ -352,6 +1250,23 @@ class Piece:
         """returns self._move_set"""
         return self._move_set
 
+    def clone(self):
+        """returns a new piece of the same type and team on the same square, with its own position list"""
+        piece = object.__new__(self.__class__)
+        piece._team = self._team
+        piece._position = list(self._position)
+        piece._type = self._type
+        piece._name = self._name
+        piece._move_set = self._move_set
+        piece._slot = self._slot
+        piece._palace = self._palace
+        piece._enemy_palace = self._enemy_palace
+        return piece
+
+    def get_code(self):
+        """returns the number used for the piece in a snapshot, see PIECE_CODES"""
+        return PIECE_CODES[self._name]
+
     def set_position(self, new_position):
         """
         takes an array for column and row and updates the current piece's position.
@@ -359,6 +1274,14 @@ class Piece:
         """
         self._position = new_position
 
+    def get_slot(self):
+        """returns the index of the piece in its team's piece list"""
+        return self._slot
+
+    def set_slot(self, slot):
+        """sets the index of the piece in its team's piece list, kept up to date by JanggiGame"""
+        self._slot = slot
+
     def get_type(self):
         """returns the item type"""
         return self._type
@@ -375,43 +1298,47 @@ class Piece:
         """returns the the enemy palace locations"""
         return self._enemy_palace
 
+    def get_palace_center(self, square):
+        """returns the center square of the palace the square is in, or None if it is not inside either palace"""
+        return get_palace_center(square)
+
+    def is_palace_diagonal_step(self, current, new):
+        """
+        returns True if current and new are next to each other along one of the diagonal lines drawn in a palace.
+        The diagonal lines only connect the four corners of a palace to its center.
+        """
+        return new in PALACE_DIAGONAL_STEPS[current[0] * 9 + current[1]]
+
+    def is_friendly(self, board, square):
+        """returns True if the square on the board holds a piece from the same team"""
+        item = board[square[0]][square[1]]
+        return item != '-------' and item.get_team() == self._team
+
+    def is_on_board(self, square):
+        """returns True if the square is inside the 10 x 9 board"""
+        return 0 <= square[0] < 10 and 0 <= square[1] < 9
+
     def is_in_team_palace(self, current, new):
         """if a piece is in the palace, they can call this function to allow for their additional move set"""
-        if new not in self._palace:
-            return False
-        else:
-            if current[0] == new[0]:
-                if current[1] + 1 == new[1]:
-                    return True
-                if current[1] - 1 == new[1]:
-                    return True
-            if current[1] == new[1]:
-                if current[0] + 1 == new[0]:
-                    return True
-                if current[0] - 1 == new[0]:
-                    return True
-            if [current[0] + 1, current[1] + 1] == new or [current[0] + 1, current[1] + -1] == new \
-                    or [current[0] - 1, current[1] + 1] == new or [current[0] - 1, current[1] - 1] == new:
-                return True
+        return new in self._palace and new in PALACE_STEPS[current[0] * 9 + current[1]]
 
     def is_in_enemy_palace(self, current, new):
         """if a piece is in the palace, they can call this function to allow for their additional move set"""
-        if new not in self._enemy_palace:
-            return False
-        else:
-            if current[0] == new[0]:
-                if current[1] + 1 == new[1]:
-                    return True
-                if current[1] - 1 == new[1]:
-                    return True
-            if current[1] == new[1]:
-                if current[0] + 1 == new[0]:
-                    return True
-                if current[0] - 1 == new[0]:
-                    return True
-            if [current[0] + 1, current[1] + 1] == new or [current[0] + 1, current[1] + -1] == new \
-                    or [current[0] - 1, current[1] + 1] == new or [current[0] - 1, current[1] - 1] == new:
-                return True
+        return new in self._enemy_palace and new in PALACE_STEPS[current[0] * 9 + current[1]]
+
+    def is_in_move_set(self, current, new):
+        """
+        returns True if the piece could move from current to new on an empty board. Each piece type overrides this,
+        it is used to tell a move the piece can't make from one that is blocked
+        """
+        return False
+
+    def generate_moves(self, current, board):
+        """
+        returns a list of every square this piece can reach from current following its move set. Each piece type
+        overrides this. The squares are not checked for leaving the general in check, JanggiGame does that.
+        """
+        return []
 
 
 class Chariot(Piece):
@@ -419,117 +1346,88 @@ class Chariot(Piece):
     Represents a chariot board piece
     """
 
+    __slots__ = ()
+
     def __init__(self, team, position):
         """Initialises a chariot object with its team+name and move set"""
         super().__init__(team, position)
         self._type = 'Chariot'
         self._name = team[0] + self._type
-        self._move_set = None
+        self._move_set = ORTHOGONAL_MOVE_SET
+
+    def is_in_move_set(self, current, new):
+        """returns True if new is on the same file, rank or palace diagonal as current"""
+        return new[0] * 9 + new[1] in LINES[current[0] * 9 + current[1]]
 
     def check_move(self, current, new, board):
         """
-        This method will check if a move is valid for any chariot piece. It starts by checking if it is in either palace
-        for special moves. If its not a palace move, it will check if its moving horizontal or vertical, then which
-        direction it is going. If it is a valid move, it will loop through each square between the starting position and
-        new position to make sure it's not being blocked. If the move has no issues it will return True, otherwise False
+        This method will check if a move is valid for any chariot piece. The new position has to be on the same file,
+        rank or palace diagonal as the current one, and every square in between has to be empty. If the move has
+        no issues it will return True, otherwise False
         """
-        red_palace_corners_and_center = [[0, 3], [0, 5], [2, 3], [2, 5], [2, 4]]
-        blue_palace_corners_and_center = [[9, 3], [9, 5], [7, 3], [7, 5], [8, 4]]
-
-        # moving in the palace
-        if current in red_palace_corners_and_center:
-            if new in red_palace_corners_and_center:
-                return True
-        if current in blue_palace_corners_and_center:
-            if new in blue_palace_corners_and_center:
-                return True
-
-        if current in self.get_enemy_palace():
-            if self.is_in_enemy_palace(current, new):
-                return True
-
-        if current in self.get_team_palace():
-            if self.is_in_team_palace(current, new):
-                return True
-
-        # moving horizontally
-        if current[0] == new[0] and current[1] != new[1]:
-            move_len = new[1] - current[1]
-            while move_len > 1:  # Loop from current to new to check for pieces in the way
-                if board[current[0]][move_len + current[1] - 1] != "-------":
-                    return False
-                move_len -= 1
-            while move_len < 0:  # same loop as above but for going left on the board
-                if board[current[0]][move_len + current[1]] != "-------":
-                    return False
-                move_len += 1
-            return True
-
-        # moving vertically
-        if current[0] != new[0] and current[1] == new[1]:
-            move_len = new[0] - current[0]
-
-            # Moving down the board
-            while move_len > 1:
-                if board[move_len + current[0] - 1][current[1]] != "-------":
-                    return False
-                move_len -= 1
-
-            # Moving up the board
-            while move_len < 0:
-                if board[move_len + current[0]][current[1]] != "-------":
-                    return False
-                move_len += 1
-            return True
-        else:
+        if self.is_friendly(board, new):
+            return False
+        between = LINES[current[0] * 9 + current[1]].get(new[0] * 9 + new[1])
+        if between is None:
             return False
+        for square in between:  # check for pieces in the way
+            if board[square[0]][square[1]] != "-------":
+                return False
+        return True
+
+    def generate_moves(self, current, board):
+        """
+        returns every square the chariot can reach. It slides along each ray until it hits the edge of the board or
+        another piece, which it can capture if it's an enemy.
+        """
+        moves = []
+        for ray in RAYS[current[0] * 9 + current[1]]:
+            for new in ray:
+                item = board[new[0]][new[1]]
+                if item != "-------":
+                    if item.get_team() != self._team:
+                        moves.append(new)
+                    break
+                moves.append(new)
+        return moves
 
 
 class Horse(Piece):
     """
-    Represents a chariot board piece
+    Represents a Horse board piece
     """
 
+    __slots__ = ()
+
     def __init__(self, team, position):
         """Initialises a Horse object with its team+name and move set"""
         super().__init__(team, position)
         self._type = 'Horse'
         self._name = team[0] + self._type
-        self._move_set = None
+        self._move_set = HORSE_MOVE_SET
+
+    def is_in_move_set(self, current, new):
+        """returns True if new is one of the 8 horse moves from current"""
+        return new[0] * 9 + new[1] in HORSE_BLOCKS[current[0] * 9 + current[1]]
 
     def check_move(self, current, new, board):
         """
-        validates movement for Horse pieces. First checks the initial vertical/horizontal movement to make sure it is
-        empty and not blocked. then it check if the new position is equal to the 8 possible moves a horse can make
-        and makes sure they are either empty of doesnt have a teammate in the desired new position
+        validates movement for Horse pieces. Looks up the square the horse has to pass through to reach the new
+        position, which doesn't exist if it isn't one of the 8 moves a horse can make, makes sure it is empty and not
+        blocked, and makes sure the new position is either empty or doesn't have a teammate in it
         """
+        block = HORSE_BLOCKS[current[0] * 9 + current[1]].get(new[0] * 9 + new[1])
+        if block is None or board[block[0]][block[1]] != "-------":
+            return False
+        return not self.is_friendly(board, new)
 
-        if current[0] + 2 == new[0]:  # moving down the board as first move
-            if board[current[0] + 1][current[1]] != "-------":
-                return False
-            if current[1] + 1 != new[1] and current[1] - 1 != new[1]:
-                return False
-        elif current[0] - 2 == new[0]:  # moving up the board as first move
-            if board[current[0] - 1][current[1]] != "-------":
-                return False
-            if current[1] + 1 != new[1] and current[1] - 1 != new[1]:
-                return False
-        elif current[1] + 2 == new[1]:  # moving to the right for first move
-            if board[current[0]][current[1] + 1] != "-------":
-                return False
-            if current[0] + 1 != new[0] and current[0] - 1 != new[0]:
-                return False
-        else:  # moving left for first move
-            if board[current[0]][current[1] - 1] != "-------":
-                return False
-            if current[0] + 1 != new[0] and current[0] - 1 != new[0]:
-                return False
-
-        # If we get this far its because the first move isn't blocked, now need to make sure the new location is empty/
-        # doesn't have a teammate
-
-        if board[new[0]][new[1]] == "-------" or board[new[0]][new[1]].get_team() != self._team:
-            return True
+    def generate_moves(self, current, board):
+        """returns every square the horse can reach without being blocked"""
+        moves = []
+        for new, block in HORSE_MOVES[current[0] * 9 + current[1]]:
+            if board[block[0]][block[1]] == "-------" and not self.is_friendly(board, new):
+                moves.append(new)
+        return moves
 
 
 class Elephant(Piece):
@@ -537,90 +1435,41 @@ class Elephant(Piece):
     Represents a Elephant board piece
     """
 
+    __slots__ = ()
+
     def __init__(self, team, position):
         """Initialises a Elephant object with its team+name and move set"""
         super().__init__(team, position)
         self._type = 'Elephant'
         self._name = team[0] + self._type
-        self._move_set = None
+        self._move_set = ELEPHANT_MOVE_SET
+
+    def is_in_move_set(self, current, new):
+        """returns True if new is one of the 8 elephant moves from current"""
+        return new[0] * 9 + new[1] in ELEPHANT_BLOCKS[current[0] * 9 + current[1]]
 
     def check_move(self, current, new, board):
         """
         This method will check to make sure the desired move matches the elephant move set and that it is not blocked.
-        This method is broken up into 4 sections, all designed for the initial vertical/horizontal move before the
-        diagonal moves (up, down, left, right). Takes the current position and new position to move (must be converted
-        using convert position method). it also takes the board as a parameter so it can evaluate what items are at the
-        new location and the locations along the way so it can check if it can be blocked
+        Takes the current position and new position to move (must be converted using convert position method). it also
+        takes the board as a parameter so it can evaluate what items are at the new location and the locations along
+        the way so it can check if it can be blocked
         """
+        blocks = ELEPHANT_BLOCKS[current[0] * 9 + current[1]].get(new[0] * 9 + new[1])
+        if blocks is None:
+            return False
+        if board[blocks[0][0]][blocks[0][1]] != "-------" or board[blocks[1][0]][blocks[1][1]] != "-------":
+            return False
+        return not self.is_friendly(board, new)
 
-        # moving down the board as first move
-
-        if current[0] + 3 == new[0]:
-            # check first move before diagonal move
-            if board[current[0] + 1][current[1]] != "-------":
-                return False
-            # Check diagonal move final location is correct
-            if [current[0] + 3, current[1] + 2] != new and [current[0] + 3, current[1] - 2] != new:
-                return False
-
-            # Check first diagonal move to make sure its not blocked
-            if [current[0] + 3, current[1] + 2] == new:
-                if board[current[0] + 2][current[1] + 1] != "-------":
-                    return False
-            else:
-                if board[current[0] + 2][current[1] - 1] != "-------":
-                    return False
-
-        # moving up the board as first move
-
-        elif current[0] - 3 == new[0]:
-            if board[current[0] - 1][current[1]] != "-------":
-                return False
-            if [current[0] - 3, current[1] + 2] != new and [current[0] - 3, current[1] - 2] != new:
-                return False
-
-            # Check first diagonal move to make sure its not blocked
-            if [current[0] - 3, current[1] + 2] == new:
-                if board[current[0] - 2][current[1] + 1] != "-------":
-                    return False
-            else:
-                if board[current[0] - 2][current[1] - 1] != "-------":
-                    return False
-
-        # moving to the right for first move
-
-        elif current[1] + 3 == new[1]:
-            if board[current[0]][current[1] + 1] != "-------":
-                return False
-            if [current[0] + 2, current[1] + 3] != new and [current[0] - 2, current[1] + 3] != new:
-                return False
-
-            if [current[0] + 2, current[1] + 3] == new:
-                if board[current[0] + 1][current[1] + 2] != "-------":
-                    return False
-            else:
-                if board[current[0] - 1][current[1] + 2] != "-------":
-                    return False
-
-        # moving left for first move
-
-        else:
-            if board[current[0]][current[1] - 1] != "-------":
-                return False
-            if [current[0] + 2, current[1] - 3] != new and [current[0] - 2, current[1] - 3] != new:
-                return False
-
-            if [current[0] + 2, current[1] - 3] == new:
-                if board[current[0] + 1][current[1] - 2] != "-------":
-                    return False
-            else:
-                if board[current[0] - 1][current[1] - 2] != "-------":
-                    return False
-
-        # If we get this far its because the first move isn't blocked
-
-        if board[new[0]][new[1]] == "-------" or board[new[0]][new[1]].get_team() != self._team:
-            return True
+    def generate_moves(self, current, board):
+        """returns every square the elephant can reach without being blocked"""
+        moves = []
+        for new, blocks in ELEPHANT_MOVES[current[0] * 9 + current[1]]:
+            if board[blocks[0][0]][blocks[0][1]] == "-------" and board[blocks[1][0]][blocks[1][1]] == "-------" and \
+                    not self.is_friendly(board, new):
+                moves.append(new)
+        return moves
 
 
 class Guard(Piece):
@@ -628,6 +1477,8 @@ class Guard(Piece):
     Represents a Guard board piece
     """
 
+    __slots__ = ()
+
     def __init__(self, team, position):
         """Initialises a Guard object with its team+name and move set"""
         super().__init__(team, position)
@@ -635,10 +1486,23 @@ class Guard(Piece):
         self._name = team[0] + self._type
         self._move_set = None
 
+    def is_in_move_set(self, current, new):
+        """returns True if new is one step from current along the lines of the palace"""
+        return new[0] * 9 + new[1] in PALACE_STEP_INDEXES[current[0] * 9 + current[1]]
+
     def check_move(self, current, new, board):
         """Checks to ensure the desired move is valid"""
-        if self.is_in_team_palace(current, new):
-            return True
+        if new[0] * 9 + new[1] not in PALACE_STEP_INDEXES[current[0] * 9 + current[1]]:
+            return False
+        return not self.is_friendly(board, new)
+
+    def generate_moves(self, current, board):
+        """returns every square in the palace the guard can step to"""
+        moves = []
+        for new in PALACE_STEPS[current[0] * 9 + current[1]]:
+            if not self.is_friendly(board, new):
+                moves.append(new)
+        return moves
 
 
 class General(Piece):
@@ -646,6 +1510,8 @@ class General(Piece):
     Represents a General board piece
     """
 
+    __slots__ = ()
+
     def __init__(self, team, position):
         """Initialises a General object with its team+name and move set"""
         super().__init__(team, position)
@@ -653,10 +1519,23 @@ class General(Piece):
         self._name = team[0] + self._type
         self._move_set = None
 
+    def is_in_move_set(self, current, new):
+        """returns True if new is one step from current along the lines of the palace"""
+        return new[0] * 9 + new[1] in PALACE_STEP_INDEXES[current[0] * 9 + current[1]]
+
     def check_move(self, current, new, board):
         """Checks to ensure the desired move is valid"""
-        if self.is_in_team_palace(current, new):
-            return True
+        if new[0] * 9 + new[1] not in PALACE_STEP_INDEXES[current[0] * 9 + current[1]]:
+            return False
+        return not self.is_friendly(board, new)
+
+    def generate_moves(self, current, board):
+        """returns every square in the palace the general can step to"""
+        moves = []
+        for new in PALACE_STEPS[current[0] * 9 + current[1]]:
+            if not self.is_friendly(board, new):
+                moves.append(new)
+        return moves
 
 
 class Cannon(Piece):
@@ -664,96 +1543,69 @@ class Cannon(Piece):
     Represents a Cannon board piece
     """
 
+    __slots__ = ()
+
     def __init__(self, team, position):
         """Initialises a Cannon object with its team+name and move set"""
         super().__init__(team, position)
         self._type = 'Cannon'
         self._name = team[0] + self._type
-        self._move_set = None
+        self._move_set = ORTHOGONAL_MOVE_SET
+
+    def is_cannon(self, board, square):
+        """returns True if the square on the board holds a cannon from either team"""
+        item = board[square[0]][square[1]]
+        return item != '-------' and item.get_type() == 'Cannon'
+
+    def is_in_move_set(self, current, new):
+        """returns True if new is on the same file, rank or palace diagonal as current"""
+        return new[0] * 9 + new[1] in LINES[current[0] * 9 + current[1]]
 
     def check_move(self, current, new, board):
         """
-        checks the current location and the new location to verify the desired move is
-        valid. If it is, this method returns True. If it is not, it will return False
+        checks the current location and the new location to verify the desired move is valid. The new location has to
+        be on the same file, rank or palace diagonal, the cannon has to jump over exactly one piece in between that
+        isn't a cannon, and it can't land on a cannon. If it is valid, this method returns True. If it is not, it will
+        return False
         """
-        jump_counter = 0  # initialize jump counter to 0, if theres a piece to jump over it will increase
-
-        # palace movement, different than the other pieces because of leap mechanic
-        if current in [[9, 3], [9, 5], [7, 3], [7, 5]] and new in [[9, 3], [9, 5], [7, 3], [7, 5]] and \
-                board[8][4] != '-------':
-            if board[8][4].get_type() == 'Cannon':
-                return False
-            if current == [9, 3] and new == [7, 5]:
-                return True
-            if current == [7, 3] and new == [9, 5]:
-                return True
-            if current == [7, 5] and new == [9, 3]:
-                return True
-            if current == [9, 5] and new == [7, 3]:
-                return True
-
-        if current in [[0, 3], [0, 5], [2, 3], [2, 5]] and new in [[0, 3], [0, 5], [2, 3], [2, 5]] and \
-                board[1][4] != '-------':
-            if board[8][4].get_type() == 'Cannon':
-                return False
-            if current == [0, 3] and new == [2, 5]:
-                return True
-            if current == [2, 3] and new == [0, 5]:
-                return True
-            if current == [0, 5] and new == [2, 3]:
-                return True
-            if current == [2, 5] and new == [0, 3]:
-                return True
-
-        if board[new[0]][new[1]] != '-------':  # if new location has a cannon --> move is invalid
-            if board[new[0]][new[1]].get_type() == 'Cannon':
-                return False
+        if self.is_friendly(board, new) or self.is_cannon(board, new):
+            return False
+        between = LINES[current[0] * 9 + current[1]].get(new[0] * 9 + new[1])
+        if between is None:
+            return False
 
-        # moving horizontally
-        if current[0] == new[0] and current[1] != new[1]:
-            move_len = new[1] - current[1]
-
-            # Going to the right
-            while move_len > 1:  # Loop from current to new to check for pieces in the way
-                if board[current[0]][move_len + current[1] - 1] != "-------":
-                    if board[current[0]][move_len + current[1] - 1].get_type() == 'Cannon':
-                        return False
-                    jump_counter += 1
-                move_len -= 1
-
-            # same loop as above but for going left on the board
-            while move_len < 0:
-                if board[current[0]][move_len + current[1] - 1] != "-------":
-                    if board[current[0]][move_len + current[1] - 1].get_type() == 'Cannon':
-                        return False
-                    jump_counter += 1
-                move_len += 1
-            if jump_counter == 1:
-                return True
+        jump_counter = 0  # if theres a piece to jump over it will increase
+        for square in between:
+            item = board[square[0]][square[1]]
+            if item != "-------":
+                if item.get_type() == 'Cannon':
+                    return False
+                jump_counter += 1
+        return jump_counter == 1
 
-        # moving vertically
-        if current[0] != new[0] and current[1] == new[1]:
-            move_len = new[0] - current[0]
-
-            # Moving down the board
-            while move_len > 1:
-                if board[move_len + current[0] - 1][current[1]] != "-------":
-                    if board[move_len + current[0] - 1][current[1]].get_type() == 'Cannon':
-                        return False
-                    jump_counter += 1
-                move_len -= 1
-
-            # Moving up the board
-            while move_len < 0:
-                if board[move_len + current[0]][current[1]] != "-------":
-                    if board[move_len + current[0]][current[1]].get_type() == 'Cannon':
-                        return False
-                    jump_counter += 1
-                move_len += 1
-            if jump_counter == 1:
-                return True
-        else:
-            return False
+    def generate_moves(self, current, board):
+        """
+        returns every square the cannon can reach. Along each ray it looks for the first piece to jump over, which
+        can't be a cannon, then it can land on any empty square after it or capture the next enemy piece that isn't a
+        cannon.
+        """
+        moves = []
+        for ray in RAYS[current[0] * 9 + current[1]]:
+            screened = False
+            for new in ray:
+                item = board[new[0]][new[1]]
+                if not screened:
+                    if item != "-------":
+                        if item.get_type() == 'Cannon':
+                            break
+                        screened = True
+                elif item == "-------":
+                    moves.append(new)
+                else:
+                    if item.get_team() != self._team and item.get_type() != 'Cannon':
+                        moves.append(new)
+                    break
+        return moves
 
 
 class Soldier(Piece):
@@ -761,28 +1613,42 @@ class Soldier(Piece):
     Represents a Soldier board piece
     """
 
+    __slots__ = ()
+
     def __init__(self, team, position):
         """Initialises a Soldier object with its team+name and move set"""
         super().__init__(team, position)
         self._type = 'Soldier'
         self._name = team[0] + self._type
         if team == 'red':
-            self._move_set = [[0, 1], [0, -1], [1, 0], [0, 0]]
+            self._move_set = RED_SOLDIER_MOVE_SET
         else:
-            self._move_set = [[0, 1], [0, -1], [-1, 0], [0, 0]]
+            self._move_set = BLUE_SOLDIER_MOVE_SET
+
+    def is_in_move_set(self, current, new):
+        """returns True if new is a step forward or sideways from current, or diagonally forward in the enemy palace"""
+        return new[0] * 9 + new[1] in SOLDIER_STEP_INDEXES[self._team][current[0] * 9 + current[1]]
 
     def check_move(self, current, new, board):
-        """makes sure that the move is in the pieces move_set"""
-        move = [new[0] - current[0], new[1] - current[1]]
+        """
+        makes sure that the move is in the pieces move_set. Inside the enemy palace soldiers can also move forward
+        along the diagonal lines
+        """
+        if new[0] * 9 + new[1] not in SOLDIER_STEP_INDEXES[self._team][current[0] * 9 + current[1]]:
+            return False
+        return not self.is_friendly(board, new)
 
-        if current in self._enemy_palace:
-            if self.is_in_enemy_palace(current, new):
-                return True
+    def generate_moves(self, current, board):
+        """returns every square the soldier can step to"""
+        moves = []
+        for new in SOLDIER_MOVES[self._team][current[0] * 9 + current[1]]:
+            if not self.is_friendly(board, new):
+                moves.append(new)
+        return moves
 
-        if move not in self._move_set:
-            return False
-        else:
-            return True
+
+PIECE_CLASSES = {'General': General, 'Guard': Guard, 'Elephant': Elephant, 'Horse': Horse, 'Chariot': Chariot,
+                 'Cannon': Cannon, 'Soldier': Soldier}
 
 
 class Red:
@@ -815,6 +1681,10 @@ class Red:
         """returns a list of all the red piece objects"""
         return self._pieces
 
+    def get_general(self):
+        """returns the red general"""
+        return self._rGeneral
+
     def remove_piece(self, piece):
         """removes one of the pieces from the team _pieces list"""
         self._pieces.remove(piece)
@@ -851,10 +1721,54 @@ class Blue:
         """returns a list of all the red piece objects"""
         return self._pieces
 
+    def get_general(self):
+        """returns the blue general"""
+        return self._bGeneral
+
     def remove_piece(self, piece):
         """removes one of the pieces from the team _pieces list"""
         self._pieces.remove(piece)
 
 
-game = JanggiGame()
-game.print_board()
\ No newline at end of file
+def starting_fen(red_arrangement='elephant-horse-elephant-horse', blue_arrangement='elephant-horse-elephant-horse'):
+    """
+    returns the starting position as text for JanggiGame.from_fen(), with each player's horses and elephants set up in
+    one of the STARTING_ARRANGEMENTS. Raises ValueError for an arrangement that isn't one of them
+    """
+    for arrangement in [red_arrangement, blue_arrangement]:
+        if arrangement not in STARTING_ARRANGEMENTS:
+            raise ValueError('unknown arrangement ' + arrangement + ', expected one of ' +
+                             ', '.join(STARTING_ARRANGEMENTS))
+    red_rank = 'r' + STARTING_ARRANGEMENTS[red_arrangement] + 'r'
+    blue_rank = ('r' + STARTING_ARRANGEMENTS[blue_arrangement] + 'r').upper()
+    return blue_rank + '/4K4/1C5C1/P1P1P1P1P/9/9/p1p1p1p1p/1c5c1/4k4/' + red_rank + ' b UNFINISHED'
+
+
+_starting_template = None
+
+
+def get_starting_template():
+    """
+    returns the starting position that JanggiGame() copies: a dictionary with the red and blue pieces as tuples in the
+    order the Red and Blue classes list them, with their slots set, the slot of each team's general and the Zobrist
+    hash and snapshot(). It is built the first time it is needed rather than at import. The template pieces are never
+    put on a board and must not be changed, every game gets clones of them
+    """
+    global _starting_template
+    if _starting_template is None:
+        red = Red()
+        blue = Blue()
+        template = {'red': tuple(red.get_red_pieces()), 'blue': tuple(blue.get_blue_pieces()), 'generals': {},
+                    'hash': 0}
+        snapshot = bytearray(92)
+        for team, general in [['red', red.get_general()], ['blue', blue.get_general()]]:
+            pieces = template[team]
+            for slot in range(len(pieces)):
+                pieces[slot].set_slot(slot)
+                position = pieces[slot].get_position()
+                template['hash'] ^= ZOBRIST_PIECES[pieces[slot].get_name()][position[0] * 9 + position[1]]
+                snapshot[position[0] * 9 + position[1]] = pieces[slot].get_code()
+            template['generals'][team] = general.get_slot()
+        template['snapshot'] = bytes(snapshot)
+        _starting_template = template
+    return _starting_template
@@ -0,0 +1,127 @@
+# Description:  Opt-in instrumentation for JanggiGame. enable() wraps the hot methods (make_move, try_move, is_legal,
+#               is_in_check, check_mate, update_board and every piece's check_move) so each call is counted and timed
+#               into a histogram, and disable() puts the original methods back, so nothing is added to the hot path
+#               while it's off. The numbers can be read as a dictionary with snapshot() or as Prometheus text with
+#               prometheus_text(). Calls are timed including the methods they call, so make_move's time includes its
+#               check_mate.
+#
+#                   JanggiInstrument.enable()
+#                   game.make_move('c7', 'c6')
+#                   print(JanggiInstrument.prometheus_text())
+#                   JanggiInstrument.disable()
+
+import bisect
+import functools
+import time
+
+from JanggiGame import JanggiGame, Chariot, Horse, Elephant, Guard, General, Cannon, Soldier
+
+# upper bounds of the histogram buckets in seconds, from 1 microsecond to 1 second
+BUCKETS = [0.000001, 0.000005, 0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0]
+
+# the methods that are wrapped, as (class, method name) pairs
+INSTRUMENTED = [(JanggiGame, 'make_move'), (JanggiGame, 'try_move'), (JanggiGame, 'is_legal'),
+                (JanggiGame, 'is_in_check'), (JanggiGame, 'check_mate'), (JanggiGame, 'update_board')]
+for _piece_class in [Chariot, Horse, Elephant, Guard, General, Cannon, Soldier]:
+    INSTRUMENTED.append((_piece_class, 'check_move'))
+
+_originals = {}
+_metrics = {}
+
+
+def reset():
+    """
+    sets every call count and histogram back to zero. The counters are cleared in place, since the wrappers made by
+    enable() hold on to them
+    """
+    for owner, method_name in INSTRUMENTED:
+        metric = _metrics.setdefault(owner.__name__ + '.' + method_name, {})
+        metric.update({'calls': 0, 'seconds': 0.0, 'buckets': [0] * len(BUCKETS)})
+
+
+def wrap(name, method):
+    """returns a wrapper around method that counts and times every call under name"""
+    metric = _metrics[name]
+    perf_counter = time.perf_counter
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = perf_counter() - start
+            metric['calls'] += 1
+            metric['seconds'] += elapsed
+            bucket = bisect.bisect_left(BUCKETS, elapsed)
+            if bucket < len(BUCKETS):
+                metric['buckets'][bucket] += 1
+    return wrapper
+
+
+def enable():
+    """wraps every instrumented method. Does nothing if instrumentation is already on"""
+    if _originals:
+        return
+    if not _metrics:
+        reset()
+    for owner, method_name in INSTRUMENTED:
+        name = owner.__name__ + '.' + method_name
+        _originals[name] = (owner, method_name, owner.__dict__[method_name])
+        setattr(owner, method_name, wrap(name, owner.__dict__[method_name]))
+
+
+def disable():
+    """puts the original methods back. The numbers collected so far are kept until reset()"""
+    for owner, method_name, method in _originals.values():
+        setattr(owner, method_name, method)
+    _originals.clear()
+
+
+def is_enabled():
+    """returns True if the methods are currently wrapped"""
+    return bool(_originals)
+
+
+class Instrumented:
+    """A with statement that turns instrumentation on for the block and back off after it"""
+
+    def __enter__(self):
+        """turns instrumentation on"""
+        enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """turns instrumentation off"""
+        disable()
+
+
+def snapshot():
+    """
+    returns a dictionary with an entry for each instrumented method, by 'Class.method' name, holding its number of
+    calls, the total seconds spent in it and the histogram as a dictionary of bucket upper bound to the number of calls
+    that took at most that long (counted cumulatively, like Prometheus, with '+Inf' for every call)
+    """
+    result = {}
+    for name in sorted(_metrics):
+        metric = _metrics[name]
+        cumulative = 0
+        buckets = {}
+        for index in range(len(BUCKETS)):
+            cumulative += metric['buckets'][index]
+            buckets[BUCKETS[index]] = cumulative
+        buckets['+Inf'] = metric['calls']
+        result[name] = {'calls': metric['calls'], 'seconds': metric['seconds'], 'buckets': buckets}
+    return result
+
+
+def prometheus_text():
+    """returns the numbers in the Prometheus text exposition format, one histogram labelled by method"""
+    lines = ['# HELP janggi_method_seconds Time spent in each instrumented JanggiGame method.',
+             '# TYPE janggi_method_seconds histogram']
+    for name, metric in snapshot().items():
+        for bound, count in metric['buckets'].items():
+            lines.append('janggi_method_seconds_bucket{method="' + name + '",le="' + str(bound) + '"} ' + str(count))
+        lines.append('janggi_method_seconds_sum{method="' + name + '"} ' + repr(metric['seconds']))
+        lines.append('janggi_method_seconds_count{method="' + name + '"} ' + str(metric['calls']))
+    return '\n'.join(lines) + '\n'
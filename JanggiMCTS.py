@@ -0,0 +1,419 @@
+# Description:  A Monte Carlo tree search (UCT) opponent for JanggiGame, for easier computer players than the alpha-beta
+#               search in JanggiSearch. MCTSEngine.search() grows a tree of positions from the current one: it walks
+#               down the tree picking the child with the best upper confidence bound, adds one new position, plays a
+#               quick random game (a playout) from there and counts the result in every position on the way back up.
+#               The move played most often from the root is chosen, unless a move checkmates.
+#
+#               Legal moves are only worked out when a position is added to the tree. Playouts pick random moves
+#               without checking them, so no check_mate() or check tests are run during them: a playout ends when a
+#               general is captured, or after max_playout_plies moves when the side ahead on material by more than
+#               PLAYOUT_MARGIN wins and anything closer is a draw. The tree is kept between searches and reused when
+#               the game reaches a position in it, such as after the opponent plays the expected reply. With workers,
+#               each search runs in a pool of processes that each grow their own tree from the position, and the root
+#               move counts from the playouts each worker ran for this search are added together.
+#
+#               The move is returned in the same algebraic notation make_move() takes, for example:
+#                   result = MCTSEngine().search(game, playouts=2000)
+#                   game.make_move(result['move'][0], result['move'][1])
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from JanggiGame import JanggiGame
+from JanggiSearch import PIECE_VALUES
+
+PLAYOUT_MARGIN = 300  # material lead, in hundredths of a soldier, needed to win a playout that runs out of moves
+PLAYOUT_TRIES = 4  # random pieces a playout tries for a move before passing
+
+_worker_engine = None
+
+
+class Node:
+    """
+    Represents a position in the search tree, reached by playing move (a (current, new) pair of board coordinates)
+    from its parent. The wins are counted for the team that made the move, which is the team choosing between this
+    node and its siblings, with draws counting half
+    """
+
+    __slots__ = ('_move', '_parent', '_mover', '_hash', '_children', '_untried', '_winner', '_visits', '_wins')
+
+    def __init__(self, move, parent, mover, position_hash):
+        """creates a node that hasn't been visited yet. Its moves are listed by set_moves() when it is first reached"""
+        self._move = move
+        self._parent = parent
+        self._mover = mover
+        self._hash = position_hash
+        self._children = []
+        self._untried = None
+        self._winner = None
+        self._visits = 0
+        self._wins = 0.0
+
+    def get_move(self):
+        """returns the move that leads to this node"""
+        return self._move
+
+    def get_parent(self):
+        """returns the parent node, None for the root"""
+        return self._parent
+
+    def detach(self):
+        """makes this node a root, so the rest of the old tree can be freed"""
+        self._parent = None
+
+    def get_hash(self):
+        """returns the Zobrist hash of the node's position"""
+        return self._hash
+
+    def get_children(self):
+        """returns the nodes added below this one so far"""
+        return self._children
+
+    def get_visits(self):
+        """returns the number of playouts that went through this node"""
+        return self._visits
+
+    def get_wins(self):
+        """returns the playouts through this node the mover won, draws counting half"""
+        return self._wins
+
+    def get_winner(self):
+        """returns the team that has won if the position is checkmate, otherwise None"""
+        return self._winner
+
+    def is_expanded(self):
+        """returns True once the node's moves have been listed"""
+        return self._untried is not None
+
+    def has_untried(self):
+        """returns True if some of the node's moves don't have a child yet"""
+        return bool(self._untried)
+
+    def set_moves(self, game):
+        """
+        lists the legal moves from the node's position, which the game must be in, in a random order so children are
+        added in a random order. Passing is included when not in check, and a position with no moves while in check
+        is checkmate, won by the other team
+        """
+        team = game.get_player_turn()
+        moves = [(current, new) for piece, current, new in game.iter_legal_moves(team)]
+        if not game.is_in_check(team):
+            general = game.get_general(team).get_position()
+            moves.append((general, general))
+        elif not moves:
+            self._winner = 'blue' if team == 'red' else 'red'
+        random.shuffle(moves)
+        self._untried = moves
+
+    def add_child(self, game):
+        """
+        plays one of the untried moves in the game with push() and adds the node for the position it leads to.
+        Returns the new node, with the game left in its position
+        """
+        move = self._untried.pop()
+        team = game.get_player_turn()
+        game.push(move)
+        child = Node(move, self, team, game.get_hash())
+        self._children.append(child)
+        return child
+
+    def select_child(self, exploration):
+        """returns the child with the highest upper confidence bound (UCT)"""
+        log_visits = math.log(self._visits)
+        best = None
+        best_score = -1.0
+        for child in self._children:
+            score = child._wins / child._visits + exploration * math.sqrt(log_visits / child._visits)
+            if score > best_score:
+                best = child
+                best_score = score
+        return best
+
+    def update(self, winner):
+        """counts a playout won by winner (a team, or None for a draw) through this node"""
+        self._visits += 1
+        if winner == self._mover:
+            self._wins += 1.0
+        elif winner is None:
+            self._wins += 0.5
+
+
+def material_winner(game):
+    """returns the team ahead on material by more than PLAYOUT_MARGIN, or None if it is closer than that"""
+    score = 0
+    for piece in game.get_team_pieces('blue'):
+        score += PIECE_VALUES[piece.get_type()]
+    for piece in game.get_team_pieces('red'):
+        score -= PIECE_VALUES[piece.get_type()]
+    if score > PLAYOUT_MARGIN:
+        return 'blue'
+    if score < -PLAYOUT_MARGIN:
+        return 'red'
+    return None
+
+
+def init_worker(exploration, max_playout_plies):
+    """runs once in each worker process and creates the engine it keeps, with its tree, for every search"""
+    global _worker_engine
+    _worker_engine = MCTSEngine(exploration, max_playout_plies)
+
+
+def search_snapshot(snapshot, playouts, time_ms, seed):
+    """
+    runs in a worker process, searching the position packed by snapshot(). The worker keeps its tree between tasks, so
+    only the visits and wins this search added are returned for each root move, together with the number of playouts
+    run, the root visits from earlier searches and the worker's process id
+    """
+    random.seed(seed)
+    deadline = None if time_ms is None else time.perf_counter() + time_ms / 1000
+    game = JanggiGame.from_snapshot(snapshot)
+    root = _worker_engine.set_root(game)
+    reused = root.get_visits()
+    earlier = {}
+    for move in _worker_engine.describe_moves(game, root):
+        earlier[move['move']] = move
+    count = _worker_engine.run_playouts(game, root, playouts, deadline)
+    moves = []
+    for move in _worker_engine.describe_moves(game, root):
+        visits, wins = move['visits'], move['wins']
+        if move['move'] in earlier:
+            visits -= earlier[move['move']]['visits']
+            wins -= earlier[move['move']]['wins']
+        moves.append((move['move'], visits, wins, move['mate']))
+    return count, reused, os.getpid(), moves
+
+
+class MCTSEngine:
+    """
+    Represents a Monte Carlo tree search engine. One engine can be used for a whole game so the tree carries over from
+    move to move. With workers it starts a pool of processes that is reused for every search, call close() (or use it
+    in a with statement) to shut it down
+    """
+
+    def __init__(self, exploration=1.4, max_playout_plies=60, workers=None):
+        """
+        Initializes the engine. exploration is the UCT constant weighing rarely tried moves against the best ones, and
+        playouts longer than max_playout_plies moves are decided on material. With workers set to more than 1 the
+        playouts run in that many processes
+        """
+        self._exploration = exploration
+        self._max_playout_plies = max_playout_plies
+        self._root = None
+        self._workers = workers
+        self._pool = None
+        if workers is not None and workers > 1:
+            self._pool = multiprocessing.Pool(workers, initializer=init_worker,
+                                              initargs=(exploration, max_playout_plies))
+
+    def __enter__(self):
+        """returns the engine for use in a with statement"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """shuts down the pool at the end of a with statement"""
+        self.close()
+
+    def close(self):
+        """shuts down the worker processes, if there are any"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def find_root(self, game):
+        """
+        returns the node for the game's position from the last search's tree, looking at the old root, its children
+        and their children (the position after the move that was chosen and the opponent's reply). Returns a new node
+        if the position isn't there
+        """
+        position_hash = game.get_hash()
+        nodes = [] if self._root is None else [self._root]
+        for depth in range(3):
+            for node in nodes:
+                if node.get_hash() == position_hash:
+                    node.detach()
+                    return node
+            nodes = [child for node in nodes for child in node.get_children()]
+        return Node(None, None, None, position_hash)
+
+    def playout(self, game):
+        """
+        plays random moves from the game's position until a general is captured or max_playout_plies moves have been
+        played, then takes them all back. Moves are picked by choosing a random piece and one of the squares
+        generate_moves() gives for it, without testing for check, and a player passes if PLAYOUT_TRIES pieces in a row
+        have no moves. Returns the winning team, or None for a draw
+        """
+        winner = None
+        plies = 0
+        while plies < self._max_playout_plies:
+            team = game.get_player_turn()
+            pieces = game.get_team_pieces(team)
+            board = game.get_board()
+            move = None
+            for attempt in range(PLAYOUT_TRIES):
+                piece = pieces[random.randrange(len(pieces))]
+                current = piece.get_position()
+                moves = piece.generate_moves(current, board)
+                if moves:
+                    move = (current, moves[random.randrange(len(moves))])
+                    break
+            if move is None:
+                general = game.get_general(team).get_position()
+                move = (general, general)
+            target = board[move[1][0]][move[1][1]]
+            game.push(move)
+            plies += 1
+            if target != '-------' and target.get_type() == 'General' and move[0] != move[1]:
+                winner = team
+                break
+        if winner is None:
+            winner = material_winner(game)
+        for ply in range(plies):
+            game.pop()
+        return winner
+
+    def run_playout(self, game, root):
+        """
+        runs one iteration from the root: selects down the tree, adds a node, plays a playout from it and counts the
+        result back up to the root. The game is left in the root's position
+        """
+        node = root
+        pushed = 0
+        while node.is_expanded() and not node.has_untried() and node.get_children() and node.get_winner() is None:
+            node = node.select_child(self._exploration)
+            game.push(node.get_move())
+            pushed += 1
+        if not node.is_expanded():
+            node.set_moves(game)
+        if node.get_winner() is None and node.has_untried():
+            node = node.add_child(game)
+            pushed += 1
+            node.set_moves(game)
+        winner = node.get_winner()
+        if winner is None:
+            winner = self.playout(game)
+        for ply in range(pushed):
+            game.pop()
+        while node is not None:
+            node.update(winner)
+            node = node.get_parent()
+
+    def search(self, game, playouts=1000, time_ms=None):
+        """
+        Searches the game's position for the side to move with up to playouts playouts, stopping early if time_ms
+        milliseconds have passed (when given). The game is left exactly as it was. Returns a dictionary with the move
+        played most from the root as a (current, new) tuple in algebraic notation (None if the game is over), the share
+        of playouts through it its side won, the number of playouts run, how many of the root's visits came from
+        earlier searches, the time taken in milliseconds, playouts per second and 'moves', the visits and wins of every
+        root move and whether it checkmates, checkmates first and then most visited first
+        """
+        start = time.perf_counter()
+        result = {'move': None, 'value': 0.0, 'playouts': 0, 'reused': 0, 'time_ms': 0.0, 'playouts_per_second': 0.0,
+                  'moves': []}
+        if game.get_game_state() != 'UNFINISHED':
+            return result
+        if self._pool is not None:
+            return self.search_in_pool(game, playouts, time_ms, start, result)
+
+        root = self.set_root(game)
+        result['reused'] = root.get_visits()
+        deadline = None if time_ms is None else start + time_ms / 1000
+        result['playouts'] = self.run_playouts(game, root, playouts, deadline)
+        result['moves'] = self.describe_moves(game, root)
+        self.finish_result(result, start)
+        return result
+
+    def set_root(self, game):
+        """finds the node for the game's position with find_root() and keeps it as the root for the next search"""
+        self._root = self.find_root(game)
+        return self._root
+
+    def run_playouts(self, game, root, playouts, deadline):
+        """
+        runs up to playouts playouts from the root, stopping early once time.perf_counter() passes the deadline (when it
+        isn't None). Returns the number of playouts run
+        """
+        count = 0
+        while count < playouts and (deadline is None or time.perf_counter() < deadline):
+            self.run_playout(game, root)
+            count += 1
+        return count
+
+    def describe_moves(self, game, root):
+        """returns a dictionary for each of the root's children with its move in algebraic notation, visits and wins"""
+        moves = []
+        for child in root.get_children():
+            move = (game.convert_to_algebraic(child.get_move()[0]), game.convert_to_algebraic(child.get_move()[1]))
+            moves.append({'move': move, 'visits': child.get_visits(), 'wins': child.get_wins(),
+                          'mate': child.get_winner() is not None})
+        return moves
+
+    def search_in_pool(self, game, playouts, time_ms, start, result):
+        """
+        runs the search on every worker with a share of the playouts and adds up the root move counts each one added.
+        A worker given more than one share counts its earlier root visits once, from before its first share
+        """
+        snapshot = game.snapshot()
+        share = -(-playouts // self._workers)
+        pending = [self._pool.apply_async(search_snapshot, (snapshot, share, time_ms, random.getrandbits(32)))
+                   for worker in range(self._workers)]
+        totals = {}
+        reused = {}
+        for answer in pending:
+            count, worker_reused, process_id, moves = answer.get()
+            result['playouts'] += count
+            reused[process_id] = min(reused.get(process_id, worker_reused), worker_reused)
+            for move, visits, wins, mate in moves:
+                total = totals.setdefault(move, [0, 0.0, False])
+                total[0] += visits
+                total[1] += wins
+                total[2] = total[2] or mate
+        for move, total in totals.items():
+            result['moves'].append({'move': move, 'visits': total[0], 'wins': total[1], 'mate': total[2]})
+        result['reused'] = sum(reused.values())
+        self.finish_result(result, start)
+        return result
+
+    def finish_result(self, result, start):
+        """
+        sorts the root moves, checkmates first and then by visits, and fills in the chosen move, its value and the
+        timings
+        """
+        result['moves'].sort(key=lambda move: (not move['mate'], -move['visits']))
+        if result['moves']:
+            best = result['moves'][0]
+            result['move'] = best['move']
+            if best['visits']:
+                result['value'] = best['wins'] / best['visits']
+        result['time_ms'] = (time.perf_counter() - start) * 1000
+        if result['time_ms'] > 0:
+            result['playouts_per_second'] = result['playouts'] / result['time_ms'] * 1000
+
+
+def main():
+    """plays a few moves of engine against itself, printing each move and the playout rate"""
+    parser = argparse.ArgumentParser(description='Monte Carlo tree search for Janggi')
+    parser.add_argument('--playouts', type=int, default=1000, help='playouts per move')
+    parser.add_argument('--time-ms', type=int, default=None, help='time limit per move')
+    parser.add_argument('--moves', type=int, default=6, help='moves to play')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes for the playouts')
+    args = parser.parse_args()
+
+    game = JanggiGame()
+    with MCTSEngine(workers=args.workers) as engine:
+        for index in range(args.moves):
+            result = engine.search(game, args.playouts, args.time_ms)
+            if result['move'] is None:
+                break
+            print(game.get_player_turn().ljust(5), result['move'][0] + result['move'][1], 'value',
+                  format(result['value'], '.2f'), 'playouts', result['playouts'], 'reused', result['reused'],
+                  format(result['playouts_per_second'], '.0f') + ' playouts/s')
+            game.make_move(result['move'][0], result['move'][1])
+
+
+if __name__ == '__main__':
+    main()
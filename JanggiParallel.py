@@ -0,0 +1,158 @@
+# Description:  Parallel search for JanggiGame using a pool of worker processes, so the search can use more than one
+#               core. ParallelSearcher.search() splits the legal moves at the root between the workers (root splitting)
+#               and each worker runs the normal iterative deepening search from JanggiSearch on its share of the moves,
+#               keeping its own transposition table from one search to the next. The position is handed to the workers
+#               as its 92 byte snapshot(), so games set up with from_fen() or copy() are searched from the right place.
+#               When every worker is done, the move with the best score at the deepest depth all of them finished is
+#               chosen.
+#
+#               Run it from the command line to compare the time to reach a depth with one and with several processes:
+#                   python JanggiParallel.py --workers 4 --depth 3
+
+import argparse
+import multiprocessing
+import os
+import time
+
+from JanggiGame import JanggiGame
+from JanggiSearch import Searcher, PIECE_VALUES
+
+HANDOFF_MS = 20  # time kept back from each worker's budget for sending the work out and collecting the results
+
+_worker_searcher = None
+
+
+def encode_position(game):
+    """packs the game's position into bytes for a worker, its snapshot(). The search doesn't need the move history"""
+    return game.snapshot()
+
+
+def decode_position(data):
+    """rebuilds a game from bytes made by encode_position()"""
+    return JanggiGame.from_snapshot(data)
+
+
+def init_worker(memory_mb):
+    """runs once in each worker process and creates the searcher it keeps for every search"""
+    global _worker_searcher
+    _worker_searcher = Searcher(memory_mb=memory_mb)
+
+
+def search_root_moves(position, root_moves, time_ms, max_depth):
+    """runs in a worker process, searching only the root moves from the encoded position"""
+    game = decode_position(position)
+    return _worker_searcher.search(game, time_ms, max_depth, root_moves)
+
+
+class ParallelSearcher:
+    """
+    Represents a search engine that spreads each search over a pool of worker processes. The pool is started once
+    and reused for every search, call close() (or use it in a with statement) to shut it down
+    """
+
+    def __init__(self, workers=None, memory_mb=16):
+        """starts the pool with the given number of worker processes (one per core by default)"""
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self._workers = workers
+        self._pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(memory_mb,))
+
+    def __enter__(self):
+        """returns the searcher for use in a with statement"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """shuts down the pool at the end of a with statement"""
+        self.close()
+
+    def close(self):
+        """shuts down the worker processes"""
+        self._pool.terminate()
+        self._pool.join()
+
+    def split_moves(self, game):
+        """
+        Returns the root moves split into one list per worker. Captures of valuable pieces are dealt out first, round
+        robin, so every worker gets a mix of the moves that take the longest to search
+        """
+        team = game.get_player_turn()
+        moves = game.legal_moves(team)
+
+        def capture_value(move):
+            target = game.get_item_from_location(move[1])
+            if target == '-------':
+                return 0
+            return -PIECE_VALUES[target.get_type()]
+
+        moves.sort(key=capture_value)
+        if not game.is_in_check(team):
+            general = game.convert_to_algebraic(game.get_general(team).get_position())
+            moves.append((general, general))
+        groups = [[] for worker in range(min(self._workers, len(moves)))]
+        for index in range(len(moves)):
+            groups[index % len(groups)].append(moves[index])
+        return groups
+
+    def search(self, game, time_ms=1000, max_depth=32):
+        """
+        Searches the game's position on all the workers and returns a dictionary like Searcher.search(): the best
+        move, its score, the depth every worker finished, its principal variation, the total nodes searched by all
+        workers and the time taken in milliseconds
+        """
+        start = time.perf_counter()
+        result = {'move': None, 'score': 0, 'depth': 0, 'pv': [], 'nodes': 0, 'time_ms': 0.0}
+        if game.get_game_state() != 'UNFINISHED':
+            return result
+        groups = self.split_moves(game)
+        if not groups:
+            return result
+
+        position = encode_position(game)
+        worker_time = max(1, time_ms - HANDOFF_MS)
+        pending = [self._pool.apply_async(search_root_moves, (position, group, worker_time, max_depth))
+                   for group in groups]
+        answers = [answer.get() for answer in pending]
+
+        result['nodes'] = sum(answer['nodes'] for answer in answers)
+        finished = [answer for answer in answers if answer['iterations']]
+        if finished:
+            depth = min(answer['iterations'][-1]['depth'] for answer in finished)
+            best = None
+            for answer in finished:
+                for iteration in answer['iterations']:
+                    if iteration['depth'] == depth and (best is None or iteration['score'] > best['score']):
+                        best = iteration
+            result.update({'move': best['move'], 'score': best['score'], 'depth': depth, 'pv': best['pv']})
+        else:
+            result['move'] = answers[0]['move']
+        result['time_ms'] = (time.perf_counter() - start) * 1000
+        return result
+
+
+def main():
+    """compares the time to reach a fixed depth with a single searcher and with the parallel searcher"""
+    parser = argparse.ArgumentParser(description='Time to depth for the single and multi process searches')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--depth', type=int, default=3, help='depth to search to')
+    parser.add_argument('--moves', type=int, default=6, help='number of opening moves to play before searching')
+    args = parser.parse_args()
+
+    game = JanggiGame()
+    searcher = Searcher()
+    for index in range(args.moves):
+        move = searcher.search(game, 200)['move']
+        game.make_move(move[0], move[1])
+
+    budget = 10 ** 9
+    single = Searcher().search(game, budget, args.depth)
+    print('1 process'.ljust(12), 'depth', single['depth'], 'move', single['move'], 'score', single['score'],
+          'nodes', single['nodes'], format(single['time_ms'], '.0f') + 'ms')
+    with ParallelSearcher(args.workers) as parallel:
+        result = parallel.search(game, budget, args.depth)
+    print((str(args.workers) + ' processes').ljust(12), 'depth', result['depth'], 'move', result['move'], 'score',
+          result['score'], 'nodes', result['nodes'], format(result['time_ms'], '.0f') + 'ms')
+    print('speedup', format(single['time_ms'] / result['time_ms'], '.1f') + 'x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+# Description:  Perft (performance test) for JanggiGame. perft() counts every position reachable in a given number of
+#               moves by making and taking back each legal move with push() and pop(), and divide() breaks that count
+#               down by first move. The counts only depend on the rules, so comparing them against the reference counts
+#               below shows whether a change to move generation or legality kept the rules the same, and the nodes per
+#               second show how fast positions are enumerated. Passing is not counted as a move.
+#
+#               Run it from the command line:
+#                   python JanggiPerft.py                  checks every position against its reference counts
+#                   python JanggiPerft.py --depth 3        runs perft on the starting position to depth 3
+#                   python JanggiPerft.py --divide 2       prints the depth 2 count for each first move
+#                   python JanggiPerft.py --cross-check 2  also compares against check_move() and BitboardJanggiGame
+
+import argparse
+import time
+
+from JanggiGame import JanggiGame
+from JanggiBitboard import BitboardJanggiGame
+
+# Each test position is reached by playing its moves from the starting position. The reference counts are the perft
+# results for depth 1, 2, 3, ... from that position.
+POSITIONS = [
+    {
+        'name': 'start',
+        'moves': [],
+        'counts': [31, 961, 30506],
+    },
+    {
+        'name': 'cannon screens and palace jump',
+        'moves': [('g7', 'g6'), ('e2', 'f2'), ('c7', 'd7'), ('d1', 'e1'), ('d10', 'd9'), ('g4', 'h4'), ('d9', 'd8'),
+                  ('f2', 'f3'), ('a10', 'a8'), ('e4', 'd4'), ('f10', 'f9'), ('i1', 'i3'), ('b8', 'f8'),
+                  ('i3', 'i1')],
+        'counts': [34, 972, 33249],
+    },
+    {
+        'name': 'chariot on palace diagonal, blocked horses and elephants',
+        'moves': [('a10', 'a8'), ('e2', 'd2'), ('e9', 'e8'), ('d2', 'd3'), ('b8', 'f8'), ('d3', 'e3'), ('a8', 'd8'),
+                  ('f1', 'e1'), ('f10', 'f9'), ('i4', 'h4')],
+        'counts': [39, 1461, 57647],
+    },
+    {
+        'name': 'in check from a cannon',
+        'moves': [('f10', 'f9'), ('e2', 'e1'), ('e7', 'd7'), ('c1', 'd3'), ('e9', 'e8'), ('a4', 'b4'), ('h10', 'i8'),
+                  ('a1', 'a3'), ('b8', 'f8'), ('b1', 'd4'), ('d10', 'd9'), ('d4', 'b7'), ('f9', 'f10'),
+                  ('h1', 'i3'), ('c10', 'e9'), ('b3', 'e3')],
+        'counts': [2, 80, 2038],
+    },
+]
+
+
+def setup_position(moves, backend=JanggiGame):
+    """creates a game and plays the moves on it. Raises ValueError if one of the moves is illegal"""
+    game = backend()
+    for current, new in moves:
+        if not game.make_move(current, new):
+            raise ValueError('illegal move in test position: ' + current + ' ' + new)
+    return game
+
+
+def perft(game, depth):
+    """returns the number of positions reachable from the game's position in exactly depth moves"""
+    if depth == 0:
+        return 1
+    team = game.get_player_turn()
+    nodes = 0
+    if depth == 1:
+        for move in game.iter_legal_moves(team):
+            nodes += 1
+        return nodes
+    for piece, current, new in game.iter_legal_moves(team):
+        game.push((current, new))
+        nodes += perft(game, depth - 1)
+        game.pop()
+    return nodes
+
+
+def divide(game, depth):
+    """returns a dictionary of each legal first move (in algebraic notation) and the perft count below it"""
+    counts = {}
+    for piece, current, new in game.iter_legal_moves(game.get_player_turn()):
+        game.push((current, new))
+        counts[(game.convert_to_algebraic(current), game.convert_to_algebraic(new))] = perft(game, depth - 1)
+        game.pop()
+    return counts
+
+
+def perft_brute_force(game, depth):
+    """
+    perft that doesn't use the move generators. Every piece is tried on every square with check_move() and
+    leaves_in_check(), the way check_mate() used to work, so it can catch a generator that misses or invents a move
+    """
+    if depth == 0:
+        return 1
+    team = game.get_player_turn()
+    nodes = 0
+    for piece in list(game.get_team_pieces(team)):
+        current = piece.get_position()
+        for row in range(10):
+            for column in range(9):
+                new = [row, column]
+                if new == current or not piece.check_move(current, new, game.get_board()):
+                    continue
+                if game.leaves_in_check(piece, current, new):
+                    continue
+                game.push((current, new))
+                nodes += perft_brute_force(game, depth - 1)
+                game.pop()
+    return nodes
+
+
+def perft_bitboard(game, team, depth):
+    """perft on a BitboardJanggiGame, an independent implementation of the same rules"""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for current, new in list(game.iter_legal_moves(team)):
+        captured = game.push(current, new)
+        nodes += perft_bitboard(game, 'red' if team == 'blue' else 'blue', depth - 1)
+        game.pop(current, new, captured)
+    return nodes
+
+
+def timed_perft(game, depth):
+    """runs perft and returns the node count and the nodes per second"""
+    start = time.perf_counter()
+    nodes = perft(game, depth)
+    elapsed = time.perf_counter() - start
+    return nodes, nodes / elapsed if elapsed else 0.0
+
+
+def run_suite(max_depth, cross_check_depth):
+    """
+    Runs every test position up to max_depth (or as deep as it has reference counts) and prints the node count,
+    nodes per second and whether it matches the reference. Up to cross_check_depth the counts are also compared with
+    perft_brute_force() and perft_bitboard(). Returns True if everything matched
+    """
+    passed = True
+    for position in POSITIONS:
+        print(position['name'])
+        for depth in range(1, max_depth + 1):
+            game = setup_position(position['moves'])
+            nodes, speed = timed_perft(game, depth)
+            line = '  depth ' + str(depth) + ': ' + str(nodes).rjust(9) + ' nodes ' + \
+                   format(speed, '10.0f') + ' nodes/s'
+            if depth <= len(position['counts']):
+                if nodes == position['counts'][depth - 1]:
+                    line += '  ok'
+                else:
+                    line += '  FAILED, expected ' + str(position['counts'][depth - 1])
+                    passed = False
+            if depth <= cross_check_depth:
+                brute_force = perft_brute_force(setup_position(position['moves']), depth)
+                bitboard_game = setup_position(position['moves'], BitboardJanggiGame)
+                bitboard = perft_bitboard(bitboard_game, bitboard_game.get_player_turn(), depth)
+                if brute_force == nodes and bitboard == nodes:
+                    line += '  cross-check ok'
+                else:
+                    line += '  cross-check FAILED: check_move ' + str(brute_force) + ', bitboard ' + str(bitboard)
+                    passed = False
+            print(line)
+    return passed
+
+
+def main():
+    """command line entry point, see the description at the top of the file"""
+    parser = argparse.ArgumentParser(description='Perft node counts and speed for JanggiGame')
+    parser.add_argument('--depth', type=int, help='run perft on the starting position to this depth')
+    parser.add_argument('--divide', type=int, help='print the perft count for each first move at this depth')
+    parser.add_argument('--max-depth', type=int, default=3, help='deepest depth checked by the suite')
+    parser.add_argument('--cross-check', type=int, default=0,
+                        help='also compare against check_move() and the bitboard backend up to this depth')
+    args = parser.parse_args()
+
+    if args.divide:
+        game = JanggiGame()
+        total = 0
+        for move, nodes in sorted(divide(game, args.divide).items()):
+            print(move[0] + move[1], nodes)
+            total += nodes
+        print('total', total)
+    elif args.depth:
+        for depth in range(1, args.depth + 1):
+            nodes, speed = timed_perft(JanggiGame(), depth)
+            print('depth', depth, nodes, 'nodes', format(speed, '.0f'), 'nodes/s')
+    else:
+        if not run_suite(args.max_depth, args.cross_check):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
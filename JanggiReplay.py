@@ -0,0 +1,136 @@
+# Description:  Bulk replay of recorded Janggi games. A move-list file has one game per line, with the moves written as
+#               pairs of squares, for example "a7b7 a4a5 b7b6" (a dash between the squares, "a7-b7", is also accepted).
+#               Blank lines and lines starting with # are skipped. Each game is replayed through JanggiGame.make_move()
+#               in a pool of worker processes and a result is yielded for every game as soon as it finishes: the final
+#               game state, the number of moves applied, the index of the first illegal move (None if every move was
+#               legal), why it was illegal (one of the JanggiGame MOVE_RESULTS, or 'UNREADABLE' for a move that couldn't
+#               be read) and how long the replay took. The file is read a little at a time and only a fixed number of
+#               batches are handed to the workers at once, so memory stays flat no matter how large the file is.
+#
+#               Run it from the command line to print one JSON line per game and a summary at the end:
+#                   python JanggiReplay.py games.txt --workers 8
+
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import sys
+import time
+
+from JanggiGame import JanggiGame
+
+MOVE_PATTERN = re.compile(r'([a-i](?:10|[1-9]))-?([a-i](?:10|[1-9]))$')
+
+
+def parse_moves(text):
+    """
+    Splits a line of moves into a list of (current, new) tuples. Reading stops at the first move that can't be
+    read, so the list only holds the moves before it. Returns the list and whether every move was read
+    """
+    moves = []
+    for token in text.split():
+        match = MOVE_PATTERN.match(token)
+        if match is None:
+            return moves, False
+        moves.append((match.group(1), match.group(2)))
+    return moves, True
+
+
+def iter_games(lines):
+    """yields a (game id, line) pair for every game in an iterable of lines, the id being the line number"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield number, line
+
+
+def replay_game(game_id, text):
+    """
+    Replays one game and returns its result as a dictionary. The replay stops at the first move that can't be read
+    or isn't legal, and the state is the game state at that point
+    """
+    start = time.perf_counter()
+    result = {'id': game_id, 'state': 'UNFINISHED', 'moves': 0, 'first_illegal': None, 'reason': None,
+              'time_ms': 0.0}
+    moves, complete = parse_moves(text)
+    game = JanggiGame()
+    result['moves'], reason = game.apply_moves(moves)
+    if reason != 'OK':
+        result['first_illegal'] = result['moves']
+        result['reason'] = reason
+    elif not complete:
+        result['first_illegal'] = len(moves)
+        result['reason'] = 'UNREADABLE'
+    result['state'] = game.get_game_state()
+    result['time_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def replay_batch(batch):
+    """runs in a worker process and replays a list of (game id, line) pairs"""
+    return [replay_game(game_id, text) for game_id, text in batch]
+
+
+def validate_games(lines, workers=None, batch_size=32, max_pending=None):
+    """
+    Replays every game from an iterable of lines in a pool of worker processes and yields each game's result as
+    soon as its batch is done, so results may come back out of order. Games are sent to the workers batch_size at a
+    time, and at most max_pending batches (two per worker by default) are waiting at once, so only that many games
+    are ever held in memory
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * workers
+    games = iter_games(lines)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        finished_reading = False
+        while True:
+            while not finished_reading and len(pending) < max_pending:
+                batch = []
+                for game in games:
+                    batch.append(game)
+                    if len(batch) == batch_size:
+                        break
+                if len(batch) < batch_size:
+                    finished_reading = True
+                if batch:
+                    pending.add(executor.submit(replay_batch, batch))
+            if not pending:
+                break
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                for result in future.result():
+                    yield result
+
+
+def main():
+    """command line entry point, see the description at the top of the file"""
+    parser = argparse.ArgumentParser(description='Replay and validate recorded Janggi games')
+    parser.add_argument('path', help="move-list file, one game per line, or '-' for standard input")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--batch-size', type=int, default=32, help='games sent to a worker at a time')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = {'games': 0, 'illegal': 0, 'moves': 0}
+    source = sys.stdin if args.path == '-' else open(args.path)
+    with source:
+        for result in validate_games(source, args.workers, args.batch_size):
+            counts['games'] += 1
+            counts['moves'] += result['moves']
+            if result['first_illegal'] is not None:
+                counts['illegal'] += 1
+            if not args.quiet:
+                print(json.dumps(result))
+    elapsed = time.perf_counter() - start
+    print('games', counts['games'], 'with illegal moves', counts['illegal'], 'moves', counts['moves'],
+          format(elapsed, '.2f') + 's', format(counts['games'] / elapsed if elapsed else 0, '.0f') + ' games/s',
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
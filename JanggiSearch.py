@@ -0,0 +1,269 @@
+# Description:  A computer opponent for JanggiGame. Searcher.search() looks for the best move for whoever's turn it is
+#               using negamax alpha-beta search with iterative deepening: it searches 1 move deep, then 2, and so on
+#               until the time budget runs out, and returns the best move from the deepest search it finished. Scores
+#               come from a material and positional evaluation, with a short capture-only search at the leaves so
+#               exchanges aren't cut off halfway. Results are kept in a TranspositionTable so positions reached by
+#               different move orders are only searched once, and the best move from the previous depth is tried first.
+#
+#               The move is returned in the same algebraic notation make_move() takes, for example:
+#                   result = Searcher().search(game, time_ms=500)
+#                   game.make_move(result['move'][0], result['move'][1])
+
+import time
+
+from JanggiGame import TranspositionTable
+
+# material values, in hundredths of a soldier
+PIECE_VALUES = {'General': 0, 'Guard': 300, 'Elephant': 300, 'Horse': 500, 'Cannon': 700, 'Chariot': 1300,
+                'Soldier': 200}
+
+# bonus for each row a soldier has advanced past its starting row, and for horses and chariots near the center files
+SOLDIER_ADVANCE = 15
+CENTER_BONUS = [0, 5, 10, 15, 20, 15, 10, 5, 0]
+
+MATE_SCORE = 100000
+INFINITY = 1000000
+
+# transposition table flags, telling whether a stored score is exact or only a bound
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget runs out, so the search can unwind back to the root"""
+    pass
+
+
+class Searcher:
+    """
+    Represents an alpha-beta search engine. One Searcher can be used for a whole game so its transposition table
+    carries over from move to move
+    """
+
+    def __init__(self, table=None, memory_mb=16):
+        """
+        Initializes the searcher with a transposition table, either the one passed in or a new one of memory_mb
+        megabytes. The node counter, deadline and principal variation are set up fresh by each search
+        """
+        if table is None:
+            table = TranspositionTable(memory_mb)
+        self._table = table
+        self._nodes = 0
+        self._deadline = None
+        self._pv = []
+        self._root_moves = None
+
+    def evaluate(self, game):
+        """
+        Returns the score of the position for the side to move: material for each piece still on the board, plus a
+        bonus for advanced soldiers and for horses and chariots near the center
+        """
+        score = 0
+        for team, sign in [['blue', 1], ['red', -1]]:
+            for piece in game.get_team_pieces(team):
+                piece_type = piece.get_type()
+                value = PIECE_VALUES[piece_type]
+                position = piece.get_position()
+                if piece_type == 'Soldier':
+                    if team == 'red':
+                        value += SOLDIER_ADVANCE * (position[0] - 3)
+                    else:
+                        value += SOLDIER_ADVANCE * (6 - position[0])
+                elif piece_type == 'Horse' or piece_type == 'Chariot':
+                    value += CENTER_BONUS[position[1]]
+                score += sign * value
+        if game.get_player_turn() == 'red':
+            return -score
+        return score
+
+    def order_moves(self, game, moves, best_move):
+        """
+        Sorts moves so the best move from the transposition table comes first, then captures of the most valuable
+        pieces by the least valuable ones, then everything else
+        """
+        board = game.get_board()
+
+        def move_order(move):
+            if move == best_move:
+                return -INFINITY
+            target = board[move[1][0]][move[1][1]]
+            if target == '-------':
+                return 0
+            attacker = board[move[0][0]][move[0][1]]
+            return PIECE_VALUES[attacker.get_type()] // 100 - PIECE_VALUES[target.get_type()]
+
+        moves.sort(key=move_order)
+        return moves
+
+    def check_time(self):
+        """counts a node and raises SearchTimeout if the time budget has run out"""
+        self._nodes += 1
+        if time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+    def quiescence(self, game, alpha, beta):
+        """searches only captures until the position is quiet, so the evaluation isn't taken in the middle of a trade"""
+        self.check_time()
+        stand_pat = self.evaluate(game)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        team = game.get_player_turn()
+        board = game.get_board()
+        captures = []
+        for piece in game.get_team_pieces(team):
+            current = piece.get_position()
+            for new in piece.generate_moves(current, board):
+                if board[new[0]][new[1]] != '-------':
+                    captures.append((current, new))
+        for current, new in self.order_moves(game, captures, None):
+            piece = board[current[0]][current[1]]
+            if game.leaves_in_check(piece, current, new):
+                continue
+            game.push((current, new))
+            try:
+                score = -self.quiescence(game, -beta, -alpha)
+            finally:
+                game.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def negamax(self, game, depth, alpha, beta, ply):
+        """
+        Returns the score of the position for the side to move, searched depth moves deep. The principal variation
+        found below this node is left in self._pv[ply]
+        """
+        self.check_time()
+        self._pv[ply] = []
+        if ply >= len(self._pv) - 1:  # only reachable through a long run of check extensions
+            return self.evaluate(game)
+        team = game.get_player_turn()
+        in_check = game.is_in_check(team)
+
+        key = game.get_hash()
+        entry = self._table.probe(key)
+        best_move = None
+        if entry is not None and entry[0] == 'search':
+            entry_depth, entry_score, entry_flag, best_move = entry[1:]
+            if ply > 0 and entry_depth >= depth:
+                if entry_score > MATE_SCORE - 1000:
+                    entry_score -= ply
+                elif entry_score < -MATE_SCORE + 1000:
+                    entry_score += ply
+                if entry_flag == EXACT or entry_flag == LOWER and entry_score >= beta or \
+                        entry_flag == UPPER and entry_score <= alpha:
+                    if best_move is not None:
+                        self._pv[ply] = [best_move]
+                    return entry_score
+
+        if depth <= 0 and not in_check:
+            return self.quiescence(game, alpha, beta)
+
+        moves = []
+        for piece, current, new in game.iter_legal_moves(team):
+            moves.append((current, new))
+        if not moves and in_check:
+            return -MATE_SCORE + ply
+        self.order_moves(game, moves, best_move)
+        if not in_check:
+            general = game.get_general(team).get_position()
+            moves.append((general, general))  # passing is legal when not in check, tried last
+        if ply == 0 and self._root_moves is not None:
+            moves = [move for move in moves if move in self._root_moves]
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        for move in moves:
+            game.push(move)
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                self._pv[ply] = [move] + self._pv[ply + 1]
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        stored_score = best_score
+        if stored_score > MATE_SCORE - 1000:
+            stored_score += ply
+        elif stored_score < -MATE_SCORE + 1000:
+            stored_score -= ply
+        if ply > 0 or self._root_moves is None:  # a root searched on only some moves isn't a real result
+            self._table.store(key, ('search', depth, stored_score, flag, best_move), depth)
+        return best_score
+
+    def search(self, game, time_ms=1000, max_depth=32, root_moves=None):
+        """
+        Searches the game's current position for the side to move, deepening one move at a time until time_ms
+        milliseconds have passed or max_depth is reached. The game is left exactly as it was. Returns a dictionary with
+        the best move as a (current, new) tuple in algebraic notation (None if the game is over), its score, the depth
+        reached, the principal variation as a list of moves, the number of nodes searched and the time taken in
+        milliseconds. 'iterations' holds the score, move and principal variation from every depth that finished.
+        If root_moves is a list of moves in algebraic notation, only those moves are searched at the root, which is how
+        the parallel search splits the work between processes
+        """
+        start = time.perf_counter()
+        self._deadline = start + time_ms / 1000
+        self._nodes = 0
+        self._root_moves = None
+        if root_moves is not None:
+            self._root_moves = [(game.convert_position(current), game.convert_position(new))
+                                for current, new in root_moves]
+        result = {'move': None, 'score': 0, 'depth': 0, 'pv': [], 'nodes': 0, 'time_ms': 0.0, 'iterations': []}
+        if game.get_game_state() != 'UNFINISHED':
+            return result
+
+        for depth in range(1, max_depth + 1):
+            self._pv = [[] for ply in range(max_depth + 64)]
+            try:
+                score = self.negamax(game, depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                break
+            pv = self._pv[0]
+            result['score'] = score
+            result['depth'] = depth
+            result['pv'] = [(game.convert_to_algebraic(current), game.convert_to_algebraic(new))
+                            for current, new in pv]
+            if result['pv']:
+                result['move'] = result['pv'][0]
+            result['iterations'].append({'depth': depth, 'score': score, 'move': result['move'], 'pv': result['pv']})
+            if abs(score) > MATE_SCORE - 1000:
+                break
+            # the next depth takes several times longer than this one, so don't start it if it can't finish
+            if (time.perf_counter() - start) * 3 > time_ms / 1000:
+                break
+
+        if result['move'] is None:  # not even the first depth finished, fall back on any legal move
+            team = game.get_player_turn()
+            moves = root_moves or game.legal_moves(team)
+            if moves:
+                result['move'] = moves[0]
+            elif not game.is_in_check(team):
+                general = game.convert_to_algebraic(game.get_general(team).get_position())
+                result['move'] = (general, general)
+        result['nodes'] = self._nodes
+        result['time_ms'] = (time.perf_counter() - start) * 1000
+        return result
+
+
+def find_best_move(game, time_ms=1000):
+    """searches the game's position with a new Searcher and returns the best move in algebraic notation"""
+    return Searcher().search(game, time_ms)['move']
@@ -0,0 +1,320 @@
+# Description:  An asyncio server that hosts many JanggiGame sessions in one event loop. Clients connect over TCP or a
+#               Unix socket and send one JSON request per line, and get one JSON response per line back, in order.
+#               Every request has an "op" and may have an "id", which is copied into the response. The operations are:
+#                   {"op": "create"}                                new game, or {"op": "create", "fen": "..."}
+#                   {"op": "move", "game": "g1", "from": "c7", "to": "c6"}
+#                   {"op": "state", "game": "g1"}               turn, game state, check, FEN and move count
+#                   {"op": "board", "game": "g1"}               the board as 10 rows of piece names, rank 1 first
+#                   {"op": "resign", "game": "g1", "team": "red"}
+#                   {"op": "hint", "game": "g1", "time_ms": 200}   best move from the search engine
+#               A response has "ok": true and the results, or "ok": false and an "error", which for a move is one of
+#               the JanggiGame MOVE_RESULTS. A request that isn't a JSON object, or has a field of the wrong type
+#               (see FIELD_TYPES), gets a BAD_REQUEST error and the connection stays open. Moves (which run checkmate
+#               detection) are made in a thread pool and hints are searched in a process pool, so the event loop never
+#               waits on them. A session only runs one request at a time, the others wait their turn. Games are kept
+#               in a SessionStore, so idle ones are spilled to disk once there are more than --max-games in memory or
+#               they've been idle for --idle-seconds, and read back in the thread pool the next time they're used.
+#
+#               Run the server, then the load generator against it to measure move latency:
+#                   python JanggiServer.py serve --port 8765
+#                   python JanggiServer.py load --port 8765 --sessions 500 --moves 40
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import random
+import time
+
+from JanggiGame import JanggiGame
+from JanggiSearch import Searcher
+from JanggiSessions import SessionStore
+
+# the type each request field must have when it is given
+FIELD_TYPES = {'op': str, 'game': str, 'fen': str, 'from': str, 'to': str, 'team': str, 'time_ms': int}
+
+
+def search_hint(fen, time_ms):
+    """runs in a worker process and returns the search engine's move for the position"""
+    return Searcher(memory_mb=4).search(JanggiGame.from_fen(fen), time_ms)['move']
+
+
+class JanggiServer:
+    """
+    Represents the game server. Games are kept in a SessionStore by game id, with an asyncio lock for each one so its
+    requests run one at a time. Call start() to listen on a TCP port or a Unix socket, and close() to stop
+    """
+
+    def __init__(self, move_workers=4, hint_workers=1, max_hint_ms=5000, store=None, idle_seconds=None):
+        """
+        initializes the server with no sessions. move_workers threads make moves and hint_workers processes search
+        for hints, a hint can search for at most max_hint_ms milliseconds. Games are kept in store (a SessionStore
+        spilling to a temporary directory if it isn't given), and if idle_seconds is given games that haven't been used
+        for that long are spilled to disk
+        """
+        if store is None:
+            store = SessionStore()
+        self._store = store
+        self._locks = {}
+        self._idle_seconds = idle_seconds
+        self._evictor = None
+        self._move_executor = concurrent.futures.ThreadPoolExecutor(move_workers)
+        self._hint_workers = hint_workers
+        self._hint_executor = None
+        self._max_hint_ms = max_hint_ms
+        self._servers = []
+        self._operations = {'create': self.create, 'move': self.move, 'state': self.state, 'board': self.board,
+                            'resign': self.resign, 'hint': self.hint}
+
+    def get_session_count(self):
+        """returns the number of hosted games"""
+        return len(self._store)
+
+    def get_store(self):
+        """returns the SessionStore holding the games"""
+        return self._store
+
+    async def evict_idle(self):
+        """runs while the server is up, spilling idle games to disk a few times per idle period"""
+        while True:
+            await asyncio.sleep(max(self._idle_seconds / 4, 0.1))
+            self._store.evict_idle(self._idle_seconds)
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        """starts listening on a Unix socket if path is given, otherwise on the TCP host and port"""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_client, path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        self._servers.append(server)
+        if self._idle_seconds is not None and self._evictor is None:
+            self._evictor = asyncio.create_task(self.evict_idle())
+        return server
+
+    async def close(self):
+        """stops listening and shuts down the executors"""
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self._evictor is not None:
+            self._evictor.cancel()
+            self._evictor = None
+        self._move_executor.shutdown(wait=False)
+        if self._hint_executor is not None:
+            self._hint_executor.shutdown(wait=False)
+
+    async def handle_client(self, reader, writer):
+        """reads requests from one connection until it closes and writes back a response for each"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_line(line)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_line(self, line):
+        """decodes one request line, runs it and returns the response as a dictionary"""
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'ok': False, 'error': 'BAD_REQUEST'}
+        if type(request) is not dict:
+            return {'ok': False, 'error': 'BAD_REQUEST'}
+        bad_fields = [field for field, field_type in FIELD_TYPES.items()
+                      if field in request and type(request[field]) is not field_type]
+        operation = None if bad_fields else self._operations.get(request.get('op'))
+        if bad_fields:
+            response = {'ok': False, 'error': 'BAD_REQUEST', 'message': 'wrong type for ' + ', '.join(bad_fields)}
+        elif operation is None:
+            response = {'ok': False, 'error': 'UNKNOWN_OP'}
+        elif request.get('op') == 'create':
+            response = await operation(request)
+        else:
+            game_id = request.get('game')
+            lock = self._locks.get(game_id)
+            if lock is None:
+                response = {'ok': False, 'error': 'UNKNOWN_GAME'}
+            else:
+                async with lock:
+                    spill = None
+                    if self._store.is_spilled(game_id):
+                        loop = asyncio.get_running_loop()
+                        spill = await loop.run_in_executor(self._move_executor, self._store.read_spill, game_id)
+                    game = self._store.pin(game_id, spill)  # keep it in memory while a thread may be using it
+                    try:
+                        response = await operation(game, request)
+                    finally:
+                        self._store.unpin(game_id)
+                    self._store.update_size(game_id)
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    async def create(self, request):
+        """creates a session, from the starting position or from a FEN"""
+        if 'fen' in request:
+            try:
+                game = JanggiGame.from_fen(request['fen'])
+            except (ValueError, AttributeError) as error:
+                return {'ok': False, 'error': 'BAD_FEN', 'message': str(error)}
+        else:
+            game = JanggiGame()
+        game_id = self._store.add(game)
+        self._locks[game_id] = asyncio.Lock()
+        return {'ok': True, 'game': game_id, 'turn': game.get_player_turn()}
+
+    async def move(self, game, request):
+        """makes a move in the thread pool, since it runs checkmate detection"""
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self._move_executor, game.try_move, request.get('from'), request.get('to'))
+        if result != 'OK':
+            return {'ok': False, 'error': result}
+        return {'ok': True, 'turn': game.get_player_turn(), 'state': game.get_game_state()}
+
+    async def state(self, game, request):
+        """returns the turn, game state, whether the side to move is in check, the FEN and the number of moves"""
+        turn = game.get_player_turn()
+        return {'ok': True, 'turn': turn, 'state': game.get_game_state(), 'in_check': game.is_in_check(turn),
+                'fen': game.to_fen(), 'moves': len(game.get_move_history())}
+
+    async def board(self, game, request):
+        """returns the board as rows of piece names, the same names print_board() shows"""
+        rows = []
+        for row in game.get_board():
+            rows.append([item if item == '-------' else item.get_name() for item in row])
+        return {'ok': True, 'board': rows}
+
+    async def resign(self, game, request):
+        """ends the game with a loss for the team that resigns"""
+        if request.get('team') not in ['red', 'blue']:
+            return {'ok': False, 'error': 'BAD_TEAM'}
+        if not game.resign(request['team']):
+            return {'ok': False, 'error': 'GAME_OVER'}
+        return {'ok': True, 'state': game.get_game_state()}
+
+    async def hint(self, game, request):
+        """searches the position in the process pool and returns the best move"""
+        if game.get_game_state() != 'UNFINISHED':
+            return {'ok': False, 'error': 'GAME_OVER'}
+        if self._hint_executor is None:
+            self._hint_executor = concurrent.futures.ProcessPoolExecutor(self._hint_workers)
+        time_ms = min(max(request.get('time_ms', 200), 1), self._max_hint_ms)
+        loop = asyncio.get_running_loop()
+        move = await loop.run_in_executor(self._hint_executor, search_hint, game.to_fen(), time_ms)
+        return {'ok': True, 'move': move}
+
+
+async def run_session(reader, writer, moves, rng, latencies):
+    """
+    plays one random game over an open connection for the load generator: creates it, then makes up to moves random
+    legal moves, keeping a local copy of the game to pick them. Each move's round trip time is added to latencies
+    """
+    async def request(message):
+        writer.write(json.dumps(message).encode() + b'\n')
+        await writer.drain()
+        return json.loads(await reader.readline())
+
+    game_id = (await request({'op': 'create'}))['game']
+    game = JanggiGame()
+    for index in range(moves):
+        legal = game.legal_moves(game.get_player_turn())
+        if not legal or game.get_game_state() != 'UNFINISHED':
+            break
+        current, new = rng.choice(legal)
+        start = time.perf_counter()
+        response = await request({'op': 'move', 'game': game_id, 'from': current, 'to': new})
+        latencies.append(time.perf_counter() - start)
+        if not response['ok']:
+            raise RuntimeError('server turned down a legal move: ' + current + new + ' ' + response['error'])
+        game.try_move(current, new)
+
+
+async def run_load(host, port, path, sessions, moves, connections, seed):
+    """
+    Runs the load generator: plays sessions random games of up to moves moves each, spread over connections open
+    connections, and returns a dictionary with the number of sessions and moves, the time taken and the p50 and p99
+    move latency in milliseconds
+    """
+    rng = random.Random(seed)
+    latencies = []
+    queue = asyncio.Queue()
+    for index in range(sessions):
+        queue.put_nowait(index)
+
+    async def worker():
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while not queue.empty():
+                queue.get_nowait()
+                await run_session(reader, writer, moves, rng, latencies)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for index in range(min(connections, sessions))])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    result = {'sessions': sessions, 'moves': len(latencies), 'seconds': elapsed, 'p50_ms': 0.0, 'p99_ms': 0.0}
+    if latencies:
+        result['p50_ms'] = latencies[len(latencies) // 2] * 1000
+        result['p99_ms'] = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000
+    return result
+
+
+async def serve(host, port, path, move_workers, hint_workers, max_games, idle_seconds):
+    """runs the server until it is interrupted"""
+    server = JanggiServer(move_workers, hint_workers, store=SessionStore(max_games=max_games),
+                          idle_seconds=idle_seconds)
+    listener = await server.start(host, port, path)
+    print('listening on', path if path is not None else host + ':' + str(port))
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    """command line entry point, see the description at the top of the file"""
+    parser = argparse.ArgumentParser(description='Janggi game server and load generator')
+    parser.add_argument('mode', choices=['serve', 'load'], help='run the server or the load generator')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    parser.add_argument('--unix', help='Unix socket path, used instead of TCP')
+    parser.add_argument('--move-workers', type=int, default=4, help='threads making moves (serve)')
+    parser.add_argument('--hint-workers', type=int, default=os.cpu_count(), help='processes searching hints (serve)')
+    parser.add_argument('--max-games', type=int, default=10000, help='games kept in memory (serve)')
+    parser.add_argument('--idle-seconds', type=float, help='spill games idle this long to disk (serve)')
+    parser.add_argument('--sessions', type=int, default=200, help='games to play (load)')
+    parser.add_argument('--moves', type=int, default=40, help='moves per game (load)')
+    parser.add_argument('--connections', type=int, default=50, help='open connections (load)')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the random moves (load)')
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        try:
+            asyncio.run(serve(args.host, args.port, args.unix, args.move_workers, args.hint_workers, args.max_games,
+                              args.idle_seconds))
+        except KeyboardInterrupt:
+            pass
+        return
+    result = asyncio.run(run_load(args.host, args.port, args.unix, args.sessions, args.moves, args.connections,
+                                  args.seed))
+    print('sessions', result['sessions'], 'moves', result['moves'], format(result['seconds'], '.2f') + 's',
+          format(result['moves'] / result['seconds'] if result['seconds'] else 0, '.0f') + ' moves/s',
+          'p50', format(result['p50_ms'], '.2f') + 'ms', 'p99', format(result['p99_ms'], '.2f') + 'ms',
+          'cores', os.cpu_count())
+
+
+if __name__ == '__main__':
+    main()
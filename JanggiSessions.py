@@ -0,0 +1,264 @@
+# Description:  A session store for holding many JanggiGame games at once with bounded memory. The most recently used
+#               games are kept in memory in least recently used order, up to a maximum number of games and an estimated
+#               number of megabytes. When either limit is passed, or a game has been idle for too long, the least
+#               recently used games are spilled to disk in a compact form and dropped from memory, and the next time one
+#               is asked for it is read back and rebuilt without the caller noticing. The game that was just used is
+#               never the one spilled to make room, so the store can hold one game more than its limits for a while.
+#
+#               A spilled game is a small file: the 92 byte snapshot of the position its move history starts from, one
+#               byte for the game state, its repetition rules (see RULES), then the two square indexes (row * 9 +
+#               column) of every move. Spilling reads the game without changing it, and rebuilding it replays the moves
+#               with JanggiGame.replay(), so the move history, pop() and perpetual check still work after a restore.
+#
+#                   store = SessionStore('/var/tmp/janggi', max_games=1000)
+#                   game_id = store.add(JanggiGame())
+#                   store.make_move(game_id, 'c7', 'c6')
+#                   print(store.get_stats())
+
+import collections
+import os
+import struct
+import tempfile
+import time
+
+from JanggiGame import JanggiGame, GAME_STATES, REPETITION_OUTCOMES, get_starting_template
+
+# rough memory used by a game in memory and by each move in its history, for the max_memory_mb limit
+GAME_BYTES = 10000
+MOVE_BYTES = 250
+
+# a spilled game's repetition rules: the limit (0 when the rules are off) and the REPETITION_OUTCOMES indexes of the
+# repetition and perpetual check outcomes
+RULES = struct.Struct('<IBB')
+HEADER_SIZE = 93 + RULES.size
+
+
+class SessionStore:
+    """
+    Represents a store of games by id, some in memory and the rest spilled to files in spill_dir. get_stats() returns
+    the hit, miss, spill and restore counters and the time spent spilling and restoring
+    """
+
+    def __init__(self, spill_dir=None, max_games=1000, max_memory_mb=None, transposition_table=None):
+        """
+        initializes an empty store. Spilled games are written to spill_dir (a new temporary directory if it isn't
+        given). At most max_games games, and if max_memory_mb is given at most about that many megabytes of games, are
+        kept in memory. Restored games are given the transposition_table
+        """
+        if spill_dir is None:
+            spill_dir = tempfile.mkdtemp(prefix='janggi-sessions-')
+        os.makedirs(spill_dir, exist_ok=True)
+        self._spill_dir = spill_dir
+        self._max_games = max_games
+        self._max_bytes = None if max_memory_mb is None else max_memory_mb * 1024 * 1024
+        self._table = transposition_table
+        # game id -> [game, time last used, estimated bytes], least recently used first
+        self._resident = collections.OrderedDict()
+        self._resident_bytes = 0
+        self._spilled = set()
+        self._pinned = set()
+        self._next_id = 1
+        self._stats = {'hits': 0, 'misses': 0, 'spills': 0, 'restores': 0, 'spill_ms': 0.0, 'restore_ms': 0.0}
+
+    def __len__(self):
+        """returns the number of games in the store, in memory or spilled"""
+        return len(self._resident) + len(self._spilled)
+
+    def __contains__(self, game_id):
+        """returns True if the game id is in the store"""
+        return game_id in self._resident or game_id in self._spilled
+
+    def get_spill_path(self, game_id):
+        """returns the file a game is spilled to"""
+        return os.path.join(self._spill_dir, game_id + '.janggi')
+
+    def estimate_size(self, game):
+        """returns the rough number of bytes a game uses in memory"""
+        return GAME_BYTES + MOVE_BYTES * len(game.get_move_history())
+
+    def add(self, game, game_id=None):
+        """adds a game to the store as the most recently used and returns its id (a new one if game_id isn't given)"""
+        if game_id is None:
+            game_id = 'g' + str(self._next_id)
+            self._next_id += 1
+        if game_id in self:
+            raise KeyError('game id already in the store: ' + game_id)
+        self._resident[game_id] = [game, time.monotonic(), self.estimate_size(game)]
+        self._resident_bytes += self._resident[game_id][2]
+        self.enforce_limits(game_id)
+        return game_id
+
+    def is_spilled(self, game_id):
+        """returns True if the game is on disk rather than in memory"""
+        return game_id in self._spilled
+
+    def get(self, game_id, spill=None):
+        """
+        returns the game with the given id, reading it back from disk if it was spilled, and marks it as the most
+        recently used. If the game was already read with read_spill(), its result can be passed as spill so the file
+        isn't read again. Raises KeyError if the id isn't in the store
+        """
+        entry = self._resident.get(game_id)
+        if entry is not None:
+            self._stats['hits'] += 1
+            self._resident.move_to_end(game_id)
+            entry[1] = time.monotonic()
+            return entry[0]
+        if game_id not in self._spilled:
+            raise KeyError(game_id)
+        self._stats['misses'] += 1
+        game = self.restore(game_id, spill)
+        self._resident[game_id] = [game, time.monotonic(), self.estimate_size(game)]
+        self._resident_bytes += self._resident[game_id][2]
+        self.enforce_limits(game_id)
+        return game
+
+    def make_move(self, game_id, current_location, new_location):
+        """makes a move in the game with JanggiGame.try_move() and returns its result"""
+        game = self.get(game_id)
+        result = game.try_move(current_location, new_location)
+        self.update_size(game_id)
+        return result
+
+    def update_size(self, game_id):
+        """works out the size of a game in memory again after moves were made on it, and spills others if needed"""
+        entry = self._resident.get(game_id)
+        if entry is not None:
+            size = self.estimate_size(entry[0])
+            self._resident_bytes += size - entry[2]
+            entry[2] = size
+            self.enforce_limits(game_id)
+
+    def remove(self, game_id):
+        """removes a game from the store, in memory or on disk. Raises KeyError if the id isn't in the store"""
+        entry = self._resident.pop(game_id, None)
+        if entry is not None:
+            self._resident_bytes -= entry[2]
+        elif game_id in self._spilled:
+            self._spilled.remove(game_id)
+            os.remove(self.get_spill_path(game_id))
+        else:
+            raise KeyError(game_id)
+        self._pinned.discard(game_id)
+
+    def pin(self, game_id, spill=None):
+        """
+        keeps a game in memory until unpin() is called, for while it is being used outside the store, and returns it
+        like get()
+        """
+        already_pinned = game_id in self._pinned
+        self._pinned.add(game_id)
+        try:
+            return self.get(game_id, spill)
+        except KeyError:
+            if not already_pinned:
+                self._pinned.discard(game_id)
+            raise
+
+    def unpin(self, game_id):
+        """lets a pinned game be spilled again"""
+        self._pinned.discard(game_id)
+        self.enforce_limits()
+
+    def is_over_limits(self):
+        """returns True if there are more games, or more estimated bytes, in memory than allowed"""
+        if len(self._resident) > self._max_games:
+            return True
+        return self._max_bytes is not None and self._resident_bytes > self._max_bytes
+
+    def enforce_limits(self, keep=None):
+        """
+        spills the least recently used games that aren't pinned until the store is within its limits. The game with the
+        id keep, the one just used, is never spilled, since the caller is about to be handed it
+        """
+        if not self.is_over_limits():
+            return
+        for game_id in list(self._resident):
+            if game_id in self._pinned or game_id == keep:
+                continue
+            self.spill(game_id)
+            if not self.is_over_limits():
+                return
+
+    def evict_idle(self, idle_seconds):
+        """spills every game that isn't pinned and hasn't been used for idle_seconds. Returns how many were spilled"""
+        cutoff = time.monotonic() - idle_seconds
+        idle = [game_id for game_id, entry in self._resident.items()
+                if entry[1] < cutoff and game_id not in self._pinned]
+        for game_id in idle:
+            self.spill(game_id)
+        return len(idle)
+
+    def spill(self, game_id):
+        """
+        writes a game in memory to its file and drops it from memory. The game itself isn't changed, so anyone still
+        holding it keeps the position and move history it had
+        """
+        start = time.perf_counter()
+        game, last_used, size = self._resident.pop(game_id)
+        self._resident_bytes -= size
+        data = bytearray(game.get_start_snapshot() or get_starting_template()['snapshot'])
+        data.append(GAME_STATES.index(game.get_game_state()))
+        rules = game.get_repetition_rules()
+        if rules is None:
+            data += RULES.pack(0, 0, 0)
+        else:
+            data += RULES.pack(rules[0], REPETITION_OUTCOMES.index(rules[1]), REPETITION_OUTCOMES.index(rules[2]))
+        for current, new in game.get_move_history():
+            current = game.convert_position(current)
+            new = game.convert_position(new)
+            data.append(current[0] * 9 + current[1])
+            data.append(new[0] * 9 + new[1])
+        path = self.get_spill_path(game_id)
+        with open(path + '.tmp', 'wb') as spill_file:
+            spill_file.write(data)
+        os.replace(path + '.tmp', path)
+        self._spilled.add(game_id)
+        self._stats['spills'] += 1
+        self._stats['spill_ms'] += (time.perf_counter() - start) * 1000
+
+    def read_spill(self, game_id):
+        """
+        reads a spilled game back from its file and rebuilds it without changing the store, so it can be done in
+        another thread while the game's file is left alone. Returns the game and the milliseconds it took
+        """
+        start = time.perf_counter()
+        with open(self.get_spill_path(game_id), 'rb') as spill_file:
+            data = spill_file.read()
+        if data[:92] == get_starting_template()['snapshot']:
+            game = JanggiGame(self._table)
+        else:
+            game = JanggiGame.from_snapshot(data[:92], self._table)
+        limit, repetition, perpetual_check = RULES.unpack_from(data, 93)
+        if limit:
+            game.set_repetition_rules(limit, REPETITION_OUTCOMES[repetition], REPETITION_OUTCOMES[perpetual_check])
+        game.replay([(list(divmod(data[index], 9)), list(divmod(data[index + 1], 9)))
+                     for index in range(HEADER_SIZE, len(data), 2)])
+        game.set_game_state(GAME_STATES[data[92]])
+        return game, (time.perf_counter() - start) * 1000
+
+    def restore(self, game_id, spill=None):
+        """
+        reads a spilled game back from its file with read_spill() (or takes what it returned as spill), deletes the
+        file and returns the game
+        """
+        if spill is None:
+            spill = self.read_spill(game_id)
+        start = time.perf_counter()
+        game, read_ms = spill
+        os.remove(self.get_spill_path(game_id))
+        self._spilled.remove(game_id)
+        self._stats['restores'] += 1
+        self._stats['restore_ms'] += read_ms + (time.perf_counter() - start) * 1000
+        return game
+
+    def get_stats(self):
+        """
+        returns a dictionary of counters: hits and misses (games found in memory or read back from disk), spills and
+        restores with the total milliseconds spent on each, and the number of games and estimated bytes in memory
+        and the number of games on disk
+        """
+        stats = dict(self._stats)
+        stats.update({'resident': len(self._resident), 'resident_bytes': self._resident_bytes,
+                      'spilled': len(self._spilled)})
+        return stats
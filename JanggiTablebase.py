@@ -0,0 +1,547 @@
+# Description:  Endgame tablebases for JanggiGame, built by retrograde analysis. A table covers every position with
+#               one set of pieces, its material signature, written like the pieces in a FEN: blue's pieces in capitals
+#               then red's in lower case, for example 'KRka' is blue general and chariot against red general and guard.
+#               For each position and side to move it stores the distance to mate in plies (half moves), or that the
+#               position is a draw, so the best move can be found by looking at the positions each move leads to.
+#
+#               Positions are indexed by the square of each piece in signature order (generals and guards can only
+#               be on the squares of their own palace) and the side to move, so a table is one byte per index and
+#               nothing needs to be searched to find a position. The byte is 0 for a draw, 255 for an index that
+#               isn't a position (two pieces on one square, the side that just moved left in check, or two identical
+#               pieces out of order), and otherwise the distance to mate plus one: odd numbers mean the side to move
+#               loses, even numbers that it wins. A table file is a 24 byte header (b'JTB1', the signature and the
+#               number of indexes) followed by the bytes, and is memory-mapped when it is probed.
+#
+#               Building a table first builds the tables for every signature one capture away from it. Then every
+#               position is scanned in a pool of worker processes, using BitboardJanggiGame for the rules, to count its
+#               moves and look up the captures in the smaller tables. The positions that are mated or decided by a
+#               capture are worked backwards from with unmoves, in order of distance to mate, until nothing more can be
+#               decided, and whatever is left is a draw. Passing counts as a move, as it does in the game.
+#
+#               Run it from the command line:
+#                   python JanggiTablebase.py build KRka --dir tables --workers 4
+#                   python JanggiTablebase.py probe "9/4K4/9/9/9/9/9/9/3ak4/4r4 b UNFINISHED" --dir tables
+
+import argparse
+import array
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+
+from JanggiGame import JanggiGame, FEN_LETTERS, PIECE_TYPES
+from JanggiBitboard import BitboardJanggiGame, RED, BLUE, TEAMS, GENERAL, GUARD, HORSE, ELEPHANT, CHARIOT, \
+    CANNON, SOLDIER, LINES, HORSE_MOVES, ELEPHANT_MOVES, PALACE_STEPS, SOLDIER_MOVES
+
+MAGIC = b'JTB1'
+HEADER = struct.Struct('<4s16sI')
+DRAW = 0
+INVALID = 255
+MAX_DISTANCE = 250
+MAX_INDEXES = 100000000
+
+# piece letters (see FEN_LETTERS in JanggiGame) to the BitboardJanggiGame piece types
+LETTER_TYPES = {'k': GENERAL, 'a': GUARD, 'b': ELEPHANT, 'n': HORSE, 'r': CHARIOT, 'c': CANNON, 'p': SOLDIER}
+TYPE_LETTERS = dict((piece_type, letter) for letter, piece_type in LETTER_TYPES.items())
+
+# the side to move is the lowest bit of an index, in the same order as JanggiGame.TEAM_CODES
+SIDES = [BLUE, RED]
+
+PALACES = {RED: [row * 9 + column for row in range(3) for column in range(3, 6)],
+           BLUE: [row * 9 + column for row in range(7, 10) for column in range(3, 6)]}
+
+# for each team and square, the squares a soldier of that team could have stepped from
+SOLDIER_ORIGINS = {}
+for _team in [RED, BLUE]:
+    SOLDIER_ORIGINS[_team] = [[] for _square in range(90)]
+    for _square in range(90):
+        for _new in SOLDIER_MOVES[_team][_square]:
+            SOLDIER_ORIGINS[_team][_new].append(_square)
+
+_worker_tablebase = None
+_worker_board = None
+
+
+def canonical_signature(signature):
+    """
+    returns the signature with blue's pieces then red's, each in FEN_LETTERS order. Raises ValueError if it has a
+    letter that isn't a piece or either team doesn't have exactly one general
+    """
+    for letter in signature:
+        if letter.lower() not in FEN_LETTERS:
+            raise ValueError('not a piece letter: ' + letter)
+    if signature.count('K') != 1 or signature.count('k') != 1:
+        raise ValueError('each team needs exactly one general: ' + signature)
+    blue = sorted([letter for letter in signature if letter.isupper()], key=lambda letter: FEN_LETTERS.index(
+        letter.lower()))
+    red = sorted([letter for letter in signature if letter.islower()], key=FEN_LETTERS.index)
+    return ''.join(blue + red)
+
+
+def get_signature(squares):
+    """returns the signature of the pieces on a list of BitboardJanggiGame piece codes"""
+    letters = ''
+    for code in squares:
+        if code is not None:
+            letter = TYPE_LETTERS[code & 7]
+            letters += letter.upper() if code >> 3 == BLUE else letter
+    return canonical_signature(letters)
+
+
+def get_sub_signatures(signature):
+    """returns the signatures one capture away from the signature"""
+    subs = []
+    for index in range(len(signature)):
+        if signature[index] not in 'Kk':
+            sub = signature[:index] + signature[index + 1:]
+            if sub not in subs:
+                subs.append(sub)
+    return subs
+
+
+class Layout:
+    """
+    Represents the way a signature's positions are indexed: a list of pieces, each with its team, type and the squares
+    it can be on, and the radix of each piece's square in the index
+    """
+
+    def __init__(self, signature):
+        """builds the layout for a signature, which must already be canonical"""
+        self._signature = signature
+        self._pieces = []
+        radix = 2
+        for letter in signature:
+            team = BLUE if letter.isupper() else RED
+            piece_type = LETTER_TYPES[letter.lower()]
+            if piece_type == GENERAL or piece_type == GUARD:
+                domain = PALACES[team]
+            else:
+                domain = list(range(90))
+            positions = [None] * 90
+            for position in range(len(domain)):
+                positions[domain[position]] = position
+            self._pieces.append((team, piece_type, domain, positions, radix))
+            radix *= len(domain)
+        self._size = radix
+
+    def get_signature(self):
+        """returns the signature"""
+        return self._signature
+
+    def get_size(self):
+        """returns the number of indexes in a table for the signature"""
+        return self._size
+
+    def get_pieces(self):
+        """returns the list of (team, type, squares it can be on, position of each square in that list, radix)"""
+        return self._pieces
+
+    def decode(self, index):
+        """returns the square of each piece and the side to move (RED or BLUE) for an index"""
+        side = SIDES[index & 1]
+        index >>= 1
+        squares = []
+        for team, piece_type, domain, positions, radix in self._pieces:
+            index, position = divmod(index, len(domain))
+            squares.append(domain[position])
+        return squares, side
+
+    def encode(self, squares, side):
+        """
+        returns the index of the square of each piece and the side to move. Identical pieces are put in order of
+        square first, since only that order is a valid index. Returns None if a piece is on a square it can't be on
+        """
+        squares = self.sort_identical(squares)
+        index = SIDES.index(side)
+        for piece in range(len(self._pieces)):
+            position = self._pieces[piece][3][squares[piece]]
+            if position is None:
+                return None
+            index += position * self._pieces[piece][4]
+        return index
+
+    def sort_identical(self, squares):
+        """returns the squares with each run of identical pieces sorted"""
+        squares = list(squares)
+        start = 0
+        while start < len(squares):
+            end = start + 1
+            while end < len(squares) and self._signature[end] == self._signature[start]:
+                end += 1
+            if end - start > 1:
+                squares[start:end] = sorted(squares[start:end])
+            start = end
+        return squares
+
+    def encode_board(self, board_squares, side):
+        """returns the index of a position given as a list of BitboardJanggiGame piece codes on each square"""
+        by_letter = {}
+        for square in range(90):
+            code = board_squares[square]
+            if code is not None:
+                letter = TYPE_LETTERS[code & 7]
+                by_letter.setdefault(letter.upper() if code >> 3 == BLUE else letter, []).append(square)
+        squares = []
+        for letter in self._signature:
+            squares.append(by_letter[letter].pop(0))
+        return self.encode(squares, side)
+
+    def set_up(self, board, squares):
+        """clears a BitboardJanggiGame and puts the pieces on their squares"""
+        board.clear()
+        for piece in range(len(self._pieces)):
+            board.place_piece(self._pieces[piece][0], self._pieces[piece][1], squares[piece])
+
+    def is_ordered(self, squares):
+        """returns True if no two pieces share a square and identical pieces are in order of square"""
+        if len(set(squares)) != len(squares):
+            return False
+        for piece in range(1, len(squares)):
+            if self._signature[piece] == self._signature[piece - 1] and squares[piece] < squares[piece - 1]:
+                return False
+        return True
+
+
+class Table:
+    """Represents one memory-mapped table file"""
+
+    def __init__(self, path):
+        """opens and memory-maps the table file. Raises ValueError if it isn't a table file"""
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, signature, self._size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != HEADER.size + self._size:
+            self.close()
+            raise ValueError('not a tablebase file: ' + path)
+        self._layout = Layout(signature.decode().strip())
+
+    def get_layout(self):
+        """returns the table's Layout"""
+        return self._layout
+
+    def get_value(self, index):
+        """returns the byte stored for an index"""
+        return self._map[HEADER.size + index]
+
+    def close(self):
+        """unmaps and closes the file"""
+        self._map.close()
+        self._file.close()
+
+
+def get_table_path(directory, signature):
+    """returns the file a signature's table is stored in. Red pieces are lower case, so they get a '_' in front"""
+    return os.path.join(directory, ''.join('_' + letter if letter.islower() else letter for letter in signature) +
+                        '.jtb')
+
+
+class Tablebase:
+    """
+    Represents a directory of tables. Tables are opened the first time they are needed and kept open, call close() (or
+    use it in a with statement) when done
+    """
+
+    def __init__(self, directory):
+        """initializes the tablebase for the tables in the directory"""
+        self._directory = directory
+        self._tables = {}
+
+    def __enter__(self):
+        """returns the tablebase for use in a with statement"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """closes every table at the end of a with statement"""
+        self.close()
+
+    def close(self):
+        """closes every open table"""
+        for table in self._tables.values():
+            if table is not None:
+                table.close()
+        self._tables = {}
+
+    def get_table(self, signature):
+        """returns the Table for a signature, or None if there isn't one in the directory"""
+        if signature not in self._tables:
+            path = get_table_path(self._directory, signature)
+            self._tables[signature] = Table(path) if os.path.exists(path) else None
+        return self._tables[signature]
+
+    def probe_squares(self, board_squares, side):
+        """
+        returns the byte stored for a position given as a list of BitboardJanggiGame piece codes and the side to move,
+        or None if there is no table for its pieces
+        """
+        table = self.get_table(get_signature(board_squares))
+        if table is None:
+            return None
+        index = table.get_layout().encode_board(board_squares, side)
+        if index is None:
+            return INVALID
+        return table.get_value(index)
+
+    def probe(self, game):
+        """
+        Looks up a JanggiGame position. Returns None if there is no table for its pieces, otherwise a dictionary with
+        the result for the side to move ('WIN', 'LOSS' or 'DRAW'), the distance to mate in plies (None for a draw) and
+        the best move in the (current, new) algebraic notation make_move() takes: the fastest win, the slowest loss or
+        a move that keeps the draw. The move is None if the side to move is mated
+        """
+        board = BitboardJanggiGame()
+        board.clear()
+        for row in range(10):
+            for column in range(9):
+                item = game.get_board()[row][column]
+                if item != '-------':
+                    letter = FEN_LETTERS[PIECE_TYPES.index(item.get_type())]
+                    team = RED if item.get_team() == 'red' else BLUE
+                    board.place_piece(team, LETTER_TYPES[letter], row * 9 + column)
+        side = RED if game.get_player_turn() == 'red' else BLUE
+        value = self.probe_squares(board.get_squares(), side)
+        if value is None or value == INVALID:
+            return None
+        result = {'result': 'DRAW', 'distance': None, 'move': None}
+        if value != DRAW:
+            result['distance'] = value - 1
+            result['result'] = 'LOSS' if (value - 1) % 2 == 0 else 'WIN'
+
+        best = None
+        moves = list(board.iter_legal_moves(TEAMS[side]))
+        if not board.is_in_check(TEAMS[side]):
+            general = board.get_squares().index(side * 8 + GENERAL)
+            moves.append((general, general))
+        for current, new in moves:
+            captured = None
+            if current != new:
+                captured = board.push(current, new)
+            after = self.probe_squares(board.get_squares(), 1 - side)
+            if current != new:
+                board.pop(current, new, captured)
+            if after is None or after == INVALID:
+                continue
+            # rank the move from the mover's side: a quick win is best, then a draw, then a slow loss
+            if after == DRAW:
+                rank = 0
+            elif (after - 1) % 2 == 0:
+                rank = 1000 - after
+            else:
+                rank = -1000 + after
+            if best is None or rank > best[0]:
+                best = (rank, current, new)
+        if best is not None:
+            result['move'] = (game.convert_to_algebraic(list(divmod(best[1], 9))),
+                              game.convert_to_algebraic(list(divmod(best[2], 9))))
+        return result
+
+
+def init_worker(directory):
+    """runs once in each worker process, opening the tablebase for looking up captures"""
+    global _worker_tablebase, _worker_board
+    _worker_tablebase = Tablebase(directory)
+    _worker_board = BitboardJanggiGame()
+
+
+def scan_range(signature, start, end):
+    """
+    Runs in a worker process and scans the indexes from start up to end. Returns start and four arrays, one entry per
+    index: the byte to start the table with (INVALID, 1 for a mated side to move, otherwise DRAW), the number of moves
+    whose result isn't known yet (moves within the table and captures into a draw), the shortest distance to a loss for
+    the other side through a capture (0 if there is none) and the longest distance to a win for the other side through
+    a capture
+    """
+    layout = Layout(signature)
+    board = _worker_board
+    values = bytearray(end - start)
+    counts = array.array('H', bytes(2 * (end - start)))
+    win_through = array.array('B', bytes(end - start))
+    longest_loss = array.array('B', bytes(end - start))
+    for index in range(start, end):
+        offset = index - start
+        squares, side = layout.decode(index)
+        if not layout.is_ordered(squares):
+            values[offset] = INVALID
+            continue
+        layout.set_up(board, squares)
+        if board.is_in_check(TEAMS[1 - side]):
+            values[offset] = INVALID
+            continue
+        in_check = board.is_in_check(TEAMS[side])
+        count = 0 if in_check else 1  # passing
+        moves = 0
+        shortest = None
+        longest = 0
+        for current, new in list(board.iter_legal_moves(TEAMS[side])):
+            moves += 1
+            if board.get_squares()[new] is None:
+                count += 1
+                continue
+            captured = board.push(current, new)
+            after = _worker_tablebase.probe_squares(board.get_squares(), 1 - side)
+            board.pop(current, new, captured)
+            if after is None:
+                raise ValueError('missing table for a capture from ' + signature)
+            if after == DRAW:
+                count += 1
+            elif (after - 1) % 2 == 0:
+                if shortest is None or after - 1 < shortest:
+                    shortest = after - 1
+            else:
+                longest = max(longest, after - 1)
+        if in_check and moves == 0:
+            values[offset] = 1
+        counts[offset] = count
+        if shortest is not None:
+            win_through[offset] = shortest + 1
+        longest_loss[offset] = longest
+    return start, bytes(values), counts, win_through, longest_loss
+
+
+def find_predecessors(layout, board, index):
+    """
+    yields the index of every position one move (or pass) before the position at index. An index may not be a valid
+    position, the caller checks that in the table. The board is used to check each unmove
+    """
+    squares, side = layout.decode(index)
+    mover = 1 - side
+    layout.set_up(board, squares)
+    if not board.is_in_check(TEAMS[mover]):
+        yield layout.encode(squares, mover)
+    pieces = layout.get_pieces()
+    occupied = set(squares)
+    for piece in range(len(pieces)):
+        team, piece_type = pieces[piece][0], pieces[piece][1]
+        if team != mover:
+            continue
+        new = squares[piece]
+        if piece_type == CHARIOT or piece_type == CANNON:
+            origins = LINES[new]
+        elif piece_type == HORSE:
+            origins = HORSE_MOVES[new]
+        elif piece_type == ELEPHANT:
+            origins = ELEPHANT_MOVES[new]
+        elif piece_type == SOLDIER:
+            origins = SOLDIER_ORIGINS[team][new]
+        else:
+            origins = PALACE_STEPS[new]
+        for current in origins:
+            if current in occupied or pieces[piece][3][current] is None:
+                continue
+            board.push(new, current)
+            # the mover's general being safe after the move, and the other general before it, is part of the
+            # indexes being valid positions, so only the move itself needs checking
+            if board.check_move(current, new):
+                before = list(squares)
+                before[piece] = current
+                yield layout.encode(before, mover)
+            board.pop(new, current, None)
+
+
+def build_table(signature, directory, workers=None, chunk_size=20000, log=None):
+    """
+    Builds the table for a signature in the directory, building the tables one capture away first if they aren't
+    there yet. Returns the path of the table file. Raises ValueError if the table would be too large
+    """
+    signature = canonical_signature(signature)
+    os.makedirs(directory, exist_ok=True)
+    path = get_table_path(directory, signature)
+    if os.path.exists(path):
+        return path
+    for sub in get_sub_signatures(signature):
+        build_table(sub, directory, workers, chunk_size, log)
+    layout = Layout(signature)
+    size = layout.get_size()
+    if size > MAX_INDEXES:
+        raise ValueError('table for ' + signature + ' would have ' + str(size) + ' indexes, the most is ' +
+                         str(MAX_INDEXES))
+    start_time = time.perf_counter()
+
+    values = bytearray(size)
+    counts = array.array('H', bytes(2 * size))
+    longest_loss = array.array('B', bytes(size))
+    buckets = [[] for distance in range(MAX_DISTANCE + 2)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(directory,)) as pool:
+        chunks = [(signature, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+        for start, chunk_values, chunk_counts, win_through, chunk_longest in pool.imap_unordered(
+                scan_range_arguments, chunks):
+            end = start + len(chunk_values)
+            values[start:end] = chunk_values
+            counts[start:end] = chunk_counts
+            longest_loss[start:end] = chunk_longest
+            for offset in range(len(chunk_values)):
+                index = start + offset
+                if chunk_values[offset] == 1:
+                    values[index] = DRAW
+                    buckets[0].append(index)
+                elif chunk_values[offset] == DRAW:
+                    if win_through[offset]:
+                        buckets[win_through[offset]].append(index)
+                    elif chunk_counts[offset] == 0:
+                        buckets[chunk_longest[offset] + 1].append(index)
+
+    # work backwards from the decided positions in order of distance to mate
+    board = BitboardJanggiGame()
+    for distance in range(MAX_DISTANCE + 1):
+        for index in buckets[distance]:
+            if values[index] != DRAW:
+                continue
+            values[index] = distance + 1
+            for before in find_predecessors(layout, board, index):
+                if before is None or values[before] != DRAW:
+                    continue
+                if distance % 2 == 0:  # the position is lost for the side to move, so the position before is won
+                    buckets[distance + 1].append(before)
+                else:
+                    counts[before] -= 1
+                    if distance > longest_loss[before]:
+                        longest_loss[before] = distance
+                    if counts[before] == 0:
+                        buckets[longest_loss[before] + 1].append(before)
+        buckets[distance] = []
+    if any(buckets[MAX_DISTANCE + 1]):
+        raise ValueError('distance to mate in ' + signature + ' is longer than ' + str(MAX_DISTANCE))
+
+    with open(path + '.tmp', 'wb') as table_file:
+        table_file.write(HEADER.pack(MAGIC, signature.encode().ljust(16), size))
+        table_file.write(values)
+    os.replace(path + '.tmp', path)
+    if log is not None:
+        decided = sum(1 for value in values if value != DRAW and value != INVALID)
+        log(signature + ': ' + str(size) + ' indexes, ' + str(decided) + ' decided, ' +
+            format(time.perf_counter() - start_time, '.1f') + 's')
+    return path
+
+
+def scan_range_arguments(arguments):
+    """unpacks a (signature, start, end) tuple for scan_range(), for Pool.imap_unordered()"""
+    return scan_range(*arguments)
+
+
+def main():
+    """command line entry point, see the description at the top of the file"""
+    parser = argparse.ArgumentParser(description='Build or probe Janggi endgame tablebases')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='build the table for a signature and every smaller one it needs')
+    build.add_argument('signature', help="blue's pieces in capitals then red's in lower case, like KRka")
+    build.add_argument('--dir', default='tables', help='directory the tables are kept in')
+    build.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    probe = subparsers.add_parser('probe', help='look up a position given as a FEN')
+    probe.add_argument('fen', help='position in JanggiGame.to_fen() notation')
+    probe.add_argument('--dir', default='tables', help='directory the tables are kept in')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(build_table(args.signature, args.dir, args.workers, log=print))
+        return
+    with Tablebase(args.dir) as tablebase:
+        result = tablebase.probe(JanggiGame.from_fen(args.fen))
+    if result is None:
+        raise SystemExit('no table for this position')
+    print(result['result'], 'distance', result['distance'], 'move', result['move'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Description:  Tests for the binary game archive in JanggiArchive, run with python -m pytest or python -m unittest.
+
+import os
+import random
+import tempfile
+import unittest
+
+from JanggiGame import JanggiGame
+from JanggiArchive import ArchiveWriter, GameArchive, get_index_path
+
+
+def random_game(seed, plies):
+    """plays up to plies random legal moves from the starting position and returns the game"""
+    rng = random.Random(seed)
+    game = JanggiGame()
+    for index in range(plies):
+        if game.get_game_state() != 'UNFINISHED':
+            break
+        move = rng.choice(game.legal_moves(game.get_player_turn()))
+        game.make_move(move[0], move[1])
+    return game
+
+
+class ArchiveTest(unittest.TestCase):
+    """checks that games appended to an archive read back the same"""
+
+    def setUp(self):
+        """gives each test its own archive path"""
+        self._directory = tempfile.TemporaryDirectory()
+        self._path = os.path.join(self._directory.name, 'games.jgr')
+
+    def tearDown(self):
+        """deletes the archive"""
+        self._directory.cleanup()
+
+    def test_games_read_back_at_any_ply(self):
+        """each game's moves, final position and the position at a ply in the middle match the game written"""
+        games = [random_game(seed, 40) for seed in range(5)]
+        with ArchiveWriter(self._path) as writer:
+            self.assertEqual([writer.append(game) for game in games], [0, 1, 2, 3, 4])
+        with GameArchive(self._path) as archive:
+            self.assertEqual(len(archive), 5)
+            for game_id, game in enumerate(games):
+                self.assertEqual(archive.get_moves(game_id), game.get_move_history())
+                self.assertEqual(archive.get_game(game_id).to_fen(), game.to_fen())
+                middle = JanggiGame()
+                middle.apply_moves(game.get_move_history()[:15])
+                self.assertEqual(archive.get_game(game_id, 15).snapshot()[:91], middle.snapshot()[:91])
+            with self.assertRaises(IndexError):
+                archive.get_record(5)
+
+    def test_game_from_another_start(self):
+        """a game loaded from a FEN keeps its start position and recorded state"""
+        game = JanggiGame.from_fen('4K4/9/9/9/9/9/9/1R7/R8/3k5 b UNFINISHED')
+        game.make_move('b3', 'b1')
+        with ArchiveWriter(self._path) as writer:
+            game_id = writer.append(game)
+        with GameArchive(self._path) as archive:
+            self.assertEqual(archive.get_info(game_id), {'state': 'BLUE_WON', 'moves': 1, 'custom_start': True})
+            self.assertEqual(archive.get_game(game_id, 0).to_fen(), '4K4/9/9/9/9/9/9/1R7/R8/3k5 b UNFINISHED')
+            self.assertEqual(archive.get_game(game_id).to_fen(), game.to_fen())
+
+    def test_refresh_sees_appended_games(self):
+        """a reader sees games appended after it opened once it calls refresh()"""
+        with ArchiveWriter(self._path) as writer:
+            writer.append(random_game(1, 10))
+            with GameArchive(self._path) as archive:
+                writer.append(random_game(2, 10))
+                self.assertEqual(len(archive), 1)
+                archive.refresh()
+                self.assertEqual(len(archive), 2)
+                self.assertEqual(archive.get_moves(1), random_game(2, 10).get_move_history())
+
+    def test_two_writers_get_their_own_ids(self):
+        """two writers open on the same archive take turns without overwriting each other's games"""
+        first_game = random_game(1, 6)
+        second_game = random_game(2, 12)
+        with ArchiveWriter(self._path) as first, ArchiveWriter(self._path) as second:
+            ids = [first.append(first_game), second.append(second_game), first.append(second_game)]
+            self.assertEqual(len(first), 3)
+        self.assertEqual(ids, [0, 1, 2])
+        with GameArchive(self._path) as archive:
+            self.assertEqual(archive.get_moves(0), first_game.get_move_history())
+            self.assertEqual(archive.get_moves(1), second_game.get_move_history())
+            self.assertEqual(archive.get_moves(2), second_game.get_move_history())
+
+    def test_writer_cuts_off_a_crashed_append(self):
+        """a record without an index entry and half an index entry are cut off when the archive is opened again"""
+        with ArchiveWriter(self._path) as writer:
+            writer.append(random_game(1, 10))
+        size = os.path.getsize(self._path)
+        with open(self._path, 'ab') as data_file:
+            data_file.write(b'\x05\x00\x00\x00abc')
+        with open(get_index_path(self._path), 'ab') as index_file:
+            index_file.write(b'\x01\x02')
+        with ArchiveWriter(self._path) as writer:
+            self.assertEqual(len(writer), 1)
+            self.assertEqual(os.path.getsize(self._path), size)
+            self.assertEqual(writer.append(random_game(2, 10)), 1)
+        with GameArchive(self._path) as archive:
+            self.assertEqual(archive.get_moves(1), random_game(2, 10).get_move_history())
+
+    def test_not_an_archive(self):
+        """opening a file that isn't an archive raises ValueError"""
+        with open(self._path, 'wb') as data_file:
+            data_file.write(b'not an archive')
+        with open(get_index_path(self._path), 'wb') as index_file:
+            index_file.write(b'JGI1')
+        with self.assertRaises(ValueError):
+            ArchiveWriter(self._path)
+        with self.assertRaises(ValueError):
+            GameArchive(self._path)
+
+
+if __name__ == '__main__':
+    unittest.main()
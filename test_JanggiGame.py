@@ -0,0 +1,191 @@
+# Description:  Tests for JanggiGame, run with python -m pytest or python -m unittest.
+
+import random
+import unittest
+
+from JanggiGame import JanggiGame, STARTING_ARRANGEMENTS, starting_fen
+
+
+class PushPopTest(unittest.TestCase):
+    """checks that pop() puts back exactly what push() changed"""
+
+    def test_pop_undoes_every_move_of_a_game(self):
+        """after a random game is taken back move by move, each position matches the one recorded on the way in"""
+        game = JanggiGame()
+        rng = random.Random(2)
+        positions = []
+        for index in range(80):
+            positions.append((game.snapshot(), game.get_hash(), len(game.get_team_pieces('red')),
+                              len(game.get_team_pieces('blue'))))
+            move = rng.choice(game.legal_moves(game.get_player_turn()))
+            current = game.convert_position(move[0])
+            new = game.convert_position(move[1])
+            game.push((current, new))
+            self.assertEqual(game.get_item_from_location(move[1]).get_position(), new)
+        while positions:
+            game.pop()
+            self.assertEqual((game.snapshot(), game.get_hash(), len(game.get_team_pieces('red')),
+                              len(game.get_team_pieces('blue'))), positions.pop())
+        self.assertEqual(game.snapshot(), JanggiGame().snapshot())
+
+    def test_pop_restores_a_capture_and_the_game_state(self):
+        """taking back a checkmating capture puts the piece back on the board and in its team, and reopens the game"""
+        game = JanggiGame.from_fen('4K4/9/9/9/9/9/9/1R7/R8/3k5 b UNFINISHED')
+        self.assertEqual(game.try_move('b3', 'b1'), 'OK')
+        self.assertEqual(game.get_game_state(), 'BLUE_WON')
+        self.assertEqual(game.pop(), ([2, 1], [0, 1]))
+        self.assertEqual(game.get_game_state(), 'UNFINISHED')
+        self.assertEqual(game.get_player_turn(), 'blue')
+        self.assertEqual(game.to_fen(), '4K4/9/9/9/9/9/9/1R7/R8/3k5 b UNFINISHED')
+
+    def test_push_of_a_pass_only_changes_the_turn(self):
+        """passing by moving a piece to its own square changes the player turn and nothing else on the board"""
+        game = JanggiGame()
+        before = game.snapshot()
+        game.push(([8, 4], [8, 4]))
+        self.assertEqual(game.snapshot()[:90], before[:90])
+        self.assertEqual(game.get_player_turn(), 'red')
+        game.pop()
+        self.assertEqual(game.snapshot(), before)
+
+
+class TryMoveTest(unittest.TestCase):
+    """checks the result code try_move() gives for each kind of move"""
+
+    def test_result_codes_from_the_starting_position(self):
+        """moves that can be turned down in the starting position each get their reason, and the board is untouched"""
+        game = JanggiGame()
+        before = game.snapshot()
+        for current, new, result in [('a0', 'a1', 'INVALID_SQUARE'), ('j7', 'a1', 'INVALID_SQUARE'),
+                                     ('e5', 'e6', 'EMPTY_SQUARE'), ('a4', 'a5', 'NOT_YOUR_TURN'),
+                                     ('a10', 'a7', 'OWN_PIECE'), ('a7', 'b5', 'NOT_IN_MOVE_SET'),
+                                     ('a10', 'a6', 'BLOCKED')]:
+            self.assertEqual(game.try_move(current, new), result)
+        self.assertEqual(game.snapshot(), before)
+        self.assertEqual(game.try_move('a7', 'a6'), 'OK')
+        self.assertEqual(game.get_player_turn(), 'red')
+
+    def test_result_codes_in_check(self):
+        """a player in check can't pass, and a pinned piece can't uncover its general"""
+        game = JanggiGame.from_fen('9/4K4/9/9/9/9/9/9/9/3kr4 b UNFINISHED')
+        self.assertEqual(game.try_move('e9', 'e9'), 'PASS_IN_CHECK')
+        game = JanggiGame.from_fen('9/4K4/4A4/9/9/9/9/9/9/3kr4 b UNFINISHED')
+        self.assertEqual(game.try_move('e8', 'd8'), 'LEAVES_IN_CHECK')
+        self.assertEqual(game.try_move('e9', 'e9'), 'OK')
+
+    def test_no_moves_once_the_game_is_over(self):
+        """after checkmate every move is turned down with GAME_OVER and make_move() returns False"""
+        game = JanggiGame.from_fen('4K4/9/9/9/9/9/9/1R7/R8/3k5 b UNFINISHED')
+        self.assertEqual(game.try_move('b3', 'b1'), 'OK')
+        self.assertEqual(game.try_move('d1', 'e1'), 'GAME_OVER')
+        self.assertEqual(game.apply_moves([('d1', 'e1')]), (0, 'GAME_OVER'))
+
+
+class HashTest(unittest.TestCase):
+    """checks that the Zobrist hash kept up to date move by move matches one worked out from scratch"""
+
+    def test_hash_follows_moves_and_take_backs(self):
+        """the hash matches compute_hash() after every move and every pop()"""
+        game = JanggiGame()
+        rng = random.Random(1)
+        for index in range(60):
+            move = rng.choice(game.legal_moves(game.get_player_turn()))
+            game.make_move(move[0], move[1])
+            self.assertEqual(game.get_hash(), game.compute_hash())
+            if game.get_game_state() != 'UNFINISHED':
+                break
+        while game.get_move_history():
+            game.pop()
+            self.assertEqual(game.get_hash(), game.compute_hash())
+        self.assertEqual(game.get_hash(), JanggiGame().get_hash())
+
+    def test_hash_follows_remove_piece(self):
+        """removing a piece, the general included, updates the hash and the position history"""
+        game = JanggiGame()
+        self.assertTrue(game.remove_piece('blue', 'a10'))
+        self.assertEqual(game.get_hash(), game.compute_hash())
+        self.assertEqual(game.get_repetition_count(), 1)
+        self.assertTrue(game.remove_piece('red', 'e2'))
+        self.assertEqual(game.get_hash(), game.compute_hash())
+        self.assertFalse(game.remove_piece('red', 'e2'))
+
+    def test_transposed_positions_have_the_same_hash(self):
+        """reaching a position by two move orders gives the same hash"""
+        first = JanggiGame()
+        for move in [('c7', 'c6'), ('c4', 'c5'), ('a7', 'a6'), ('a4', 'a5')]:
+            first.make_move(move[0], move[1])
+        second = JanggiGame()
+        for move in [('a7', 'a6'), ('a4', 'a5'), ('c7', 'c6'), ('c4', 'c5')]:
+            second.make_move(move[0], move[1])
+        self.assertEqual(first.get_hash(), second.get_hash())
+        self.assertNotEqual(first.get_hash(), JanggiGame().get_hash())
+
+
+class CopyTest(unittest.TestCase):
+    """checks that copy() gives an independent game in the same position"""
+
+    def test_copy_matches_and_is_independent(self):
+        """the copy has the same position and hash, and moves on either one don't reach the other"""
+        game = JanggiGame()
+        game.make_move('c7', 'c6')
+        copied = game.copy()
+        self.assertEqual(copied.snapshot(), game.snapshot())
+        self.assertEqual(copied.get_hash(), copied.compute_hash())
+        self.assertEqual(copied.get_start_snapshot(), game.snapshot())
+        self.assertEqual(copied.get_move_history(), [])
+        self.assertEqual(copied.try_move('c4', 'c5'), 'OK')
+        self.assertEqual(game.get_item_from_location('c4').get_name(), 'rSoldier')
+        self.assertEqual(game.try_move('i4', 'i5'), 'OK')
+        self.assertEqual(copied.get_item_from_location('i4').get_name(), 'rSoldier')
+
+    def test_copy_of_a_position_finds_checkmate(self):
+        """a copy of a game loaded from a FEN keeps its generals, so checkmate is still found"""
+        game = JanggiGame.from_fen('4K4/9/9/9/9/9/9/1R7/R8/3k5 b UNFINISHED').copy()
+        self.assertEqual(game.try_move('b3', 'b1'), 'OK')
+        self.assertEqual(game.get_game_state(), 'BLUE_WON')
+
+
+class PositionTextTest(unittest.TestCase):
+    """checks that positions survive to_fen()/from_fen() and snapshot()/from_snapshot()"""
+
+    def test_starting_position(self):
+        """the default starting FEN is the position JanggiGame() sets up"""
+        game = JanggiGame()
+        self.assertEqual(game.to_fen(), starting_fen())
+        self.assertEqual(JanggiGame.from_fen(starting_fen()).snapshot(), game.snapshot())
+
+    def test_round_trips_through_a_game(self):
+        """every position of a random game comes back the same from its FEN and from its snapshot"""
+        game = JanggiGame()
+        rng = random.Random(3)
+        for index in range(60):
+            for copied in [JanggiGame.from_fen(game.to_fen()), JanggiGame.from_snapshot(game.snapshot())]:
+                self.assertEqual(copied.snapshot(), game.snapshot())
+                self.assertEqual(copied.to_fen(), game.to_fen())
+                self.assertEqual(copied.get_hash(), game.get_hash())
+                self.assertEqual(sorted(copied.legal_moves(copied.get_player_turn())),
+                                 sorted(game.legal_moves(game.get_player_turn())))
+            if game.get_game_state() != 'UNFINISHED':
+                break
+            move = rng.choice(game.legal_moves(game.get_player_turn()))
+            game.make_move(move[0], move[1])
+
+    def test_every_starting_arrangement_loads(self):
+        """each of the sixteen arrangement pairs loads, writes back the same FEN and can be played from"""
+        for red in STARTING_ARRANGEMENTS:
+            for blue in STARTING_ARRANGEMENTS:
+                game = JanggiGame.from_fen(starting_fen(red, blue))
+                self.assertEqual(game.to_fen(), starting_fen(red, blue))
+                self.assertEqual(len(game.legal_moves('blue')), len(JanggiGame().legal_moves('blue')))
+
+    def test_bad_positions_are_refused(self):
+        """text that isn't a position, or has a general missing or outside its palace, raises ValueError"""
+        for fen in ['', '9/9/9 b UNFINISHED', '4K4/9/9/9/9/9/9/9/9/3k5 x UNFINISHED', '4K4/9/9/9/9/9/9/9/9/3k5 b WON',
+                    '4K4/9/9/9/9/9/9/9/9/3k4 b UNFINISHED', '4K4/9/9/9/9/9/9/9/9/9 b UNFINISHED',
+                    'K8/9/9/9/9/9/9/9/9/3k5 b UNFINISHED', '4X4/9/9/9/9/9/9/9/9/3k5 b UNFINISHED']:
+            with self.assertRaises(ValueError):
+                JanggiGame.from_fen(fen)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+# Description:  Tests for the bulk game replay in JanggiReplay, run with python -m pytest or python -m unittest.
+
+import unittest
+
+from JanggiReplay import parse_moves, iter_games, replay_game, validate_games
+
+
+class ReplayTest(unittest.TestCase):
+    """checks that recorded games are read and replayed with the right result"""
+
+    def test_parse_moves_stops_at_an_unreadable_move(self):
+        """both ways of writing a move are read, and reading stops at the first move that can't be"""
+        self.assertEqual(parse_moves('a7b7 a4-a5 c10d8'), ([('a7', 'b7'), ('a4', 'a5'), ('c10', 'd8')], True))
+        self.assertEqual(parse_moves('a7b7 zz a4a5'), ([('a7', 'b7')], False))
+
+    def test_iter_games_skips_blank_lines_and_comments(self):
+        """games are numbered by their line in the file"""
+        self.assertEqual(list(iter_games(['# games', '', 'a7b7\n', '  ', 'c7c6'])), [(3, 'a7b7'), (5, 'c7c6')])
+
+    def test_replay_game_reports_the_first_illegal_move(self):
+        """a game stops at its first illegal move, with the try_move() result as the reason"""
+        result = replay_game(1, 'a7b7 a4a5 b7b6 a5a6')
+        self.assertEqual((result['moves'], result['first_illegal'], result['reason']), (4, None, None))
+        result = replay_game(2, 'c7c6 c4c5 a10a6')
+        self.assertEqual((result['moves'], result['first_illegal'], result['reason']), (2, 2, 'BLOCKED'))
+        result = replay_game(3, 'a7b7 a4a5 b7')
+        self.assertEqual((result['moves'], result['first_illegal'], result['reason']), (2, 2, 'UNREADABLE'))
+
+    def test_validate_games_returns_every_game(self):
+        """every game in the file comes back once from the worker pool, in small batches"""
+        lines = ['a7b7 a4a5', '# skipped', 'c7c6 c4c5 a10a7', 'e5e6'] * 5
+        results = sorted(validate_games(lines, workers=1, batch_size=2), key=lambda result: result['id'])
+        self.assertEqual([result['id'] for result in results], [number for number, text in iter_games(lines)])
+        self.assertEqual([result['reason'] for result in results[:3]], [None, 'OWN_PIECE', 'EMPTY_SQUARE'])
+
+
+if __name__ == '__main__':
+    unittest.main()
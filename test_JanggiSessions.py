@@ -0,0 +1,76 @@
+# Description:  Tests for SessionStore in JanggiSessions, run with python -m pytest or python -m unittest.
+
+import tempfile
+import unittest
+
+from JanggiGame import JanggiGame
+from JanggiSessions import SessionStore
+
+
+class SessionStoreTest(unittest.TestCase):
+    """checks that games spilled to disk and read back keep every move"""
+
+    def setUp(self):
+        """gives each test its own spill directory"""
+        self._spill_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """deletes the spill directory"""
+        self._spill_dir.cleanup()
+
+    def test_restored_game_is_not_spilled_again_before_it_is_returned(self):
+        """a store too small for even one game keeps handing back the game being played, moves and all"""
+        store = SessionStore(self._spill_dir.name, max_memory_mb=0.005)
+        game_id = store.add(JanggiGame())
+        self.assertEqual(store.make_move(game_id, 'a7', 'a6'), 'OK')
+        self.assertEqual(store.make_move(game_id, 'a4', 'a5'), 'OK')
+        self.assertEqual(store.get(game_id).get_move_history(), [('a7', 'a6'), ('a4', 'a5')])
+        self.assertEqual(store.get(game_id).get_player_turn(), 'blue')
+
+    def test_pin_keeps_the_game_it_restores_in_memory(self):
+        """pinning a spilled game while another is pinned doesn't spill the game it returns"""
+        store = SessionStore(self._spill_dir.name, max_games=1)
+        first = store.add(JanggiGame())
+        store.make_move(first, 'a7', 'a6')
+        second = store.add(JanggiGame())
+        store.pin(second)
+        game = store.pin(first)
+        self.assertEqual(game.get_move_history(), [('a7', 'a6')])
+        self.assertEqual(store.get_stats()['spilled'], 0)
+        self.assertIs(store.get(first), game)
+
+    def test_spill_does_not_change_the_game(self):
+        """a spilled game still holds its moves, and the restored copy has the same position and history"""
+        store = SessionStore(self._spill_dir.name)
+        game = JanggiGame.from_fen('4K4/9/9/9/9/9/9/1R7/R8/3k5 b UNFINISHED')
+        game_id = store.add(game)
+        store.make_move(game_id, 'b3', 'b2')
+        store.spill(game_id)
+        self.assertEqual(game.get_move_history(), [('b3', 'b2')])
+        restored = store.get(game_id)
+        self.assertIsNot(restored, game)
+        self.assertEqual(restored.snapshot(), game.snapshot())
+        self.assertEqual(restored.get_move_history(), game.get_move_history())
+        self.assertEqual(restored.get_start_snapshot(), game.get_start_snapshot())
+
+    def test_restored_game_keeps_repetition_rules_and_check_streaks(self):
+        """a game spilled halfway through a perpetual check still ends as one after it is read back"""
+        store = SessionStore(self._spill_dir.name)
+        game = JanggiGame.from_fen('9/r3K4/9/9/9/9/9/9/9/3k5 b UNFINISHED')
+        game.set_repetition_rules(3, 'draw', 'loss')
+        game_id = store.add(game)
+        cycle = [('e9', 'e8'), ('a9', 'a8'), ('e8', 'e9'), ('a8', 'a9')]
+        for move in cycle * 2:
+            self.assertEqual(store.make_move(game_id, move[0], move[1]), 'OK')
+        store.spill(game_id)
+        self.assertEqual(store.get(game_id).get_repetition_rules(), (3, 'draw', 'loss'))
+        for move in cycle[:2]:
+            store.make_move(game_id, move[0], move[1])
+        self.assertEqual(store.get(game_id).get_game_state(), 'BLUE_WON')
+        for move in cycle[:2]:
+            game.try_move(move[0], move[1])
+        self.assertEqual(game.get_game_state(), 'BLUE_WON')
+
+
+if __name__ == '__main__':
+    unittest.main()